@@ -0,0 +1,218 @@
+from collections.abc import Sequence
+
+
+def attachment_type_of(record):
+    """配件记录的类型（兼容旧数据中的 'type' 键）"""
+    return record.get('attachment_type', record.get('type'))
+
+
+class AvailableAttachments(Sequence):
+    """某武器某类型可用配件的只读视图
+
+    直接引用 ATTACHMENTS_DATA 中的通用配件列表和专用配件列表（通用在前），
+    不复制任何列表，列表原地修改后视图自动反映最新内容。
+    """
+    __slots__ = ('common', 'specific')
+
+    def __init__(self, common=(), specific=()):
+        self.common = common
+        self.specific = specific
+
+    def __len__(self):
+        return len(self.common) + len(self.specific)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if index < 0:
+            raise IndexError("配件序号超出范围")
+        if index < len(self.common):
+            return self.common[index]
+        return self.specific[index - len(self.common)]
+
+    def __iter__(self):
+        yield from self.common
+        yield from self.specific
+
+    def __repr__(self):
+        return f"AvailableAttachments({list(self)!r})"
+
+
+class AttachmentCatalog:
+    """配件目录：为 ATTACHMENTS_DATA 中的每条配件记录维护索引
+
+    - 主索引：配件ID -> (配件记录, 所属武器名称)，ID 在本次运行中保持不变
+    - 二级索引：(配件类型, 配件名称) -> 配件ID集合；所属武器名称 -> 配件ID集合
+      （通用配件的所属武器为 None）
+    - 可用配件视图：(武器名称, 配件类型) -> AvailableAttachments
+
+    所有增删改都通过本类完成，原地修改 ATTACHMENTS_DATA 中的列表，只触及受影响的条目。
+    设置 journal（AttachmentJournal）后，每次增删改还会追加一条变更记录。
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self._views = {}  # {配件类型: {武器名称: AvailableAttachments}}
+        self._entries = {}  # {配件ID: (配件记录, 所属武器名称)}
+        self._ids_by_record = {}  # {id(配件记录): 配件ID}
+        self._ids_by_name = {}  # {(配件类型, 配件名称): {配件ID}}
+        self._ids_by_weapon = {}  # {所属武器名称: {配件ID}}
+        self._next_id = 1
+        self.journal = None
+        self.rebuild()
+
+    def rebuild(self):
+        """配件数据被整体替换后调用，重新建立所有索引"""
+        self._views.clear()
+        self._entries.clear()
+        self._ids_by_record.clear()
+        self._ids_by_name.clear()
+        self._ids_by_weapon.clear()
+        for records in self.data.get('common', {}).values():
+            for record in records:
+                self._index(record, None)
+        for weapon_name, types in self.data.get('specific', {}).items():
+            for records in types.values():
+                for record in records:
+                    self._index(record, weapon_name)
+
+    def _index(self, record, weapon_name, attachment_id=None):
+        if attachment_id is None:
+            attachment_id = self._next_id
+            self._next_id += 1
+        self._entries[attachment_id] = (record, weapon_name)
+        self._ids_by_record[id(record)] = attachment_id
+        self._ids_by_name.setdefault((attachment_type_of(record), record['name']), set()).add(attachment_id)
+        self._ids_by_weapon.setdefault(weapon_name, set()).add(attachment_id)
+        return attachment_id
+
+    def _unindex(self, attachment_id):
+        record, weapon_name = self._entries.pop(attachment_id)
+        del self._ids_by_record[id(record)]
+        key = (attachment_type_of(record), record['name'])
+        self._ids_by_name[key].discard(attachment_id)
+        if not self._ids_by_name[key]:
+            del self._ids_by_name[key]
+        self._ids_by_weapon[weapon_name].discard(attachment_id)
+        if not self._ids_by_weapon[weapon_name]:
+            del self._ids_by_weapon[weapon_name]
+        return record, weapon_name
+
+    def _records_list(self, attachment_type, weapon_name):
+        """取得（必要时创建）存放配件记录的列表，并让受影响的视图引用新列表"""
+        if weapon_name:
+            types = self.data['specific'].setdefault(weapon_name, {})
+            if attachment_type not in types:
+                types[attachment_type] = []
+                view = self._views.get(attachment_type, {}).get(weapon_name)
+                if view is not None:
+                    view.specific = types[attachment_type]
+            return types[attachment_type]
+        if attachment_type not in self.data['common']:
+            self.data['common'][attachment_type] = []
+            for view in self._views.get(attachment_type, {}).values():
+                view.common = self.data['common'][attachment_type]
+        return self.data['common'][attachment_type]
+
+    def available(self, weapon_name, attachment_type):
+        """获取可用配件视图，O(1)"""
+        views = self._views.setdefault(attachment_type, {})
+        view = views.get(weapon_name)
+        if view is None:
+            view = AvailableAttachments(
+                self.data['common'].get(attachment_type, ()),
+                self.data['specific'].get(weapon_name, {}).get(attachment_type, ())
+            )
+            views[weapon_name] = view
+        return view
+
+    def get(self, attachment_id):
+        """按ID获取 (配件记录, 所属武器名称)，不存在时抛出 KeyError"""
+        return self._entries[attachment_id]
+
+    def __contains__(self, attachment_id):
+        return attachment_id in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def id_of(self, record):
+        """获取配件记录的ID，不在目录中时返回 None"""
+        return self._ids_by_record.get(id(record))
+
+    def find(self, attachment_type, name, weapon_name=None):
+        """按类型和名称查找配件ID；weapon_name 为空时查找通用配件"""
+        for attachment_id in self._ids_by_name.get((attachment_type, name), ()):
+            if self._entries[attachment_id][1] == (weapon_name or None):
+                return attachment_id
+        return None
+
+    def ids_by_name(self, attachment_type, name):
+        """同类型同名称的所有配件ID（包括各武器的专用配件）"""
+        return set(self._ids_by_name.get((attachment_type, name), ()))
+
+    def ids_for_weapon(self, weapon_name):
+        """某武器的全部专用配件ID；weapon_name 为 None 时为全部通用配件ID"""
+        return set(self._ids_by_weapon.get(weapon_name, ()))
+
+    def items(self):
+        """遍历 (配件ID, 配件记录, 所属武器名称)"""
+        for attachment_id, (record, weapon_name) in self._entries.items():
+            yield attachment_id, record, weapon_name
+
+    def add(self, record, weapon_name=None):
+        """添加配件记录，weapon_name 为空时作为通用配件，返回新配件ID"""
+        self._records_list(attachment_type_of(record), weapon_name).append(record)
+        if self.journal is not None:
+            self.journal.append({'op': 'add', 'weapon': weapon_name or None, 'record': record})
+        return self._index(record, weapon_name or None)
+
+    def remove(self, attachment_id):
+        """按ID删除配件，返回被删除的配件记录"""
+        record, weapon_name = self._unindex(attachment_id)
+        self._discard(record, weapon_name)
+        if self.journal is not None:
+            self.journal.append({'op': 'remove', 'weapon': weapon_name,
+                                 'type': attachment_type_of(record), 'name': record['name']})
+        return record
+
+    def _discard(self, record, weapon_name):
+        """从所在列表中删除这一条记录（按对象身份，只遍历该槽位的列表）"""
+        records = self._records_list(attachment_type_of(record), weapon_name)
+        for i, item in enumerate(records):
+            if item is record:
+                del records[i]
+                return
+
+    def update(self, attachment_id, changes, weapon_name=...):
+        """修改配件记录的字段，可同时修改所属武器（None 表示改为通用配件）
+
+        类型、名称或所属武器变化时只移动这一条记录并更新相关索引，配件ID保持不变。
+        """
+        record, old_weapon = self._entries[attachment_id]
+        if weapon_name is ...:
+            weapon_name = old_weapon
+        weapon_name = weapon_name or None
+        if self.journal is not None:
+            self.journal.append({'op': 'update', 'weapon': old_weapon, 'type': attachment_type_of(record),
+                                 'name': record['name'], 'changes': changes, 'new_weapon': weapon_name})
+
+        old_type = attachment_type_of(record)
+        new_type = changes.get('attachment_type', changes.get('type', old_type))
+        key_changed = (new_type != old_type or changes.get('name', record['name']) != record['name']
+                       or weapon_name != old_weapon)
+        if not key_changed:
+            record.update(changes)
+            return attachment_id
+
+        self._unindex(attachment_id)
+        moved = new_type != old_type or weapon_name != old_weapon
+        if moved:
+            self._discard(record, old_weapon)
+        record.update(changes)
+        if moved:
+            self._records_list(new_type, weapon_name).append(record)
+
+        return self._index(record, weapon_name, attachment_id)  # 以原ID重新登记
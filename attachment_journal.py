@@ -0,0 +1,119 @@
+import json
+import os
+from instrumentation import count
+
+
+class AttachmentJournal:
+    """配件数据的追加式变更日志
+
+    配件目录的每次增删改追加一行JSON记录（配件ID只在本次运行中有效，因此记录按
+    配件类型、名称和所属武器定位配件）。加载时在最近一次快照上按顺序重放日志；日志
+    超过 compact_after 条时由存储写入新的快照并删除已包含在快照中的日志。
+
+    压缩时先调用 rotate() 把当前日志改名为带代数的文件（之后的修改写入新日志），
+    得到的代数随快照一起写入，快照写完后再用 discard_rotated(代数) 删除。重放不是
+    幂等的（例如重命名或同名配件的添加），因此重放时跳过代数不超过快照代数的日志：
+    快照写入前崩溃时这些日志被重放，写入后崩溃时被跳过，修改不会丢失也不会重复应用。
+    """
+
+    def __init__(self, path, compact_after=200):
+        self.path = path
+        self.compact_after = compact_after
+        self.count = 0  # 尚未压缩进快照的记录数
+        self.generation = 0  # 已使用的最大代数（快照中记录的或已轮换的日志的）
+        self._file = None
+
+    @property
+    def needs_compaction(self):
+        return self.count >= self.compact_after
+
+    def _rotated(self):
+        """已轮换、尚未被快照包含的日志文件，按代数排列: [(代数, 路径)]"""
+        directory = os.path.dirname(self.path) or '.'
+        prefix = os.path.basename(self.path) + '.'
+        rotated = []
+        if os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                if filename.startswith(prefix) and filename[len(prefix):].isdigit():
+                    rotated.append((int(filename[len(prefix):]), os.path.join(directory, filename)))
+        return sorted(rotated)
+
+    def append(self, entry):
+        """追加一条变更记录"""
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self.count += 1
+        count('AttachmentJournal.append')
+
+    def replay(self, catalog, snapshot_generation=None):
+        """在配件目录上按顺序重放快照之后的日志，返回应用的记录数
+
+        snapshot_generation 为快照中记录的代数，代数不超过它的日志已包含在快照中，
+        不再重放（为 None 时重放全部日志）。最后一行可能因写入中途崩溃而不完整，
+        无法解析的行会被跳过。
+        """
+        self.generation = max(self.generation, snapshot_generation or 0)
+        journal, catalog.journal = catalog.journal, None  # 重放时不再写日志
+        applied = 0
+        paths = [path for gen, path in self._rotated()
+                 if snapshot_generation is None or gen > snapshot_generation]
+        try:
+            for path in paths + [self.path]:
+                if not os.path.exists(path):
+                    continue
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        self._apply(catalog, entry)
+                        applied += 1
+        finally:
+            catalog.journal = journal
+        self.count = applied
+        count('AttachmentJournal.replay', applied)
+        return applied
+
+    @staticmethod
+    def _apply(catalog, entry):
+        op = entry.get('op')
+        if op == 'add':
+            catalog.add(entry['record'], entry.get('weapon'))
+        elif op == 'remove':
+            attachment_id = catalog.find(entry['type'], entry['name'], entry.get('weapon'))
+            if attachment_id is not None:
+                catalog.remove(attachment_id)
+        elif op == 'update':
+            attachment_id = catalog.find(entry['type'], entry['name'], entry.get('weapon'))
+            if attachment_id is not None:
+                catalog.update(attachment_id, entry['changes'], entry.get('new_weapon'))
+
+    def rotate(self):
+        """把当前日志改名为新的一代，返回快照应记录的代数
+
+        返回值不小于任何已轮换日志和已知快照的代数，跨越压缩和重启都单调递增。
+        """
+        self.close()
+        self.generation = max([self.generation] + [gen for gen, _ in self._rotated()])
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            self.generation += 1
+            os.replace(self.path, f'{self.path}.{self.generation}')
+        self.count = 0
+        return self.generation
+
+    def discard_rotated(self, generation):
+        """删除代数不超过 generation 的日志（它们的修改已经写入快照）"""
+        for gen, path in self._rotated():
+            if gen <= generation:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,185 @@
+def _field(attachment, key, default=None):
+    """读取配件字段（配件记录字典或 Attachment 对象）"""
+    if isinstance(attachment, dict):
+        return attachment.get(key, default)
+    return getattr(attachment, key, default)
+
+
+# 条件标志的判定方式；未列出的条件直接读取配件的同名字段
+FLAG_TESTS = {
+    'can_mount_grip': lambda att: bool(_field(att, 'can_mount_grip', False)),
+    # 旧数据没有 is_drum_mag 字段，按名称判断
+    'is_drum_mag': lambda att: bool(_field(att, 'is_drum_mag', False)) or '弹鼓' in _field(att, 'name', ''),
+}
+
+# 错误信息中条件标志的描述
+FLAG_LABELS = {
+    'can_mount_grip': '可支持握把座的',
+    'is_drum_mag': '弹鼓类型',
+}
+
+
+def attachment_flag(attachment, flag):
+    """配件是否满足条件标志"""
+    test = FLAG_TESTS.get(flag)
+    return test(attachment) if test is not None else bool(_field(attachment, flag, False))
+
+
+class CompatibilityRules:
+    """把 ATTACHMENT_DEPENDENCIES 形式的声明编译成槽位占用位掩码上的检查
+
+    声明格式为 {槽位: 规则 或 [规则, ...]}，规则为
+    {'前置配件': 槽位, '条件': 标志}（该槽位必须安装了满足条件的配件）或
+    {'互斥配件': 槽位, '条件': 标志}（该槽位不能安装满足条件的配件），'条件' 可省略。
+
+    武器的配装状态是一个整数：每个槽位占一位（已安装配件），每个在规则中出现的
+    (槽位, 条件) 再占一位（该槽位的配件满足条件）。检查只需几次位运算，与已安装的
+    配件数量无关。
+    """
+
+    def __init__(self, dependencies, slots):
+        self.slots = list(slots)
+        self._slot_bits = {slot: 1 << i for i, slot in enumerate(self.slots)}
+        self._flags = {slot: [] for slot in self.slots}  # {槽位: [(条件, 位), ...]}
+        self._requires = dict.fromkeys(self.slots, 0)  # 安装该槽位需要的位
+        self._excludes = dict.fromkeys(self.slots, 0)  # 安装该槽位时不能存在的位
+        self._excluded_by = {}  # {条件位: 与之互斥的槽位位掩码}
+        self._dependents = dict.fromkeys(self.slots, 0)  # 依赖该槽位的槽位位掩码
+        self._messages = {}  # {(槽位, 位, 种类): 错误信息}
+        self._next_bit = len(self.slots)
+
+        for target, rules in dependencies.items():
+            for rule in rules if isinstance(rules, list) else [rules]:
+                flag = rule.get('条件')
+                label = FLAG_LABELS.get(flag, f"{flag}的" if flag else '')
+                if '前置配件' in rule:
+                    prerequisite = rule['前置配件']
+                    bit = self._condition_bit(prerequisite, flag)
+                    self._requires[target] |= bit
+                    self._dependents[prerequisite] |= self._slot_bits[target]
+                    self._messages[(target, bit, 'requires')] = f"需要先安装{label}{prerequisite}"
+                if '互斥配件' in rule:
+                    other = rule['互斥配件']
+                    bit = self._condition_bit(other, flag)
+                    self._excludes[target] |= bit
+                    self._excluded_by[bit] = self._excluded_by.get(bit, 0) | self._slot_bits[target]
+                    self._messages[(target, bit, 'excludes')] = f"使用{label}{other}时不能安装{target}"
+                    self._messages[(other, bit, 'excluded_by')] = f"安装{label}{other}时需要先移除{target}"
+
+    def _condition_bit(self, slot, flag):
+        """(槽位, 条件) 对应的位；没有条件时就是槽位的占用位"""
+        if not flag:
+            return self._slot_bits[slot]
+        for existing, bit in self._flags[slot]:
+            if existing == flag:
+                return bit
+        bit = 1 << self._next_bit
+        self._next_bit += 1
+        self._flags[slot].append((flag, bit))
+        return bit
+
+    def bits(self, slot, attachment):
+        """安装到 slot 的配件在状态中占用的位"""
+        bits = self._slot_bits[slot]
+        for flag, bit in self._flags[slot]:
+            if attachment_flag(attachment, flag):
+                bits |= bit
+        return bits
+
+    def blockers(self, bits):
+        """与这些位互斥的槽位位掩码（可预先计算，供 allows 使用）"""
+        mask = 0
+        for bit, slots in self._excluded_by.items():
+            if bits & bit:
+                mask |= slots
+        return mask
+
+    def state_of(self, attachments):
+        """已安装配件的状态"""
+        state = 0
+        for attachment in attachments:
+            state |= self.bits(attachment.attachment_type, attachment)
+        return state
+
+    def can_fill(self, state, slot):
+        """槽位为空、前置配件满足且没有互斥配件时返回 True（不考虑具体配件的条件）"""
+        required = self._requires[slot]
+        return not state & self._slot_bits[slot] and state & required == required and not state & self._excludes[slot]
+
+    def allows(self, state, slot, blockers):
+        """能否把 blockers（见 blockers()）对应的配件安装到 slot"""
+        return self.can_fill(state, slot) and not state & blockers
+
+    def check(self, state, slot, attachment):
+        """检查能否安装配件，可以时返回 None，否则返回错误信息"""
+        if state & self._slot_bits[slot]:
+            return f"已安装了{slot}类型的配件"
+        required = self._requires[slot]
+        missing = required & ~state
+        if missing:
+            return self._message(slot, missing, 'requires')
+        conflict = state & self._excludes[slot]
+        if conflict:
+            return self._message(slot, conflict, 'excludes')
+        bits = self.bits(slot, attachment)
+        for bit, slots in self._excluded_by.items():
+            if bits & bit and state & slots:
+                return self._messages[(slot, bit, 'excluded_by')]
+        return None
+
+    def _message(self, slot, bits, kind):
+        for (target, bit, message_kind), message in self._messages.items():
+            if target == slot and message_kind == kind and bits & bit:
+                return message
+        return f"{slot}不满足配件依赖关系"
+
+    def relevant_mask(self, slots):
+        """会影响这些槽位能否安装配件的状态位（其余位对后续搜索没有影响，可以忽略）"""
+        mask = 0
+        for slot in slots:
+            mask |= self._requires[slot] | self._excludes[slot]
+            for _, bit in self._flags[slot]:
+                mask |= self._excluded_by.get(bit, 0)
+        return mask
+
+    def available_slots(self, state):
+        """还可以安装配件的槽位"""
+        return [slot for slot in self.slots if self.can_fill(state, slot)]
+
+    def cascade(self, attachments):
+        """移除前置配件后不再满足依赖的配件，返回 (保留的配件, 被连带移除的配件)"""
+        kept = list(attachments)
+        dropped = []
+        while True:
+            state = self.state_of(kept)
+            broken = [att for att in kept
+                      if self._requires[att.attachment_type] & ~state]
+            if not broken:
+                return kept, dropped
+            dropped.extend(broken)
+            broken_ids = {id(att) for att in broken}
+            kept = [att for att in kept if id(att) not in broken_ids]
+
+    def search_order(self):
+        """槽位的搜索顺序：前置配件排在依赖它的槽位之前，其余保持原顺序"""
+        order = []
+        placed = 0
+        remaining = list(self.slots)
+        while remaining:
+            for slot in remaining:
+                if self._prerequisite_slots(slot) & ~placed == 0:
+                    order.append(slot)
+                    placed |= self._slot_bits[slot]
+                    remaining.remove(slot)
+                    break
+            else:
+                raise ValueError(f"配件依赖关系存在循环: {', '.join(remaining)}")
+        return order
+
+    def _prerequisite_slots(self, slot):
+        """slot 的前置槽位位掩码（带条件的前置位不是槽位占用位，按声明中的槽位计算）"""
+        mask = 0
+        for other, dependents in self._dependents.items():
+            if dependents & self._slot_bits[slot]:
+                mask |= self._slot_bits[other]
+        return mask
@@ -0,0 +1,102 @@
+from functools import lru_cache
+from attachment_catalog import attachment_type_of
+
+
+@lru_cache(maxsize=4096)
+def mod_text(recoil_mod, handling_mod, stability_mod, hip_fire_mod):
+    """配件属性修改的显示文本（按修改值缓存，相同修改值的配件共用一个字符串）"""
+    mods = []
+    if recoil_mod: mods.append(f"后坐力{recoil_mod:+}")
+    if handling_mod: mods.append(f"操控{handling_mod:+}")
+    if stability_mod: mods.append(f"稳定性{stability_mod:+}")
+    if hip_fire_mod: mods.append(f"精度{hip_fire_mod:+}")
+    return ', '.join(mods)
+
+
+def row_values(record, weapon_name):
+    """配件在列表中一行的内容: (配件类型, 配件名称, 属性修改)"""
+    return (
+        attachment_type_of(record),
+        f"{record['name']} ({weapon_name}专用)" if weapon_name else record['name'],
+        mod_text(record.get('recoil_mod', 0), record.get('handling_mod', 0),
+                 record.get('stability_mod', 0), record.get('hip_fire_mod', 0))
+    )
+
+
+class AttachmentTreeModel:
+    """配件列表 Treeview 的模型
+
+    条目ID即配件ID（字符串形式）。每个条目显示的内容保存在模型中，刷新时只对新增、
+    修改和删除的条目调用 Treeview，未变化的条目不会被重新插入。大量条目时先同步插入
+    一屏（chunk_size 条），其余按目录顺序在空闲时分批插入，界面不会卡住。
+    """
+
+    def __init__(self, tree, catalog, chunk_size=200):
+        self.tree = tree
+        self.catalog = catalog
+        self.chunk_size = chunk_size
+        self._shown = {}  # {配件ID: 行内容}，已插入 Treeview 的条目
+        self._pending = {}  # {配件ID: 行内容}，等待分批插入的条目（保持目录顺序）
+        self._drain_scheduled = False
+
+    def __len__(self):
+        return len(self._shown) + len(self._pending)
+
+    def sync(self):
+        """与配件目录比较，只应用差异"""
+        current = set()
+        budget = self.chunk_size  # 本次同步插入的条目数，其余分批插入
+        for attachment_id, record, weapon_name in self.catalog.items():
+            current.add(attachment_id)
+            if self._set(attachment_id, row_values(record, weapon_name), budget > 0):
+                budget -= 1
+        for attachment_id in [i for i in self._shown if i not in current]:
+            self.remove(attachment_id)
+        for attachment_id in [i for i in self._pending if i not in current]:
+            del self._pending[attachment_id]
+        self._schedule_drain()
+
+    def upsert(self, attachment_id):
+        """配件被添加或修改后调用"""
+        record, weapon_name = self.catalog.get(attachment_id)
+        self._set(attachment_id, row_values(record, weapon_name), True)
+        self._schedule_drain()
+
+    def remove(self, attachment_id):
+        """配件被删除后调用"""
+        if self._shown.pop(attachment_id, None) is not None:
+            self.tree.delete(str(attachment_id))
+        self._pending.pop(attachment_id, None)
+
+    def _set(self, attachment_id, values, insert_now):
+        """更新或登记一个条目，新条目直接插入时返回 True
+
+        insert_now 为假或前面还有等待插入的条目时（保持目录顺序）放入等待队列。
+        """
+        shown = self._shown.get(attachment_id)
+        if shown is not None:
+            if shown != values:
+                self.tree.item(str(attachment_id), values=values)
+                self._shown[attachment_id] = values
+        elif insert_now and not self._pending:
+            self.tree.insert('', 'end', iid=str(attachment_id), values=values)
+            self._shown[attachment_id] = values
+            return True
+        else:
+            self._pending[attachment_id] = values
+        return False
+
+    def _schedule_drain(self):
+        if self._pending and not self._drain_scheduled:
+            self._drain_scheduled = True
+            self.tree.after_idle(self._drain)
+
+    def _drain(self):
+        """插入一批等待中的条目，还有剩余时在下一次空闲时继续"""
+        self._drain_scheduled = False
+        for _ in range(min(self.chunk_size, len(self._pending))):
+            attachment_id = next(iter(self._pending))
+            values = self._pending.pop(attachment_id)
+            self.tree.insert('', 'end', iid=str(attachment_id), values=values)
+            self._shown[attachment_id] = values
+        self._schedule_drain()
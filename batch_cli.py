@@ -0,0 +1,271 @@
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+from itertools import islice
+from weapon_system import (BODY_PARTS, SOLDIER_CLASSES, STAT_KEYS, WEAPON_TYPES, Weapon,
+                           compute_btk_matrix, get_available_attachments)
+from catalog_store import default_store, open_store
+from loadout_optimizer import build_attachment
+from ttk_simulator import simulate_catalog
+
+# 批量计算时每批处理的武器数量
+CHUNK_SIZE = 1000
+
+
+def _finite(value):
+    """inf/nan（无法击杀）输出为 null/空，整数原样输出"""
+    if isinstance(value, int):
+        return value
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _warn(filename, error):
+    print(f"警告：加载 {filename} 时出错: {error}", file=sys.stderr)
+
+
+def iter_weapons(store, weapon_type=None, soldier_class=None, names=None):
+    """按过滤条件逐把产生武器，加载错误输出到 stderr
+
+    存储逐个文件（或逐行）读取武器，产生过的武器不再被引用，处理完即可释放，
+    内存占用不随武器数量增长。
+    """
+    return store.iter_weapons(weapon_type, soldier_class, names, on_error=_warn)
+
+
+def list_rows(weapons):
+    """每把武器一行：名称、类型、兵种、配件后的性能参数和已安装配件"""
+    for weapon in weapons:
+        row = {
+            'name': weapon.name,
+            'weapon_type': weapon.weapon_type,
+            'soldier_classes': list(weapon.soldier_classes)
+        }
+        row.update(weapon.get_modified_stats())
+        row['attachments'] = [att.name for att in weapon.attachments]
+        yield row
+
+
+def btk_rows(weapons, healths, chunk_size=CHUNK_SIZE):
+    """每把武器每个生命值一行：各部位BTK和最快理论击杀时间（毫秒），按批计算"""
+    for chunk in _chunks(weapons, chunk_size):
+        btk, ttk = compute_btk_matrix(chunk, healths)
+        for i, weapon in enumerate(chunk):
+            for j, health in enumerate(healths):
+                row = {'name': weapon.name, 'weapon_type': weapon.weapon_type, 'health': health}
+                row.update((part, _finite(value)) for part, value in zip(BODY_PARTS, btk[i, j]))
+                row['ttk'] = _finite(ttk[i, j])
+                yield row
+
+
+def ttk_rows(weapons, health=100, trials=100_000, seed=None, distance=None, workers=None,
+             chunk_size=CHUNK_SIZE):
+    """每把武器一行：蒙特卡洛模拟的击杀时间分布，按批在进程池中计算
+
+    第 k 批使用种子 (seed, k)，结果只取决于 seed、武器顺序和 chunk_size。
+    """
+    for k, chunk in enumerate(_chunks(weapons, chunk_size)):
+        results = simulate_catalog(chunk, health, trials, seed=None if seed is None else (seed, k),
+                                   distance=distance, workers=workers)
+        for weapon, result in zip(chunk, results):
+            row = {'name': weapon.name, 'weapon_type': weapon.weapon_type, 'health': health}
+            row.update((key, _finite(value)) for key, value in result.items())
+            yield row
+
+
+def apply_build_rows(store, builds, dry_run=False):
+    """按配装方案修改武器并保存，每个方案输出一行结果
+
+    方案为 {'weapon': 名称, 'attachments': {配件类型: 配件名称}, 'clear': 是否先移除全部配件}，
+    配件按给出的顺序安装（例如后握把要在握把座之前）。任一配件安装失败时该武器不做修改。
+    """
+    weapons = {}
+    for weapon in iter_weapons(store):
+        weapons.setdefault(weapon.name, weapon)
+
+    for build in builds:
+        name = build.get('weapon')
+        # 失败的行也包含全部列，CSV 的列名取自第一行
+        row = {'weapon': name, 'ok': False, 'error': None, **dict.fromkeys(STAT_KEYS), 'attachments': None}
+        weapon = weapons.get(name)
+        if weapon is None:
+            row['error'] = f"未找到枪械 {name}"
+            yield row
+            continue
+
+        # 在副本上安装，失败时原武器保持不变
+        candidate = Weapon.from_dict(weapon.to_dict())
+        try:
+            if build.get('clear'):
+                candidate.attachments = []
+            for slot, attachment_name in build.get('attachments', {}).items():
+                record = next((att for att in get_available_attachments(name, slot)
+                               if att['name'] == attachment_name), None)
+                if record is None:
+                    raise ValueError(f"{name} 没有可用的{slot}配件 {attachment_name}")
+                installed = next((att for att in candidate.attachments if att.attachment_type == slot), None)
+                if installed is not None:
+                    candidate.remove_attachment(installed.name)
+                candidate.add_attachment(build_attachment(record, slot))
+        except ValueError as e:
+            row['error'] = str(e)
+            yield row
+            continue
+
+        if not dry_run and not store.save_weapon(candidate):
+            row['error'] = "保存失败"
+            yield row
+            continue
+        weapons[name] = candidate
+        row['ok'] = True
+        row.update(candidate.get_modified_stats())
+        row['attachments'] = [att.name for att in candidate.attachments]
+        yield row
+
+
+def export_rows(weapons):
+    """每把武器一行完整数据（与武器文件的格式相同）"""
+    for weapon in weapons:
+        yield weapon.to_dict()
+
+
+def write_jsonl(rows, out):
+    """逐行写出 JSON Lines，返回行数"""
+    count = 0
+    for row in rows:
+        out.write(json.dumps(row, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def write_csv(rows, out):
+    """逐行写出 CSV（列名取自第一行，列表和字典写成JSON），返回行数"""
+    writer = None
+    count = 0
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(out, fieldnames=list(row), extrasaction='ignore')
+            writer.writeheader()
+        writer.writerow({key: json.dumps(value, ensure_ascii=False) if isinstance(value, (list, dict)) else value
+                         for key, value in row.items()})
+        count += 1
+    return count
+
+
+WRITERS = {'jsonl': write_jsonl, 'csv': write_csv}
+
+
+def _parse_attachment(text):
+    slot, sep, name = text.partition('=')
+    if not sep or not slot or not name:
+        raise argparse.ArgumentTypeError(f"配件格式应为 类型=名称: {text}")
+    return slot, name
+
+
+def _read_builds(path):
+    """从 JSON Lines 文件（- 表示标准输入）逐行读取配装方案"""
+    f = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--store', help="武器目录或 .db 文件（默认使用环境变量 SJZPQ_STORE 或 weapons 目录）")
+    common.add_argument('--attachments', default='attachments_data.json', help="JSON目录存储的配件数据文件")
+    common.add_argument('--format', choices=WRITERS, default='jsonl', help="输出格式（默认 jsonl）")
+    common.add_argument('-o', '--output', help="输出文件（默认标准输出）")
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument('--type', dest='weapon_type', choices=WEAPON_TYPES, help="只处理该类型的枪械")
+    filters.add_argument('--class', dest='soldier_class', choices=SOLDIER_CLASSES, help="只处理该兵种可用的枪械")
+    filters.add_argument('--name', dest='names', action='append', help="只处理该名称的枪械（可重复）")
+
+    parser = argparse.ArgumentParser(description="枪械数据批处理（非交互），结果逐行输出为 JSON Lines 或 CSV")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('list', parents=[common, filters], help="列出枪械及配件后的性能参数")
+    subparsers.add_parser('export', parents=[common, filters], help="导出完整的枪械数据")
+
+    btk_parser = subparsers.add_parser('btk', parents=[common, filters], help="计算各部位BTK和最快理论击杀时间")
+    btk_parser.add_argument('--health', type=float, action='append', help="目标生命值（可重复，默认 100）")
+
+    ttk_parser = subparsers.add_parser('ttk', parents=[common, filters], help="蒙特卡洛模拟击杀时间分布")
+    ttk_parser.add_argument('--health', type=float, default=100, help="目标生命值（默认 100）")
+    ttk_parser.add_argument('--trials', type=int, default=100_000, help="每把枪械的模拟次数（默认 100000）")
+    ttk_parser.add_argument('--seed', type=int, help="随机种子")
+    ttk_parser.add_argument('--distance', type=float, help="射击距离（按伤害衰减计算）")
+    ttk_parser.add_argument('--workers', type=int, help="进程数")
+
+    apply_parser = subparsers.add_parser('apply-build', parents=[common], help="安装配装方案并保存")
+    apply_parser.add_argument('weapon', nargs='?', help="枪械名称")
+    apply_parser.add_argument('-a', '--attachment', dest='install', type=_parse_attachment,
+                               action='append', default=[], help="要安装的配件，格式为 类型=名称（可重复）")
+    apply_parser.add_argument('--clear', action='store_true', help="先移除全部已安装的配件")
+    apply_parser.add_argument('--builds', help="从 JSON Lines 文件读取配装方案（- 表示标准输入）")
+    apply_parser.add_argument('--dry-run', action='store_true', help="只检查和输出结果，不保存")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'apply-build' and bool(args.weapon) == bool(args.builds):
+        parser.error("apply-build 需要指定枪械名称或 --builds 之一")
+
+    store = default_store() if args.store is None else open_store(args.store, args.attachments)
+    out = sys.stdout if args.output is None else open(args.output, 'w', encoding='utf-8', newline='')
+    failed = False
+    try:
+        if args.command == 'apply-build':
+            store.load_attachments()
+            if args.builds:
+                builds = _read_builds(args.builds)
+            else:
+                builds = [{'weapon': args.weapon, 'attachments': dict(args.install), 'clear': args.clear}]
+
+            def track(rows):
+                nonlocal failed
+                for row in rows:
+                    failed = failed or not row['ok']
+                    yield row
+            rows = track(apply_build_rows(store, builds, args.dry_run))
+        else:
+            weapons = iter_weapons(store, args.weapon_type, args.soldier_class, args.names)
+            if args.command == 'list':
+                rows = list_rows(weapons)
+            elif args.command == 'export':
+                rows = export_rows(weapons)
+            elif args.command == 'btk':
+                rows = btk_rows(weapons, args.health or [100.0])
+            else:
+                rows = ttk_rows(weapons, args.health, args.trials, args.seed, args.distance, args.workers)
+        WRITERS[args.format](rows, out)
+        out.flush()
+    except BrokenPipeError:
+        # 下游（例如 head）提前关闭了管道
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        store.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,383 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from weapon_system import (Attachment, MOD_FIELDS, SOLDIER_CLASSES, STAT_FIELDS, WEAPON_TYPES,
+                           compute_btk_matrix, get_available_attachments, load_attachments_data,
+                           load_weapons_report, save_attachments_data)
+from stat_kernel import LEGACY, SUM, build_stats, mods_table
+from manifest_cache import manifest_path
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+# 界面基准默认只测到这个规模（10万把武器的列表框插入需要很长时间）
+DEFAULT_GUI_MAX_SIZE = 10000
+# get_available_attachments 基准的查询次数
+QUERY_COUNT = 10000
+
+SLOTS = list(Attachment.TYPES.values())
+
+
+def _mod(rng):
+    return float(rng.choice([-8, -5, -3, -2, 0, 0, 0, 2, 3, 5, 8]))
+
+
+def _attachment_record(rng, name, slot):
+    record = {
+        'name': name,
+        'attachment_type': slot,
+        'recoil_mod': _mod(rng),
+        'handling_mod': _mod(rng),
+        'stability_mod': _mod(rng),
+        'hip_fire_mod': _mod(rng)
+    }
+    if slot == '后握把':
+        record['can_mount_grip'] = rng.random() < 0.5
+    return record
+
+
+def generate_catalog(directory, size, seed=0):
+    """在 directory 下生成 weapons/ 目录和 attachments_data.json，相同 seed 和 size 生成相同的数据
+
+    每个槽位有 3~8 个通用配件（弹匣中约两成为弹鼓，后握把约一半可安装握把座），约三成
+    武器在 1~3 个槽位上有专用配件。每把武器随机安装若干配件，并遵守弹鼓/弹匣座和
+    后握把/握把座的限制。
+    """
+    rng = random.Random(seed)
+    weapons_dir = os.path.join(directory, 'weapons')
+    os.makedirs(weapons_dir, exist_ok=True)
+
+    common = {}
+    for slot in SLOTS:
+        common[slot] = []
+        for i in range(rng.randint(3, 8)):
+            drum = slot == '弹匣' and rng.random() < 0.2
+            common[slot].append(_attachment_record(rng, f"{'弹鼓' if drum else ''}{slot}{i}", slot))
+
+    specific = {}
+    for i in range(size):
+        weapon_type = rng.choice(WEAPON_TYPES)
+        name = f"{weapon_type}{i:06d}"
+        if rng.random() < 0.3:
+            specific[name] = {
+                slot: [_attachment_record(rng, f"{name}专用{slot}{j}", slot) for j in range(rng.randint(1, 2))]
+                for slot in rng.sample(SLOTS, rng.randint(1, 3))
+            }
+
+        # 按 Attachment.TYPES 的顺序安装：弹匣在弹匣座之前，后握把在握把座之前
+        installed = []
+        for slot in sorted(rng.sample(SLOTS, rng.randint(0, 6)), key=SLOTS.index):
+            record = rng.choice(common[slot] + specific.get(name, {}).get(slot, []))
+            if slot == '弹匣座' and any('弹鼓' in att['name'] for att in installed):
+                continue
+            if slot == '握把座' and not any(att.get('can_mount_grip') for att in installed):
+                continue
+            installed.append({'can_mount_grip': False, **record})
+
+        base_damage = rng.randint(20, 60)
+        range_meters = rng.randint(20, 80)
+        weapon = {
+            'name': name,
+            'weapon_type': weapon_type,
+            'soldier_classes': rng.sample(SOLDIER_CLASSES, rng.randint(1, len(SOLDIER_CLASSES))),
+            'base_damage': base_damage,
+            'stomach_damage': round(base_damage * rng.uniform(0.8, 1.0), 1),
+            'limb_damage': round(base_damage * rng.uniform(0.5, 0.8), 1),
+            'foot_damage': round(base_damage * rng.uniform(0.4, 0.7), 1),
+            'range_meters': range_meters,
+            'fire_rate': rng.randint(60, 1100),
+            'recoil_control': rng.randint(20, 90),
+            'handling_speed': rng.randint(20, 90),
+            'ads_stability': rng.randint(20, 90),
+            'hip_fire_accuracy': rng.randint(20, 90),
+            'damage_falloff': [
+                {'distance': range_meters + 20 * (k + 1), 'multiplier': round(0.9 - 0.15 * k, 2)}
+                for k in range(rng.randint(0, 3))
+            ],
+            'attachments': installed
+        }
+        with open(os.path.join(weapons_dir, f"{name}.json"), 'w', encoding='utf-8') as f:
+            json.dump(weapon, f, ensure_ascii=False)
+
+    with open(os.path.join(directory, 'attachments_data.json'), 'w', encoding='utf-8') as f:
+        json.dump({'common': common, 'specific': specific}, f, ensure_ascii=False)
+    with open(os.path.join(directory, 'catalog.json'), 'w', encoding='utf-8') as f:
+        json.dump({'size': size, 'seed': seed}, f)
+
+
+def ensure_catalog(workdir, size, seed):
+    """返回 size 把武器的目录路径，workdir 中已有相同参数生成的目录时直接复用"""
+    directory = os.path.join(workdir, f"catalog-{size}-{seed}")
+    try:
+        with open(os.path.join(directory, 'catalog.json'), 'r', encoding='utf-8') as f:
+            if json.load(f) == {'size': size, 'seed': seed}:
+                return directory
+    except (OSError, ValueError):
+        pass
+    shutil.rmtree(directory, ignore_errors=True)
+    generate_catalog(directory, size, seed)
+    return directory
+
+
+def measure(func, repeat=3, setup=None, memory=True):
+    """运行 func repeat 次并计时（setup 不计时），memory=True 时再用 tracemalloc 运行一次记录峰值内存"""
+    seconds = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+    peak = None
+    if memory:
+        if setup is not None:
+            setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {'seconds': seconds, 'best': min(seconds), 'median': statistics.median(seconds), 'peak_bytes': peak}
+
+
+def run_core_benchmarks(directory, seed, repeat=3, memory=True):
+    """不需要界面的基准，返回 {基准名称: 结果}"""
+    weapons_dir = os.path.join(directory, 'weapons')
+    attachments_file = os.path.join(directory, 'attachments_data.json')
+    results = {}
+
+    def remove_manifest():
+        for path in (manifest_path(weapons_dir), manifest_path(attachments_file)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    results['load_weapons.cold'] = measure(lambda: load_weapons_report(weapons_dir), repeat, remove_manifest, memory)
+    results['load_weapons.warm'] = measure(lambda: load_weapons_report(weapons_dir), repeat, None, memory)
+
+    # 完整加载（访问数值字段和配件时构建延迟加载的武器）
+    holder = []
+
+    def fresh_weapons():
+        holder[:] = [load_weapons_report(weapons_dir).weapons]
+
+    def hydrate():
+        for weapon in holder[0]:
+            weapon.attachments
+
+    results['load_weapons.hydrate'] = measure(hydrate, repeat, fresh_weapons, memory)
+
+    load_attachments_data(attachments_file, use_manifest=False)
+    results['load_attachments_data'] = measure(
+        lambda: load_attachments_data(attachments_file, use_manifest=False), repeat, None, memory)
+    output_file = os.path.join(directory, 'attachments_bench.json')
+    results['save_attachments_data'] = measure(lambda: save_attachments_data(output_file), repeat, None, memory)
+
+    fresh_weapons()
+    hydrate()
+    weapons = holder[0]
+    rng = random.Random(seed)
+    queries = [(rng.choice(weapons).name, rng.choice(SLOTS)) for _ in range(QUERY_COUNT)]
+
+    def query():
+        for weapon_name, slot in queries:
+            for _ in get_available_attachments(weapon_name, slot):
+                pass
+
+    results['get_available_attachments'] = measure(query, repeat, None, memory)
+
+    def invalidate():
+        for weapon in weapons:
+            weapon._invalidate_stats()
+
+    def stats():
+        for weapon in weapons:
+            weapon.get_modified_stats()
+
+    results['get_modified_stats.cold'] = measure(stats, repeat, invalidate, memory)
+    results['get_modified_stats.warm'] = measure(stats, repeat, None, memory)
+    results['compute_btk_matrix'] = measure(lambda: compute_btk_matrix(weapons, [100.0]), repeat, None, memory)
+
+    # 每把武器一个随机配装（只用通用配件），整批一次计算
+    slot_mods = [[[record.get(field, 0) for field in MOD_FIELDS] for record in get_available_attachments(None, slot)]
+                 for slot in SLOTS]
+    table = mods_table(slot_mods)
+    bases = np.array([[getattr(weapon, field) for field in STAT_FIELDS] for weapon in weapons])
+    builds = np.array([[rng.randint(0, len(mods)) for mods in slot_mods] for _ in weapons])
+    for mode in (SUM, LEGACY):
+        results[f'build_stats.{mode}'] = measure(lambda: build_stats(bases, table, builds, mode), repeat, None, memory)
+    return results
+
+
+def ensure_display():
+    """确保可以连接 X 显示器
+
+    已设置 DISPLAY 时返回 (None, None)；否则尝试启动 Xvfb，返回 (进程, None)；
+    无法启动时返回 (None, 原因)。
+    """
+    if os.environ.get('DISPLAY'):
+        return None, None
+    xvfb = shutil.which('Xvfb')
+    if xvfb is None:
+        return None, "未设置 DISPLAY 且找不到 Xvfb"
+    for number in range(99, 120):
+        if os.path.exists(f"/tmp/.X11-unix/X{number}") or os.path.exists(f"/tmp/.X{number}-lock"):
+            continue
+        process = subprocess.Popen([xvfb, f":{number}", '-screen', '0', '1280x1024x24', '-nolisten', 'tcp'],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and process.poll() is None:
+            if os.path.exists(f"/tmp/.X11-unix/X{number}"):
+                os.environ['DISPLAY'] = f":{number}"
+                return process, None
+            time.sleep(0.05)
+        process.kill()
+    return None, "Xvfb 启动失败"
+
+
+def run_gui_benchmarks(directory, repeat=3):
+    """界面基准：在目录中启动 WeaponSystemGUI 并计时各刷新操作（不记录内存），返回 {基准名称: 结果}"""
+    import tkinter as tk
+    from weapon_system_gui import WeaponSystemGUI
+
+    results = {}
+    cwd = os.getcwd()
+    store = os.environ.get('SJZPQ_STORE')
+    os.chdir(directory)
+    os.environ['SJZPQ_STORE'] = 'weapons'
+    root = tk.Tk()
+    try:
+        holder = []
+        results['gui.startup'] = measure(lambda: holder.append(WeaponSystemGUI(root)), 1, None, False)
+        app = holder[0]
+
+        def pump(done):
+            while not done():
+                root.update()
+
+        model = app.attachment_tree_model
+        results['gui.attachment_tree.drain'] = measure(lambda: pump(lambda: not model._pending), 1, None, False)
+        results['gui.update_attachment_tree'] = measure(app.update_attachment_tree, repeat, None, False)
+
+        def calculate_btk():
+            app.calculate_btk()
+            table = app.btk_table_model
+            pump(lambda: app.btk_job.finished and table._rendered == len(table))
+
+        results['gui.calculate_btk'] = measure(calculate_btk, repeat, None, False)
+
+        weapons = list(app.weapons)[:100]
+
+        def select_weapons():
+            for weapon in weapons:
+                app.config_selection.select_weapon(weapon)
+            root.update_idletasks()
+
+        results['gui.config_weapon_select'] = measure(
+            select_weapons, repeat, lambda: app.config_selection.select_weapon(None), False)
+    finally:
+        if holder:
+            holder[0].on_close()
+        else:
+            root.destroy()
+        os.chdir(cwd)
+        if store is None:
+            os.environ.pop('SJZPQ_STORE', None)
+        else:
+            os.environ['SJZPQ_STORE'] = store
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    """打印两次运行中相同基准的最好耗时及变化"""
+    old_results = {(r['benchmark'], r['size']): r for r in old['results']}
+    print(f"{'基准':<32}{'规模':>8}{'之前(秒)':>12}{'现在(秒)':>12}{'变化':>10}")
+    for result in new['results']:
+        before = old_results.get((result['benchmark'], result['size']))
+        if before is None:
+            continue
+        ratio = result['best'] / before['best'] if before['best'] else float('inf')
+        print(f"{result['benchmark']:<32}{result['size']:>8}{before['best']:>12.4f}{result['best']:>12.4f}"
+              f"{ratio:>9.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按规模生成合成数据并测量各热点路径的耗时和峰值内存")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help="武器数量，逗号分隔")
+    parser.add_argument('--seed', type=int, default=0, help="生成数据的随机种子")
+    parser.add_argument('--repeat', type=int, default=3, help="每个基准的计时次数")
+    parser.add_argument('--no-memory', action='store_true', help="不记录峰值内存")
+    parser.add_argument('--gui', action='store_true', help="同时运行界面基准（没有 DISPLAY 时启动 Xvfb）")
+    parser.add_argument('--gui-max-size', type=int, default=DEFAULT_GUI_MAX_SIZE, help="界面基准的最大规模")
+    parser.add_argument('--workdir', help="生成数据的目录（指定时保留并复用，默认使用临时目录）")
+    parser.add_argument('-o', '--output', help="结果文件（默认 benchmark-<提交>.json）")
+    parser.add_argument('--compare', help="与之前的结果文件比较")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    workdir = args.workdir or tempfile.mkdtemp(prefix='sjzpq-bench-')
+    commit = git_commit()
+    output = {
+        'meta': {
+            'commit': commit,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'results': []
+    }
+
+    xvfb, skip_reason = ensure_display() if args.gui else (None, None)
+    try:
+        for size in sizes:
+            start = time.perf_counter()
+            directory = ensure_catalog(workdir, size, args.seed)
+            print(f"规模 {size}: 数据准备 {time.perf_counter() - start:.1f}秒", file=sys.stderr)
+            results = run_core_benchmarks(directory, args.seed, args.repeat, not args.no_memory)
+            if args.gui and skip_reason is None and size <= args.gui_max_size:
+                results.update(run_gui_benchmarks(directory, args.repeat))
+            for name, result in results.items():
+                output['results'].append({'benchmark': name, 'size': size, **result})
+                print(f"  {name:<32}{result['best']:>10.4f}秒", file=sys.stderr)
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if skip_reason is not None:
+        output['meta']['gui_skipped'] = skip_reason
+        print(f"跳过界面基准: {skip_reason}", file=sys.stderr)
+
+    path = args.output or f"benchmark-{commit or 'local'}.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到 {path}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), output)
+
+
+if __name__ == "__main__":
+    main()
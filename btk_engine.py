@@ -0,0 +1,127 @@
+import numpy as np
+
+# 身体部位及其对应的伤害字段，顺序即结果数组最后一维的顺序
+BODY_PARTS = ['胸部', '腹部', '手部', '脚部']
+DAMAGE_FIELDS = ['base_damage', 'stomach_damage', 'limb_damage', 'foot_damage']
+
+
+def field_matrix(weapons, fields):
+    """把武器列表的数值字段整理成 (N, F) 数组
+
+    所有武器属于同一个 WeaponTable 时直接从表的列中按行号取值，否则逐个读取属性。
+    """
+    table = getattr(weapons[0], '_table', None) if len(weapons) else None
+    if table is not None and all(getattr(weapon, '_table', None) is table for weapon in weapons):
+        rows = np.fromiter((weapon._row for weapon in weapons), dtype=np.intp, count=len(weapons))
+        # 按行号取值得到的是副本，持有锁期间其他线程不会扩容正在被 frombuffer 引用的列
+        with table.lock:
+            return np.stack(
+                [np.frombuffer(table.columns[field], dtype=np.float64)[rows] for field in fields],
+                axis=1
+            )
+    return np.array(
+        [[getattr(weapon, field) for field in fields] for weapon in weapons],
+        dtype=np.float64
+    ).reshape(len(weapons), len(fields))
+
+
+def damage_matrix(weapons):
+    """把武器列表的部位伤害整理成 (N, 4) 数组"""
+    return field_matrix(weapons, DAMAGE_FIELDS)
+
+
+def fire_rate_vector(weapons):
+    """把武器列表的射速整理成 (N,) 数组"""
+    return field_matrix(weapons, ['fire_rate'])[:, 0]
+
+
+def btk_from_damage(damage, healths):
+    """由 (N, 4) 伤害数组和 (M,) 生命值数组计算 (N, M, 4) 的BTK
+
+    伤害不大于0的部位无法击杀，对应结果为 inf。
+    """
+    damage = np.asarray(damage, dtype=np.float64)
+    healths = np.asarray(healths, dtype=np.float64).reshape(-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        btk = np.ceil(healths[None, :, None] / damage[:, None, :])
+    btk[np.broadcast_to(damage[:, None, :] <= 0, btk.shape)] = np.inf
+    return btk
+
+
+def ttk_from_btk(btk, fire_rates):
+    """由BTK数组计算最快理论击杀时间（毫秒）
+
+    btk 的最后一维为身体部位，取其中最少的子弹数；射速不大于0时结果为 inf。
+    """
+    fire_rates = np.asarray(fire_rates, dtype=np.float64)
+    shot_interval = np.full(fire_rates.shape, np.inf)
+    np.divide(60000.0, fire_rates, out=shot_interval, where=fire_rates > 0)
+    fastest = btk.min(axis=-1)
+    interval = shot_interval.reshape(shot_interval.shape + (1,) * (fastest.ndim - 1))
+    with np.errstate(invalid='ignore'):
+        ttk = (fastest - 1) * interval
+    # 一发即可击杀时不需要射击间隔
+    ttk[fastest == 1] = 0.0
+    return ttk
+
+
+def btk_ttk_from_arrays(damage, fire_rates, healths):
+    """由 (N, 4) 伤害数组和 (N,) 射速数组计算 (btk, ttk)，不访问武器对象，可在其他线程或进程中调用"""
+    btk = btk_from_damage(damage, healths)
+    return btk, ttk_from_btk(btk, fire_rates)
+
+
+def compute_btk_matrix(weapons, healths):
+    """批量计算 N 把武器 × M 个生命值 × 4 个部位的BTK和最快击杀时间
+
+    返回 (btk, ttk)：btk 形状为 (N, M, 4)，最后一维顺序同 BODY_PARTS；
+    ttk 形状为 (N, M)，单位毫秒。
+    """
+    return btk_ttk_from_arrays(damage_matrix(weapons), fire_rate_vector(weapons), healths)
+
+
+def falloff_multipliers(weapons, distances):
+    """计算每把武器在各距离上的伤害倍率，返回 (N, D) 数组
+
+    距离不超过 range_meters 时为满伤害；超过后取距离小于当前距离的最后一个
+    衰减断点的倍率（断点均不足当前距离时仍为满伤害）。
+    """
+    distances = np.asarray(distances, dtype=np.float64).reshape(-1)
+    n = len(weapons)
+    k = max((len(weapon.damage_falloff) for weapon in weapons), default=0)
+
+    # 断点补齐到相同长度：距离补 inf（永远不会生效），倍率前面补一个 1.0
+    bp_distance = np.full((n, k), np.inf)
+    bp_multiplier = np.ones((n, k + 1))
+    for i, weapon in enumerate(weapons):
+        for j, bp in enumerate(weapon.damage_falloff):
+            bp_distance[i, j] = bp['distance']
+            bp_multiplier[i, j + 1] = bp['multiplier']
+
+    passed = (bp_distance[:, None, :] < distances[None, :, None]).sum(axis=-1)
+    multipliers = np.take_along_axis(bp_multiplier, passed, axis=1)
+
+    range_meters = field_matrix(weapons, ['range_meters'])[:, 0]
+    multipliers[distances[None, :] <= range_meters[:, None]] = 1.0
+    return multipliers
+
+
+def compute_range_curves(weapons, distances, health=100):
+    """批量计算所有武器在各距离上的BTK和最快击杀时间
+
+    返回 (btk, ttk)：btk 形状为 (N, D, 4)，ttk 形状为 (N, D)，单位毫秒。
+    """
+    damage = damage_matrix(weapons)[:, None, :] * falloff_multipliers(weapons, distances)[:, :, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        btk = np.ceil(float(health) / damage)
+    btk[damage <= 0] = np.inf
+    return btk, ttk_from_btk(btk, fire_rate_vector(weapons))
+
+
+def rank_weapons_by_range(weapons, distances, health=100):
+    """按各距离上的最快击杀时间给武器排名
+
+    返回 (D, N) 的武器下标数组，每行按击杀时间从快到慢排列。
+    """
+    _, ttk = compute_range_curves(weapons, distances, health)
+    return np.argsort(ttk.T, axis=1, kind='stable')
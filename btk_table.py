@@ -0,0 +1,116 @@
+from bisect import bisect_right
+from btk_engine import BODY_PARTS
+
+# 表格的列: (列ID, 标题, 宽度)
+COLUMNS = (
+    [('name', '枪械', 140), ('type', '类型', 80)]
+    + [(f'btk{i}', f'{part}BTK', 70) for i, part in enumerate(BODY_PARTS)]
+    + [('ttk', 'TTK(毫秒)', 90)]
+)
+COLUMN_IDS = [column for column, _, _ in COLUMNS]
+
+
+def format_row(row):
+    """一行原始数据 (名称, 类型, 各部位BTK..., TTK) 的显示文本"""
+    name, weapon_type, *btk, ttk = row
+    return (name, weapon_type, *(f"{value:.0f}" for value in btk), f"{ttk:.1f}")
+
+
+class _Reversed:
+    """反转比较结果的排序键，用于在降序列表中二分插入"""
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+
+class BtkTableModel:
+    """BTK结果 Treeview 的模型
+
+    原始数值保存在模型中，点击列标题按该列排序（再次点击切换升降序），排序不需要
+    重新计算。先同步插入一屏（chunk_size 行），其余在空闲时分批插入。
+    """
+
+    def __init__(self, tree, chunk_size=200):
+        self.tree = tree
+        self.chunk_size = chunk_size
+        self.rows = []  # 原始数据，下标即条目ID
+        self.sort_column = None
+        self.reverse = False
+        self._order = []  # 按当前排序的行下标
+        self._keys = []  # 与 _order 对应的排序键（排序时才使用）
+        self._rendered = 0  # _order 中已插入 Treeview 的前缀长度
+        self._drain_scheduled = False
+        for column, heading, width in COLUMNS:
+            tree.heading(column, text=heading, command=lambda c=column: self.sort_by(c))
+            tree.column(column, width=width, anchor='w' if column in ('name', 'type') else 'e')
+
+    def __len__(self):
+        return len(self.rows)
+
+    def clear(self):
+        self.tree.delete(*self.tree.get_children())
+        self.rows = []
+        self._order = []
+        self._keys = []
+        self._rendered = 0
+
+    def add_rows(self, rows):
+        """追加若干行；正在按某列排序时插入到排序后的位置"""
+        budget = self.chunk_size
+        for row in rows:
+            index = len(self.rows)
+            self.rows.append(row)
+            if self.sort_column is None:
+                position = len(self._order)
+            else:
+                key = self._key(row)
+                position = bisect_right(self._keys, key)
+                self._keys.insert(position, key)
+            self._order.insert(position, index)
+            # 插入到已显示部分中间的行必须立即插入，否则已显示的部分不再是连续的前缀
+            if position < self._rendered:
+                self.tree.insert('', position, iid=str(index), values=format_row(row))
+                self._rendered += 1
+            elif position == self._rendered and budget > 0:
+                self.tree.insert('', 'end', iid=str(index), values=format_row(row))
+                self._rendered += 1
+                budget -= 1
+        self._schedule_drain()
+
+    def sort_by(self, column):
+        """按列排序，再次按同一列排序时切换升降序"""
+        if column == self.sort_column:
+            self.reverse = not self.reverse
+        else:
+            self.sort_column, self.reverse = column, False
+        self._order = sorted(range(len(self.rows)), key=lambda i: self._key(self.rows[i]))
+        self._keys = [self._key(self.rows[i]) for i in self._order]
+        for name, heading, _ in COLUMNS:
+            arrow = (' ▼' if self.reverse else ' ▲') if name == self.sort_column else ''
+            self.tree.heading(name, text=heading + arrow)
+
+        self.tree.delete(*self.tree.get_children())
+        self._rendered = 0
+        self._drain()
+
+    def _key(self, row):
+        key = row[COLUMN_IDS.index(self.sort_column)]
+        return _Reversed(key) if self.reverse else key
+
+    def _schedule_drain(self):
+        if self._rendered < len(self._order) and not self._drain_scheduled:
+            self._drain_scheduled = True
+            self.tree.after_idle(self._drain)
+
+    def _drain(self):
+        """插入一批尚未显示的行，还有剩余时在下一次空闲时继续"""
+        self._drain_scheduled = False
+        end = min(self._rendered + self.chunk_size, len(self._order))
+        for index in self._order[self._rendered:end]:
+            self.tree.insert('', 'end', iid=str(index), values=format_row(self.rows[index]))
+        self._rendered = end
+        self._schedule_drain()
@@ -0,0 +1,527 @@
+import argparse
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from itertools import groupby
+from operator import itemgetter
+from attachment_journal import AttachmentJournal
+from instrumentation import count, timed
+from attachment_catalog import attachment_type_of
+from weapon_system import (
+    ATTACHMENT_CATALOG, ATTACHMENTS_DATA, Attachment, LoadReport, Weapon, delete_weapon, load_attachments_data,
+    load_weapon_file, load_weapons_report, replace_attachments_data, save_attachments_data, save_weapon, save_weapon_data
+)
+from weapon_table import NUMERIC_FIELDS
+
+# SQLite 数据库文件的扩展名，open_store 据此选择存储后端
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+# 配件快照中记录日志代数的键（快照已包含代数不超过它的日志）
+SNAPSHOT_GENERATION_KEY = 'journal_generation'
+
+
+def _matches(weapon, weapon_type=None, soldier_class=None, names=None):
+    return ((weapon_type is None or weapon.weapon_type == weapon_type)
+            and (soldier_class is None or soldier_class in weapon.soldier_classes)
+            and (names is None or weapon.name in names))
+
+
+def _print_errors(report):
+    for entry in report.errors:
+        _print_error(entry['file'], entry['error'])
+
+
+def _print_error(filename, error):
+    print(f"\n警告：加载 {filename} 时出错: {error}")
+
+
+def _group_rows(rows):
+    """把按 weapon_id 排序的 (weapon_id, 值) 行按武器分组，逐组产生 (weapon_id, [值, ...])"""
+    for weapon_id, group in groupby(rows, key=itemgetter(0)):
+        yield weapon_id, [value for _, value in group]
+
+
+class JsonDirectoryStore:
+    """默认存储：每把武器一个JSON文件，配件数据保存为一个JSON快照加一个追加式变更日志"""
+
+    def __init__(self, directory='weapons', attachments_file='attachments_data.json'):
+        self.directory = directory
+        self.attachments_file = attachments_file
+        self.journal = AttachmentJournal(f'{attachments_file}.journal')
+
+    def load_weapons_report(self, weapon_type=None, soldier_class=None, names=None, workers=None):
+        """并行读取武器文件，返回包含延迟加载武器和每个文件耗时、错误的 LoadReport
+
+        JSON目录需要读取全部文件后再过滤，过滤只用到名称、类型和兵种，不会触发完整加载。
+        """
+        report = load_weapons_report(self.directory, workers=workers)
+        if weapon_type is not None or soldier_class is not None or names is not None:
+            report.weapons = [w for w in report.weapons if _matches(w, weapon_type, soldier_class, names)]
+        return report
+
+    def load_weapons(self, weapon_type=None, soldier_class=None, names=None):
+        """加载武器，可按枪械类型、兵种、名称过滤"""
+        report = self.load_weapons_report(weapon_type, soldier_class, names)
+        _print_errors(report)
+        return report.weapons
+
+    def iter_weapons(self, weapon_type=None, soldier_class=None, names=None, on_error=_print_error):
+        """逐个文件读取并产生（延迟加载的）武器，加载失败的文件调用 on_error(文件名, 错误信息)
+
+        不使用清单缓存，也不保留已产生的武器，内存占用与武器数量无关，适合批处理。
+        """
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json'):
+                    continue
+                weapon, error = load_weapon_file(entry.path)
+                if weapon is None:
+                    on_error(entry.name, error)
+                elif _matches(weapon, weapon_type, soldier_class, names):
+                    yield weapon
+
+    def save_weapon(self, weapon):
+        return save_weapon(weapon, self.directory)
+
+    def save_weapon_data(self, weapon_data):
+        """保存 Weapon.to_dict() 格式的武器数据"""
+        return save_weapon_data(weapon_data, self.directory)
+
+    def save_weapons(self, weapons):
+        return all([save_weapon(weapon, self.directory) for weapon in weapons])
+
+    def delete_weapon(self, weapon_name):
+        return delete_weapon(weapon_name, self.directory)
+
+    def load_attachments(self):
+        """加载配件快照并重放变更日志，之后配件目录的修改都追加到日志中"""
+        load_attachments_data(self.attachments_file)
+        generation = ATTACHMENTS_DATA.pop(SNAPSHOT_GENERATION_KEY, None)
+        self.journal.replay(ATTACHMENT_CATALOG, generation)
+        ATTACHMENT_CATALOG.journal = self.journal
+
+    def snapshot_attachments(self):
+        """需要写入快照时返回 save_attachments 的参数 (配件数据副本, 日志代数)，否则返回 None
+
+        配件目录的修改已经逐条写入日志，只有日志过长时才需要写入完整快照。
+        """
+        if ATTACHMENT_CATALOG.journal is self.journal and not self.journal.needs_compaction:
+            return None
+        return copy.deepcopy(ATTACHMENTS_DATA), self.journal.rotate()
+
+    def save_attachments(self, data=None, journal_generation=None):
+        """写入完整的配件快照（data 为空时保存 ATTACHMENTS_DATA），并删除已包含在快照中的日志
+
+        快照中记录日志代数，快照写入后、日志删除前崩溃时，重启后不会重放这些日志。
+        """
+        if data is None:
+            data = ATTACHMENTS_DATA
+            journal_generation = self.journal.rotate()
+        data = dict(data)
+        if journal_generation is not None:
+            data[SNAPSHOT_GENERATION_KEY] = journal_generation
+        save_attachments_data(self.attachments_file, data)
+        if journal_generation is not None:
+            self.journal.discard_rotated(journal_generation)
+
+    def commit_attachments(self):
+        """配件修改后调用：必要时压缩日志"""
+        snapshot = self.snapshot_attachments()
+        if snapshot is not None:
+            self.save_attachments(*snapshot)
+
+    def replace_attachments(self):
+        """用 ATTACHMENTS_DATA 整体替换存储中的配件数据（迁移时使用）"""
+        self.save_attachments()
+
+    def close(self):
+        self.journal.close()
+
+
+class PendingAttachmentChanges:
+    """SQLite 存储尚未写入的配件变更
+
+    作为配件目录的 journal 接收每次增删改的变更记录（格式与 AttachmentJournal 相同），
+    记录在追加时复制，之后由 SQLiteStore.save_attachments 在写入线程中逐行写入数据库。
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._lock = threading.Lock()
+
+    def append(self, entry):
+        with self._lock:
+            self._entries.append(copy.deepcopy(entry))
+
+    def take(self):
+        """取出全部待写入的变更"""
+        with self._lock:
+            entries, self._entries = self._entries, []
+        return entries
+
+    def restore(self, entries):
+        """写入失败时把取出的变更放回队列开头"""
+        with self._lock:
+            self._entries[:0] = entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteStore:
+    """SQLite 存储：武器、配件和已安装配件分表保存，带索引，每次写入都在事务中完成
+
+    连接可以在多个线程（例如后台保存线程）中使用，所有访问都经过同一把锁。
+    """
+
+    def __init__(self, path='catalog.db'):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self._lock = threading.RLock()
+        self.changes = PendingAttachmentChanges()
+        self._create_tables()
+
+    def _create_tables(self):
+        numeric_columns = ',\n'.join(f'{" " * 20}{field} REAL NOT NULL DEFAULT 0' for field in NUMERIC_FIELDS)
+        with self.conn:
+            self.conn.executescript(f'''
+                CREATE TABLE IF NOT EXISTS weapons (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL UNIQUE,
+                    weapon_type TEXT NOT NULL DEFAULT '',
+{numeric_columns},
+                    damage_falloff TEXT NOT NULL DEFAULT '[]'
+                );
+                CREATE INDEX IF NOT EXISTS idx_weapons_type ON weapons(weapon_type);
+
+                CREATE TABLE IF NOT EXISTS weapon_classes (
+                    weapon_id INTEGER NOT NULL REFERENCES weapons(id) ON DELETE CASCADE,
+                    position INTEGER NOT NULL,
+                    soldier_class TEXT NOT NULL,
+                    PRIMARY KEY (weapon_id, position)
+                );
+                CREATE INDEX IF NOT EXISTS idx_weapon_classes_class ON weapon_classes(soldier_class);
+
+                CREATE TABLE IF NOT EXISTS installed_attachments (
+                    weapon_id INTEGER NOT NULL REFERENCES weapons(id) ON DELETE CASCADE,
+                    position INTEGER NOT NULL,
+                    attachment_type TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (weapon_id, position)
+                );
+
+                -- 配件目录；weapon_name 为 NULL 表示通用配件，data 为完整的配件记录
+                CREATE TABLE IF NOT EXISTS attachments (
+                    id INTEGER PRIMARY KEY,
+                    weapon_name TEXT,
+                    attachment_type TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_attachments_slot ON attachments(weapon_name, attachment_type);
+                CREATE INDEX IF NOT EXISTS idx_attachments_name ON attachments(attachment_type, name);
+            ''')
+
+    @staticmethod
+    def _filter_clause(weapon_type=None, soldier_class=None, names=None):
+        conditions, params = [], []
+        if weapon_type is not None:
+            conditions.append('w.weapon_type = ?')
+            params.append(weapon_type)
+        if soldier_class is not None:
+            conditions.append('EXISTS (SELECT 1 FROM weapon_classes c '
+                              'WHERE c.weapon_id = w.id AND c.soldier_class = ?)')
+            params.append(soldier_class)
+        if names is not None:
+            names = list(names)
+            conditions.append(f"w.name IN ({', '.join('?' * len(names))})" if names else '0')
+            params.extend(names)
+        return (' WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+    @timed()
+    def load_weapons(self, weapon_type=None, soldier_class=None, names=None):
+        """加载武器，可按枪械类型、兵种、名称过滤（过滤在数据库中完成）"""
+        with self._lock:
+            return self._load_weapons(weapon_type, soldier_class, names)
+
+    def _load_weapons(self, weapon_type=None, soldier_class=None, names=None):
+        return list(self._iter_weapons(weapon_type, soldier_class, names))
+
+    def iter_weapons(self, weapon_type=None, soldier_class=None, names=None, on_error=_print_error):
+        """逐行读取并产生武器，内存占用与武器数量无关，适合批处理
+
+        读取期间不持有锁，不应与其他线程的写入同时进行。读取数据库出错时调用
+        on_error(数据库文件名, 错误信息)。
+        """
+        try:
+            yield from self._iter_weapons(weapon_type, soldier_class, names)
+        except sqlite3.Error as e:
+            on_error(os.path.basename(self.path), f"读取数据库时出错: {e}")
+
+    def _iter_weapons(self, weapon_type=None, soldier_class=None, names=None):
+        # 武器、兵种和已安装配件三个查询都按 weapon_id 排序，同步向前读取
+        where, params = self._filter_clause(weapon_type, soldier_class, names)
+        subquery = f'SELECT w.id FROM weapons w{where}'
+        classes = _group_rows(self.conn.execute(
+            f'SELECT weapon_id, soldier_class FROM weapon_classes '
+            f'WHERE weapon_id IN ({subquery}) ORDER BY weapon_id, position', params))
+        installed = _group_rows(self.conn.execute(
+            f'SELECT weapon_id, data FROM installed_attachments '
+            f'WHERE weapon_id IN ({subquery}) ORDER BY weapon_id, position', params))
+        next_classes, next_installed = next(classes, None), next(installed, None)
+
+        columns = ', '.join(f'w.{field}' for field in NUMERIC_FIELDS)
+        for row in self.conn.execute(
+                f'SELECT w.id, w.name, w.weapon_type, {columns}, w.damage_falloff '
+                f'FROM weapons w{where} ORDER BY w.id', params):
+            weapon_id, name, weapon_type_name = row[:3]
+            soldier_classes, attachments = [], []
+            if next_classes is not None and next_classes[0] == weapon_id:
+                soldier_classes = next_classes[1]
+                next_classes = next(classes, None)
+            if next_installed is not None and next_installed[0] == weapon_id:
+                attachments = [Attachment.from_dict(json.loads(data)) for data in next_installed[1]]
+                next_installed = next(installed, None)
+            weapon = Weapon(
+                name, weapon_type_name, soldier_classes,
+                damage_falloff=json.loads(row[-1]),
+                **dict(zip(NUMERIC_FIELDS, row[3:-1]))
+            )
+            weapon.attachments = attachments
+            yield weapon
+
+    def load_weapons_report(self, weapon_type=None, soldier_class=None, names=None, workers=None):
+        """与 load_weapons 相同，但返回 LoadReport（整个数据库作为一项记录耗时和错误）"""
+        report = LoadReport(self.path)
+        start = time.perf_counter()
+        error = None
+        try:
+            report.weapons = self.load_weapons(weapon_type, soldier_class, names)
+        except sqlite3.Error as e:
+            error = f"读取数据库时出错: {e}"
+        report.elapsed = time.perf_counter() - start
+        report.files.append({'file': os.path.basename(self.path), 'seconds': report.elapsed,
+                             'error': error, 'cached': False})
+        return report
+
+    def _write_weapon(self, weapon_data):
+        values = [weapon_data.get(field, 0) for field in NUMERIC_FIELDS]
+        assignments = ', '.join(f'{field} = excluded.{field}' for field in NUMERIC_FIELDS)
+        self.conn.execute(
+            f"INSERT INTO weapons (name, weapon_type, {', '.join(NUMERIC_FIELDS)}, damage_falloff) "
+            f"VALUES ({', '.join('?' * (len(NUMERIC_FIELDS) + 3))}) "
+            f"ON CONFLICT(name) DO UPDATE SET weapon_type = excluded.weapon_type, {assignments}, "
+            f"damage_falloff = excluded.damage_falloff",
+            [weapon_data['name'], weapon_data.get('weapon_type', ''), *values,
+             json.dumps(weapon_data.get('damage_falloff', []), ensure_ascii=False)]
+        )
+        weapon_id = self.conn.execute(
+            'SELECT id FROM weapons WHERE name = ?', (weapon_data['name'],)
+        ).fetchone()[0]
+        self.conn.execute('DELETE FROM weapon_classes WHERE weapon_id = ?', (weapon_id,))
+        self.conn.executemany(
+            'INSERT INTO weapon_classes (weapon_id, position, soldier_class) VALUES (?, ?, ?)',
+            [(weapon_id, i, soldier_class)
+             for i, soldier_class in enumerate(weapon_data.get('soldier_classes', []))]
+        )
+        self.conn.execute('DELETE FROM installed_attachments WHERE weapon_id = ?', (weapon_id,))
+        self.conn.executemany(
+            'INSERT INTO installed_attachments (weapon_id, position, attachment_type, name, data) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [(weapon_id, i, att['attachment_type'], att['name'], json.dumps(att, ensure_ascii=False))
+             for i, att in enumerate(weapon_data.get('attachments', []))]
+        )
+
+    def save_weapon(self, weapon):
+        """保存单个武器（事务内更新武器、兵种和已安装配件）"""
+        return self.save_weapon_data(weapon.to_dict())
+
+    @timed()
+    def save_weapon_data(self, weapon_data):
+        """保存 Weapon.to_dict() 格式的武器数据"""
+        try:
+            with self._lock, self.conn:
+                self._write_weapon(weapon_data)
+            count('SQLiteStore.weapon_rows')
+            return True
+        except sqlite3.Error as e:
+            print(f"保存武器数据时出错: {e}")
+            return False
+
+    def save_weapons(self, weapons):
+        """在一个事务中保存多把武器"""
+        try:
+            with self._lock, self.conn:
+                for weapon in weapons:
+                    self._write_weapon(weapon.to_dict())
+            count('SQLiteStore.weapon_rows', len(weapons))
+            return True
+        except sqlite3.Error as e:
+            print(f"保存武器数据时出错: {e}")
+            return False
+
+    def delete_weapon(self, weapon_name):
+        with self._lock, self.conn:
+            deleted = self.conn.execute('DELETE FROM weapons WHERE name = ?', (weapon_name,)).rowcount
+        return deleted > 0
+
+    @timed()
+    def load_attachments(self):
+        """加载配件数据到 ATTACHMENTS_DATA，之后配件目录的修改都记录到 self.changes"""
+        data = {'common': {}, 'specific': {}}
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT weapon_name, attachment_type, data FROM attachments ORDER BY id'
+            ).fetchall()
+        for weapon_name, attachment_type, record in rows:
+            if weapon_name is None:
+                types = data['common']
+            else:
+                types = data['specific'].setdefault(weapon_name, {})
+            types.setdefault(attachment_type, []).append(json.loads(record))
+        replace_attachments_data(data)
+        self.changes.take()
+        ATTACHMENT_CATALOG.journal = self.changes
+
+    def snapshot_attachments(self):
+        """有待写入的配件变更时返回 save_attachments 的参数（空元组），否则返回 None
+
+        变更在写入时才从队列中取出，合并的多次保存不会丢失其中的变更。
+        """
+        return () if len(self.changes) else None
+
+    def commit_attachments(self):
+        """配件修改后调用：写入待写入的配件变更"""
+        self.save_attachments()
+
+    @timed()
+    def save_attachments(self):
+        """在一个事务中逐行写入配件变更，只触及被修改的配件，与配件总数无关"""
+        entries = self.changes.take()
+        if not entries:
+            return
+        try:
+            with self._lock, self.conn:
+                for entry in entries:
+                    self._apply_change(entry)
+        except sqlite3.Error:
+            self.changes.restore(entries)
+            raise
+        count('SQLiteStore.attachment_rows', len(entries))
+
+    def _find_attachment(self, weapon_name, attachment_type, name):
+        """按 (所属武器, 类型, 名称) 查找配件行，返回 (id, 配件记录) 或 None"""
+        row = self.conn.execute(
+            'SELECT id, data FROM attachments WHERE weapon_name IS ? AND attachment_type = ? AND name = ? '
+            'ORDER BY id LIMIT 1', (weapon_name, attachment_type, name)
+        ).fetchone()
+        return None if row is None else (row[0], json.loads(row[1]))
+
+    def _insert_attachment(self, weapon_name, record):
+        self.conn.execute(
+            'INSERT INTO attachments (weapon_name, attachment_type, name, data) VALUES (?, ?, ?, ?)',
+            (weapon_name, attachment_type_of(record), record['name'], json.dumps(record, ensure_ascii=False))
+        )
+
+    def _apply_change(self, entry):
+        """把一条配件目录的变更记录写入配件表"""
+        op = entry.get('op')
+        if op == 'add':
+            self._insert_attachment(entry.get('weapon'), entry['record'])
+            return
+        found = self._find_attachment(entry.get('weapon'), entry['type'], entry['name'])
+        if found is None:
+            return
+        attachment_id, record = found
+        if op == 'remove':
+            self.conn.execute('DELETE FROM attachments WHERE id = ?', (attachment_id,))
+        elif op == 'update':
+            record.update(entry['changes'])
+            new_weapon = entry.get('new_weapon')
+            if new_weapon != entry.get('weapon') or attachment_type_of(record) != entry['type']:
+                # 与配件目录一致：换了槽位的配件排到新槽位的最后
+                self.conn.execute('DELETE FROM attachments WHERE id = ?', (attachment_id,))
+                self._insert_attachment(new_weapon, record)
+            else:
+                self.conn.execute(
+                    'UPDATE attachments SET name = ?, data = ? WHERE id = ?',
+                    (record['name'], json.dumps(record, ensure_ascii=False), attachment_id)
+                )
+
+    def replace_attachments(self, data=None):
+        """在一个事务中用配件数据整体替换配件表（data 为空时保存 ATTACHMENTS_DATA，迁移时使用）"""
+        if data is None:
+            data = ATTACHMENTS_DATA
+        rows = []
+        for attachment_type, records in data.get('common', {}).items():
+            rows.extend((None, attachment_type, record['name'], json.dumps(record, ensure_ascii=False))
+                        for record in records)
+        for weapon_name, types in data.get('specific', {}).items():
+            for attachment_type, records in types.items():
+                rows.extend((weapon_name, attachment_type, record['name'],
+                             json.dumps(record, ensure_ascii=False)) for record in records)
+        self.changes.take()
+        with self._lock, self.conn:
+            self.conn.execute('DELETE FROM attachments')
+            self.conn.executemany(
+                'INSERT INTO attachments (weapon_name, attachment_type, name, data) VALUES (?, ?, ?, ?)',
+                rows
+            )
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def open_store(location='weapons', attachments_file='attachments_data.json'):
+    """根据位置打开存储：.db/.sqlite 文件使用 SQLite，其他视为JSON武器目录"""
+    if location.lower().endswith(SQLITE_EXTENSIONS):
+        return SQLiteStore(location)
+    return JsonDirectoryStore(location, attachments_file)
+
+
+def default_store():
+    """打开默认存储，可通过环境变量 SJZPQ_STORE 指定（默认为 weapons 目录）"""
+    return open_store(os.environ.get('SJZPQ_STORE', 'weapons'))
+
+
+def migrate_store(source, target):
+    """把 source 中的全部武器和配件数据复制到 target，返回复制的武器数量"""
+    weapons = source.load_weapons()
+    source.load_attachments()
+    target.save_weapons(weapons)
+    target.replace_attachments()
+    return len(weapons)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="枪械数据存储工具")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = subparsers.add_parser('migrate', help="在JSON目录和SQLite数据库之间转换数据")
+    migrate_parser.add_argument('source', help="源位置（武器目录或 .db 文件）")
+    migrate_parser.add_argument('target', help="目标位置（武器目录或 .db 文件）")
+    migrate_parser.add_argument('--source-attachments', default='attachments_data.json',
+                                help="源为JSON目录时的配件数据文件")
+    migrate_parser.add_argument('--target-attachments', default='attachments_data.json',
+                                help="目标为JSON目录时的配件数据文件")
+    args = parser.parse_args(argv)
+
+    if args.command == 'migrate':
+        source = open_store(args.source, args.source_attachments)
+        target = open_store(args.target, args.target_attachments)
+        try:
+            count = migrate_store(source, target)
+        finally:
+            source.close()
+            target.close()
+        print(f"已迁移 {count} 把枪械及配件数据: {args.source} -> {args.target}")
+
+
+if __name__ == "__main__":
+    main()
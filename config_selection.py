@@ -0,0 +1,72 @@
+class ConfigSelection:
+    """枪械配置页的选择状态：当前枪械、当前配件槽位和高亮的候选配件
+
+    控件不再从各自的选中状态反推当前选择，而是修改这里的状态，并通过 observe 注册的
+    回调刷新显示。每次修改最多通知一次，回调参数为发生变化的字段名集合
+    （'weapon'、'slot'、'candidate'）；状态没有变化时不通知。
+    """
+
+    def __init__(self):
+        self.weapon = None
+        self.slot = None  # 配件类型名称
+        self.candidate = None  # 候选配件名称
+        self._observers = []
+
+    def observe(self, callback):
+        """注册回调 callback(变化的字段名集合)"""
+        self._observers.append(callback)
+
+    def _notify(self, changed):
+        if changed:
+            for callback in self._observers:
+                callback(changed)
+
+    def select_weapon(self, weapon):
+        """切换枪械；换成另一把（名称不同的）枪械时清空槽位和候选配件
+
+        同名武器（例如文件被外部修改后重新加载的对象）保留槽位和候选配件。
+        """
+        if weapon is self.weapon:
+            return
+        changed = {'weapon'}
+        if weapon is None or self.weapon is None or weapon.name != self.weapon.name:
+            changed |= self._clear_slot()
+        self.weapon = weapon
+        self._notify(changed)
+
+    def select_slot(self, slot):
+        """切换配件槽位（None 表示不选择），同时清空候选配件"""
+        if self.weapon is None:
+            slot = None
+        if slot == self.slot:
+            return
+        changed = {'slot'}
+        if self.candidate is not None:
+            changed.add('candidate')
+        self.slot = slot
+        self.candidate = None
+        self._notify(changed)
+
+    def select_candidate(self, name):
+        """高亮候选配件（None 表示不选择）"""
+        if self.slot is None:
+            name = None
+        if name == self.candidate:
+            return
+        self.candidate = name
+        self._notify({'candidate'})
+
+    def weapon_modified(self):
+        """当前枪械的配件或属性被修改后调用"""
+        if self.weapon is not None:
+            self._notify({'weapon'})
+
+    def _clear_slot(self):
+        changed = set()
+        if self.slot is not None:
+            changed.add('slot')
+        if self.candidate is not None:
+            changed.add('candidate')
+        self.slot = None
+        self.candidate = None
+        return changed
@@ -0,0 +1,174 @@
+import atexit
+import cProfile
+import io
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from functools import wraps
+
+# 设置环境变量 SJZPQ_PROFILE=1 启用；SJZPQ_PROFILE_REPORT 指定报告文件（默认输出到 stderr）
+ENABLED = os.environ.get('SJZPQ_PROFILE', '') not in ('', '0')
+REPORT_PATH = os.environ.get('SJZPQ_PROFILE_REPORT')
+
+_BUCKETS = 40  # 第 i 个桶记录 [2^(i-1), 2^i) 微秒的调用
+
+
+class Histogram:
+    """单个计时点的延迟直方图，按 2 的幂划分微秒桶"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.buckets = [0] * _BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        self.buckets[min(int(seconds * 1e6).bit_length(), _BUCKETS - 1)] += 1
+
+    def percentile(self, q):
+        """近似分位数（秒）：所在桶的上界，不超过最大值"""
+        target = q / 100 * self.count
+        running = 0
+        for i, n in enumerate(self.buckets):
+            running += n
+            if n and running >= target:
+                return min(2 ** i / 1e6, self.max)
+        return self.max
+
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_capture = None  # 正在进行的采集: (cProfile.Profile, 是否由本模块启动了 tracemalloc)
+
+
+def record(name, seconds):
+    """记录一次耗时（未启用时什么也不做）"""
+    if not ENABLED:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(seconds)
+
+
+def count(name, n=1):
+    """计数器加 n（未启用时什么也不做）"""
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def timed(name=None):
+    """装饰器：启用时记录每次调用的耗时；未启用时原样返回函数，没有任何额外开销"""
+    def decorator(func):
+        if not ENABLED:
+            return func
+        key = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(key, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def capturing():
+    return _capture is not None
+
+
+def start_capture():
+    """开始 cProfile 和 tracemalloc 采集（cProfile 只统计调用本函数的线程）"""
+    global _capture
+    if _capture is not None:
+        return
+    started_tracemalloc = not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    _capture = (profiler, started_tracemalloc)
+    profiler.enable()
+
+
+def stop_capture(limit=25):
+    """结束采集，返回耗时最多的函数和分配内存最多的代码行的文本报告；没有在采集时返回 None"""
+    global _capture
+    if _capture is None:
+        return None
+    profiler, started_tracemalloc = _capture
+    _capture = None
+    profiler.disable()
+    snapshot = tracemalloc.take_snapshot()
+    if started_tracemalloc:
+        tracemalloc.stop()
+
+    out = io.StringIO()
+    out.write("== cProfile（按累计耗时）==\n")
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+    out.write("== tracemalloc（按分配内存）==\n")
+    for stat in snapshot.statistics('lineno')[:limit]:
+        out.write(f"{stat}\n")
+    return out.getvalue()
+
+
+def toggle_capture():
+    """开始采集，或结束采集并输出报告"""
+    if _capture is None:
+        start_capture()
+        emit("== 开始采集 cProfile/tracemalloc ==\n")
+    else:
+        emit(stop_capture())
+
+
+def report():
+    """所有计时点和计数器的文本报告，计时点按总耗时降序排列"""
+    with _lock:
+        histograms = sorted(_histograms.items(), key=lambda item: item[1].total, reverse=True)
+        counters = sorted(_counters.items())
+    lines = ["== 计时（毫秒）==",
+             f"{'名称':<40}{'次数':>8}{'总计':>10}{'平均':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'最大':>9}"]
+    for name, h in histograms:
+        values = [h.total, h.total / h.count, h.percentile(50), h.percentile(90), h.percentile(99), h.max]
+        lines.append(f"{name:<40}{h.count:>8}" + ''.join(f"{value * 1000:>{10 if i == 0 else 9}.2f}"
+                                                        for i, value in enumerate(values)))
+    if counters:
+        lines.append("== 计数 ==")
+        lines.extend(f"{name:<40}{value:>8}" for name, value in counters)
+    return '\n'.join(lines) + '\n'
+
+
+def emit(text):
+    """把报告写入 SJZPQ_PROFILE_REPORT 指定的文件（追加），未指定时写入 stderr"""
+    if REPORT_PATH:
+        with open(REPORT_PATH, 'a', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        sys.stderr.write(text)
+
+
+def _report_at_exit():
+    if _capture is not None:
+        emit(stop_capture())
+    emit(report())
+
+
+if ENABLED:
+    atexit.register(_report_at_exit)
+    # kill -USR1 <pid> 开始/结束采集（只能在主线程中注册信号处理函数）
+    if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, lambda signum, frame: toggle_capture())
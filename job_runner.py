@@ -0,0 +1,183 @@
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+
+
+class Job:
+    """一个后台任务
+
+    回调都在 Tk 线程中调用：
+    - on_partial(部分结果)：任务流式返回的部分结果
+    - on_progress(进度)：进度为 0~1 的小数，None 表示无法估计
+    - on_done(结果)、on_error(异常)、on_cancel()：任务结束时三者之一被调用一次
+    """
+
+    def __init__(self, on_partial=None, on_progress=None, on_done=None, on_error=None, on_cancel=None):
+        self.on_partial = on_partial
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self.finished = False
+        self._cancel = threading.Event()
+        self._futures = []
+        self._queue = None
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def running(self):
+        return not self.finished
+
+    def cancel(self):
+        """请求取消：尚未开始的子任务不再运行，正在运行的任务在下次 check() 时中止"""
+        self._cancel.set()
+        for future in self._futures:
+            future.cancel()
+
+    def check(self):
+        """在任务函数中定期调用，已取消时抛出 JobCancelled"""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def report(self, partial=None, progress=None):
+        """在任务函数中调用，把部分结果和进度发送给 Tk 线程"""
+        self._queue.put((self, 'partial', (partial, progress)))
+
+
+class JobRunner:
+    """在线程池或进程池中运行耗时计算，通过 root.after 定时轮询队列把结果交给 Tk 线程
+
+    Tk 控件只能在主线程中访问，任务函数不能直接修改界面，只能通过 Job.report 和
+    返回值传递结果。
+    """
+
+    def __init__(self, root, max_workers=None, poll_interval=50):
+        self.root = root
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self._queue = queue.SimpleQueue()
+        self._threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='JobRunner')
+        self._processes = None  # 第一次需要时创建
+        self._jobs = set()
+        self._polling = False
+
+    def start(self, task, *args, **callbacks):
+        """在线程中运行 task(job, *args)，返回 Job
+
+        task 可以通过 job.report 流式返回部分结果，并应定期调用 job.check() 以响应取消。
+        """
+        job = self._new_job(callbacks)
+        job._futures.append(self._threads.submit(self._run, job, task, args))
+        return job
+
+    def map(self, func, items, processes=False, **callbacks):
+        """对每一项调用 func(项)，每完成一项就以 (下标, 结果) 作为部分结果返回，返回 Job
+
+        processes=True 时在进程池中运行（func 和各项必须可以被 pickle），适合不释放 GIL
+        的纯 Python 计算。取消后尚未开始的项不再运行。
+        """
+        job = self._new_job(callbacks)
+        items = list(items)
+        if not items:
+            self._queue.put((job, 'done', []))
+            return job
+        if processes and self._processes is None:
+            self._processes = ProcessPoolExecutor(max_workers=self.max_workers)
+        executor = self._processes if processes else self._threads
+        remaining = [len(items)]
+        lock = threading.Lock()
+
+        def on_future_done(future, index):
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None:
+                self._queue.put((job, 'error', error))
+                job.cancel()  # 先放入错误再取消，保证错误先被处理
+                return
+            # 在锁内放入队列，保证 done 排在所有部分结果之后
+            with lock:
+                remaining[0] -= 1
+                left = remaining[0]
+                self._queue.put((job, 'partial', ((index, future.result()), 1 - left / len(items))))
+                if left == 0:
+                    self._queue.put((job, 'done', None))
+
+        for index, item in enumerate(items):
+            future = executor.submit(func, item)
+            job._futures.append(future)
+            future.add_done_callback(lambda future, index=index: on_future_done(future, index))
+        return job
+
+    def _new_job(self, callbacks):
+        job = Job(**callbacks)
+        job._queue = self._queue
+        self._jobs.add(job)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self._poll)
+        return job
+
+    def _run(self, job, task, args):
+        try:
+            result = task(job, *args)
+        except JobCancelled:
+            self._queue.put((job, 'cancel', None))
+        except Exception as e:
+            self._queue.put((job, 'error', e))
+        else:
+            self._queue.put((job, 'done', result))
+
+    def _poll(self):
+        while True:
+            try:
+                job, kind, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._dispatch(job, kind, payload)
+        # 被取消的任务不等待仍在运行的子任务，直接结束
+        for job in [job for job in self._jobs if job.cancelled and not job.finished]:
+            self._finish(job)
+            if job.on_cancel is not None:
+                job.on_cancel()
+        if self._jobs:
+            self.root.after(self.poll_interval, self._poll)
+        else:
+            self._polling = False
+
+    def _dispatch(self, job, kind, payload):
+        if job.finished or (job.cancelled and kind != 'error'):
+            return
+        if kind == 'partial':
+            partial, progress = payload
+            if partial is not None and job.on_partial is not None:
+                job.on_partial(partial)
+            if job.on_progress is not None:
+                job.on_progress(progress)
+            return
+        self._finish(job)
+        if kind == 'done' and job.on_done is not None:
+            job.on_done(payload)
+        elif kind == 'error' and job.on_error is not None:
+            job.on_error(payload)
+        elif kind == 'cancel' and job.on_cancel is not None:
+            job.on_cancel()
+
+    def _finish(self, job):
+        job.finished = True
+        self._jobs.discard(job)
+
+    def shutdown(self):
+        """取消所有任务并关闭线程池和进程池"""
+        for job in list(self._jobs):
+            job.cancel()
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
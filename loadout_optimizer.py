@@ -0,0 +1,144 @@
+import copy
+import heapq
+import itertools
+from weapon_system import (ATTACHMENT_CATALOG, ATTACHMENT_RULES, Attachment, MOD_FIELDS, STAT_FIELDS, STAT_KEYS,
+                           get_available_attachments)
+from stat_kernel import build_stats, finish, mods_table, resolve_mode, start, stat_bounds, step
+
+
+def build_attachment(record, slot):
+    """根据配件记录创建 Attachment 对象（与 add_config_attachment 的构造方式一致）"""
+    return Attachment(
+        name=record['name'],
+        attachment_type=slot,
+        recoil_mod=record.get('recoil_mod', 0),
+        handling_mod=record.get('handling_mod', 0),
+        stability_mod=record.get('stability_mod', 0),
+        hip_fire_mod=record.get('hip_fire_mod', 0),
+        can_mount_grip=record.get('can_mount_grip', False)
+    )
+
+
+def snapshot_loadout(weapon):
+    """复制武器的基础属性和各槽位可用配件的记录，返回 (基础属性, {槽位: [(配件ID, 配件记录), ...]})
+
+    在修改配件目录和武器的线程（界面线程）中调用，把结果交给后台计算，
+    计算期间对目录或武器的修改不会影响正在进行的搜索。
+    """
+    base = [getattr(weapon, field) for field in STAT_FIELDS]
+    parts = {
+        slot: [(ATTACHMENT_CATALOG.id_of(record), copy.deepcopy(record))
+               for record in get_available_attachments(weapon.name, slot)]
+        for slot in ATTACHMENT_RULES.search_order()
+    }
+    return base, parts
+
+
+def optimize_loadout(weapon, weights=None, top_k=5, check=None, mode=None, snapshot=None):
+    """搜索武器的全部合法配件组合，返回加权得分最高的 top_k 套配装
+
+    weights 为 {属性名: 权重} 字典，属性名取自 STAT_KEYS，未给出的属性权重为 0；
+    不传时四项属性权重均为 1。结果按得分从高到低排列，每项为
+    {'score': 得分, 'attachments': [Attachment, ...], 'stats': 最终属性字典}。
+
+    配装规则与 Weapon.add_attachment 相同，由 ATTACHMENT_RULES 判定（每个槽位最多
+    一个配件、弹鼓与弹匣座互斥、握把座需要可安装握把座的后握把等）。搜索使用分支
+    定界，上界由剩余槽位每项属性的最大增益（或最大减益）给出。属性计算方式 mode 见
+    stat_kernel（默认与 get_modified_stats 相同），结果的属性由 build_stats 统一计算。
+
+    check 为可选的无参函数，每个搜索节点调用一次，可以抛出异常中止搜索
+    （例如后台任务的 Job.check）。在后台线程中搜索时应传入在界面线程中取得的
+    snapshot（见 snapshot_loadout），不传时在调用线程中读取武器和配件目录。
+    """
+    if weights is None:
+        weights = {key: 1.0 for key in STAT_KEYS}
+    w = [float(weights.get(key, 0)) for key in STAT_KEYS]
+    mode = resolve_mode(mode)
+    base, parts = snapshot if snapshot is not None else snapshot_loadout(weapon)
+
+    # 前置配件的槽位排在依赖它的槽位之前，因此前置条件在到达后一个槽位时即可判定；
+    # 互斥关系在两个槽位中后到达的一个判定。每个候选配件的状态位和互斥掩码预先算好，
+    # 搜索中只做位运算
+    rules = ATTACHMENT_RULES
+    slots = rules.search_order()
+    candidates = []
+    for slot in slots:
+        options = []
+        for _, record in parts[slot]:
+            mods = tuple(float(record.get(field, 0)) for field in MOD_FIELDS)
+            bits = rules.bits(slot, record)
+            options.append((mods, record, bits, rules.blockers(bits)))
+        # 先尝试乐观收益高的配件，使堆尽早被较优解填满，提高剪枝效率
+        options.sort(key=lambda item: -sum(wi * m for wi, m in zip(w, item[0])))
+        options.append(((0.0, 0.0, 0.0, 0.0), None, 0, 0))  # 该槽位留空
+        candidates.append(options)
+    # 候选序号 k 的配件在表中的序号为 k + 1，留空为 0
+    table = mods_table([[option[0] for option in options[:-1]] for options in candidates])
+
+    # 后缀上界：从第 i 个槽位开始，每项属性最多还能增加/减少多少
+    n = len(slots)
+    gain = [[0.0] * 4 for _ in range(n + 1)]
+    loss = [[0.0] * 4 for _ in range(n + 1)]
+    for i in range(n - 1, -1, -1):
+        for s in range(4):
+            values = [option[0][s] for option in candidates[i]]
+            gain[i][s] = gain[i + 1][s] + max(0.0, max(values))
+            loss[i][s] = loss[i + 1][s] + max(0.0, -min(values))
+
+    def upper_bound(i, values):
+        bound = 0.0
+        for s in range(4):
+            low, high = stat_bounds(values[s], gain[i][s], loss[i][s], mode)
+            bound += w[s] * (high if w[s] >= 0 else low)
+        return bound
+
+    heap = []  # 最小堆，保存 (得分, 序号, 配装)
+    counter = itertools.count()
+    chosen = []
+
+    def search(i, values, state):
+        if check is not None:
+            check()
+        if len(heap) >= top_k and upper_bound(i, values) <= heap[0][0]:
+            return
+        if i == n:
+            score = sum(wi * v for wi, v in zip(w, finish(values, mode)))
+            entry = (score, next(counter), list(chosen))
+            if len(heap) < top_k:
+                heapq.heappush(heap, entry)
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+            return
+
+        slot = slots[i]
+        for k, (mods, record, bits, blockers) in enumerate(candidates[i]):
+            if record is None:
+                search(i + 1, values, state)
+                continue
+            if not rules.allows(state, slot, blockers):
+                continue
+            chosen.append((i, k))
+            search(i + 1, step(values, mods, mode), state | bits)
+            chosen.pop()
+
+    if top_k > 0:
+        search(0, start(base), 0)
+
+    entries = sorted(heap, key=lambda e: (-e[0], e[1]))
+    if not entries:
+        return []
+    # 最终属性按配装的候选序号矩阵一次算出
+    builds = [[0] * n for _ in entries]
+    for row, (_, _, build) in zip(builds, entries):
+        for i, k in build:
+            row[i] = k + 1
+    stats = build_stats(base, table, builds, mode)
+
+    results = []
+    for (score, _, build), values in zip(entries, stats.tolist()):
+        results.append({
+            'score': score,
+            'attachments': [build_attachment(candidates[i][k][1], slots[i]) for i, k in build],
+            'stats': dict(zip(STAT_KEYS, values))
+        })
+    return results
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+from instrumentation import count
+
+# 清单文件的后缀（不以 .json 结尾，避免被当作武器文件加载）
+MANIFEST_SUFFIX = '.manifest'
+
+
+def manifest_path(path):
+    """目录或文件对应的清单文件路径：与其并列的隐藏文件，如 weapons -> .weapons.manifest"""
+    path = os.path.normpath(path)
+    return os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}{MANIFEST_SUFFIX}')
+
+
+def content_hash(raw):
+    """文件内容的哈希值"""
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+class ManifestCache:
+    """文件清单缓存：记录每个文件的 mtime、大小、内容哈希和解析结果
+
+    mtime 和大小都没有变化的文件直接使用缓存的解析结果，只需一次 stat；
+    变化了的文件重新读取后先比较内容哈希，内容相同（例如只是被 touch）时仍使用缓存。
+    清单损坏或版本不符时视为空清单重新建立。
+    """
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}  # {文件名: {'mtime_ns', 'size', 'hash', 'record'}}
+        self.dirty = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.entries = data['files']
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+    def get(self, key, stat):
+        """mtime 和大小与缓存一致时返回缓存的解析结果，否则返回 None"""
+        entry = self.entries.get(key)
+        if entry is not None and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            count('ManifestCache.stat_hit')
+            return entry['record']
+        return None
+
+    def get_by_hash(self, key, digest):
+        """内容哈希与缓存一致时返回缓存的解析结果，否则返回 None"""
+        entry = self.entries.get(key)
+        if entry is not None and entry['hash'] == digest:
+            count('ManifestCache.hash_hit')
+            return entry['record']
+        count('ManifestCache.miss')
+        return None
+
+    def put(self, key, stat, digest, record):
+        self.entries[key] = {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'hash': digest,
+            'record': record
+        }
+        self.dirty = True
+
+    def retain(self, keys):
+        """删除不在 keys 中的文件（已被删除或加载失败的文件）"""
+        keys = set(keys)
+        for key in [key for key in self.entries if key not in keys]:
+            del self.entries[key]
+            self.dirty = True
+
+    def save(self):
+        """清单有变化时写回文件（先写临时文件再替换，写入失败时忽略，下次重新建立）"""
+        if not self.dirty:
+            return
+        tmp_path = f'{self.path}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.VERSION, 'files': self.entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError:
+            pass
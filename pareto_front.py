@@ -0,0 +1,190 @@
+import numpy as np
+from weapon_system import ATTACHMENT_RULES, MOD_FIELDS, STAT_KEYS
+from loadout_optimizer import build_attachment, snapshot_loadout
+from stat_kernel import finish, resolve_mode, start, step
+
+
+def dominates(a, b):
+    """a 的每项属性都不低于 b（相同的属性向量也算支配，前沿中只保留一个）"""
+    return all(x >= y for x, y in zip(a, b))
+
+
+def skyline(entries):
+    """[(values, item), ...] 中的非支配条目（相同的属性向量只保留最先出现的一个）
+
+    按属性和从大到小处理：支配者的属性和不小于被支配者，因此每个条目只需与已接受的
+    条目比较，比较用 NumPy 向量化。
+    """
+    if len(entries) <= 1:
+        return list(entries)
+    order = sorted(range(len(entries)), key=lambda i: -sum(entries[i][0]))
+    accepted = np.empty((len(entries), len(entries[0][0])))
+    result = []
+    for i in order:
+        values = entries[i][0]
+        if result and (accepted[:len(result)] >= values).all(axis=1).any():
+            continue
+        accepted[len(result)] = values
+        result.append(entries[i])
+    return result
+
+
+def skyline_2d(points):
+    """二维点集 [(x, y), ...] 中非支配点的序号，按 x 从大到小排列"""
+    order = sorted(range(len(points)), key=lambda i: (-points[i][0], -points[i][1]))
+    result = []
+    best_y = float('-inf')
+    for i in order:
+        if points[i][1] > best_y:
+            result.append(i)
+            best_y = points[i][1]
+    return result
+
+
+class ParetoFront:
+    """武器配装在四项属性（STAT_KEYS）上的帕累托前沿：所有不被其他配装支配的配装
+
+    属性计算方式 mode 见 stat_kernel（默认与 Weapon.get_modified_stats 相同），
+    配装规则由 ATTACHMENT_RULES 判定。两种计算方式下最终属性都随部分配装的属性单调不减，因此：
+
+    - 同一槽位中兼容性相同（状态位和互斥掩码都相同）的配件，若每项加成都不低于另一个，
+      后者可以直接丢弃（逐槽位支配剪枝）；
+    - 按槽位逐个扩展的部分配装，只要对后续槽位的兼容状态相同，被支配的部分配装
+      也可以丢弃，每一步只保留各兼容状态下的非支配集。
+
+    配件目录只新增配件时，sync() 只计算包含新配件的配装并合并进已有前沿；
+    配件被删除或修改时重新计算整个前沿。配件按配件目录的ID识别。
+
+    计算只使用 snapshot_loadout 复制出的武器属性和配件记录；在后台线程中计算时，
+    应在界面线程中取得 snapshot 后传给构造函数和 sync()，不传时在调用线程中读取。
+    check 为可选的无参函数，搜索中定期调用，可以抛出异常中止计算（例如 Job.check）。
+    """
+
+    def __init__(self, weapon, check=None, mode=None, snapshot=None):
+        self.weapon = weapon
+        self.check = check
+        self.mode = resolve_mode(mode)
+        self.rules = ATTACHMENT_RULES
+        self.slots = self.rules.search_order()
+        self.snapshot = snapshot if snapshot is not None else snapshot_loadout(weapon)
+        self.base = start(self.snapshot[0])
+        self.front = []  # [(属性元组, ((槽位, 配件记录), ...)), ...]
+        self._options = {}  # {槽位: [(加成, 配件记录, 状态位, 互斥掩码), ...]}，已做逐槽位剪枝
+        self._seen = {}  # {槽位: {配件ID: 配件记录}}，用于发现目录变化
+        self.recompute()
+
+    def _option(self, slot, record):
+        mods = tuple(float(record.get(field, 0)) for field in MOD_FIELDS)
+        bits = self.rules.bits(slot, record)
+        return mods, record, bits, self.rules.blockers(bits)
+
+    def _add_option(self, slot, option):
+        """把配件加入槽位的候选列表，被同槽位同兼容性的配件支配时返回 False"""
+        options = self._options[slot]
+        mods, _, bits, blockers = option
+        same = [o for o in options if o[2] == bits and o[3] == blockers]
+        if any(dominates(o[0], mods) for o in same):
+            return False
+        options[:] = [o for o in options
+                      if not (o[2] == bits and o[3] == blockers and dominates(mods, o[0]))]
+        options.append(option)
+        return True
+
+    def recompute(self):
+        """按 snapshot 中的配件重新计算整个前沿"""
+        self._options = {}
+        self._seen = {}
+        for slot in self.slots:
+            self._options[slot] = []
+            self._seen[slot] = {}
+            for attachment_id, record in self.snapshot[1][slot]:
+                self._seen[slot][attachment_id] = record
+                self._add_option(slot, self._option(slot, record))
+        self.front = skyline(self._search({}))
+
+    def add_part(self, slot, attachment_id, record):
+        """配件目录新增了该武器可用的配件后调用，增量更新前沿，返回前沿是否变化
+
+        新的非支配配装一定包含新配件，因此只搜索该槽位固定为新配件的配装，
+        再与已有前沿合并（被新配装支配的旧配装被移除）。
+        """
+        option = self._option(slot, record)
+        self._seen[slot][attachment_id] = record
+        if not self._add_option(slot, option):
+            return False
+        # 旧配装在前：与新配装属性相同时保留旧配装
+        merged = skyline(self.front + self._search({slot: [option]}))
+        changed = {id(entry) for entry in merged} != {id(entry) for entry in self.front}
+        self.front = merged
+        return changed
+
+    def sync(self, snapshot=None):
+        """与配件目录（以及武器的基础属性）同步，返回前沿是否可能变化
+
+        snapshot 为 snapshot_loadout 的结果，不传时在调用线程中读取武器和配件目录。
+        """
+        self.snapshot = snapshot if snapshot is not None else snapshot_loadout(self.weapon)
+        base = start(self.snapshot[0])
+        if base != self.base:
+            self.base = base
+            self.recompute()
+            return True
+        added = []
+        for slot in self.slots:
+            seen = self._seen[slot]
+            current = set()
+            for attachment_id, record in self.snapshot[1][slot]:
+                current.add(attachment_id)
+                known = seen.get(attachment_id)
+                if known is None:
+                    added.append((slot, attachment_id, record))
+                elif known != record:  # 配件被修改（包括改名）
+                    self.recompute()
+                    return True
+            if not current.issuperset(seen):  # 有配件被删除
+                self.recompute()
+                return True
+        changed = False
+        for slot, attachment_id, record in added:
+            changed = self.add_part(slot, attachment_id, record) or changed
+        return changed
+
+    def _search(self, fixed):
+        """逐槽位扩展部分配装，返回所有兼容状态下的非支配完整配装及其最终属性
+
+        fixed 为 {槽位: [候选]}，给出的槽位只使用这些候选（不能留空）。
+        """
+        rules = self.rules
+        partial = {0: [(self.base, ())]}  # {兼容状态: 非支配的部分配装}
+        for i, slot in enumerate(self.slots):
+            if slot in fixed:
+                options = fixed[slot]
+            else:
+                options = self._options[slot] + [((0.0, 0.0, 0.0, 0.0), None, 0, 0)]  # 该槽位留空
+            # 只保留会影响后续槽位的状态位，对后续无影响的不同状态可以合并比较
+            keep = rules.relevant_mask(self.slots[i + 1:])
+            extended = {}
+            for state, entries in partial.items():
+                for mods, record, bits, blockers in options:
+                    if self.check is not None:
+                        self.check()
+                    if record is not None and not rules.allows(state, slot, blockers):
+                        continue
+                    group = extended.setdefault((state | bits) & keep, [])
+                    if record is None:
+                        group.extend(entries)
+                        continue
+                    installed = ((slot, record),)
+                    for values, build in entries:
+                        group.append((step(values, mods, self.mode), build + installed))
+            partial = {state: skyline(group) for state, group in extended.items()}
+        return [(finish(values, self.mode), build) for entries in partial.values() for values, build in entries]
+
+    def points(self):
+        """前沿中的配装，格式为 [{'attachments': [Attachment, ...], 'stats': 最终属性字典}, ...]"""
+        return [{'attachments': [build_attachment(record, slot) for slot, record in build],
+                 'stats': dict(zip(STAT_KEYS, values))}
+                for values, build in self.front]
+
+    def __len__(self):
+        return len(self.front)
@@ -0,0 +1,113 @@
+import atexit
+import copy
+import threading
+import time
+from instrumentation import count
+
+
+class SaveQueue:
+    """后台保存队列：在写入线程中保存武器和配件数据，不阻塞 Tk 事件循环
+
+    同一把武器（或配件数据）在 delay 秒内的多次保存合并为一次写入，写入的是最后
+    一次提交时的快照。快照在调用线程中生成，写入线程不会访问 Weapon 对象。
+    close() 会写完所有待保存的数据，程序退出时也会自动调用。
+    """
+
+    def __init__(self, store, delay=0.5):
+        self.store = store
+        self.delay = delay
+        self._pending = {}  # {键: (最晚写入时间, 写入函数, 参数)}
+        self._cond = threading.Condition()
+        # 写入时持有，保证同一份数据的新快照不会被旧快照覆盖
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='SaveQueue', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, key, write, *args):
+        """提交一次写入；同一 key 尚未写入的旧请求被替换，但写入时间不推迟"""
+        with self._cond:
+            if not self._closed:
+                if key in self._pending:
+                    count('SaveQueue.coalesced')
+                deadline = self._pending[key][0] if key in self._pending else time.monotonic() + self.delay
+                self._pending[key] = (deadline, write, args)
+                self._cond.notify()
+                return
+        # 队列已关闭时直接写入
+        with self._write_lock:
+            self._write(write, args)
+
+    def save_weapon(self, weapon):
+        """保存武器（在后台写入）"""
+        self.submit(('weapon', weapon.name), self.store.save_weapon_data, copy.deepcopy(weapon.to_dict()))
+
+    def save_attachments(self):
+        """配件修改后调用：存储需要写入快照时在后台写入"""
+        snapshot = self.store.snapshot_attachments()
+        if snapshot is not None:
+            self.submit(('attachments',), self.store.save_attachments, *snapshot)
+
+    def delete_weapon(self, weapon_name):
+        """删除武器：丢弃尚未写入的保存后立即删除，返回是否删除成功"""
+        with self._cond:
+            self._pending.pop(('weapon', weapon_name), None)
+            self._write_lock.acquire()
+        try:
+            return self.store.delete_weapon(weapon_name)
+        finally:
+            self._write_lock.release()
+
+    def has_pending(self, key):
+        """key 是否有尚未写入的保存"""
+        with self._cond:
+            return key in self._pending
+
+    def flush(self):
+        """在当前线程写完所有待保存的数据"""
+        with self._cond:
+            items = sorted(self._pending.values(), key=lambda item: item[0])
+            self._pending.clear()
+            self._write_lock.acquire()
+        try:
+            for _, write, args in items:
+                self._write(write, args)
+        finally:
+            self._write_lock.release()
+
+    def close(self):
+        """写完所有待保存的数据并停止写入线程"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+        self._thread.join()
+
+    @staticmethod
+    def _write(write, args):
+        try:
+            write(*args)
+        except Exception as e:
+            print(f"\n警告：后台保存数据时出错: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._pending:
+                        if self._closed:
+                            return
+                        self._cond.wait()
+                        continue
+                    key, (deadline, write, args) = min(self._pending.items(), key=lambda item: item[1][0])
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or self._closed:
+                        break
+                    self._cond.wait(remaining)
+                del self._pending[key]
+                self._write_lock.acquire()
+            try:
+                self._write(write, args)
+            finally:
+                self._write_lock.release()
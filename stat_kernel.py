@@ -0,0 +1,102 @@
+import os
+import numpy as np
+
+# 属性计算方式：
+# - SUM（默认）：先把全部配件加成求和，再截断到 [STAT_MIN, STAT_MAX] 一次，结果与安装顺序无关，
+#   每个槽位的贡献可以单独缓存，一批配装可以一次向量化计算
+# - LEGACY：旧规则，每安装一个配件后截断一次，结果与安装顺序有关（没有配件时不截断基础属性）
+SUM = 'sum'
+LEGACY = 'legacy'
+MODES = (SUM, LEGACY)
+
+STAT_MIN = 0
+STAT_MAX = 100
+
+# 设置环境变量 SJZPQ_STAT_MODE=legacy 使用旧规则
+STAT_MODE = os.environ.get('SJZPQ_STAT_MODE', SUM)
+if STAT_MODE not in MODES:
+    print(f"警告：未知的属性计算方式 {STAT_MODE}，使用 {SUM}")
+    STAT_MODE = SUM
+
+
+def resolve_mode(mode=None):
+    """mode 为空时返回 STAT_MODE，未知的计算方式抛出 ValueError"""
+    if mode is None:
+        return STAT_MODE
+    if mode not in MODES:
+        raise ValueError(f"未知的属性计算方式: {mode}")
+    return mode
+
+
+def clamp(value):
+    return max(STAT_MIN, min(STAT_MAX, value))
+
+
+def start(base):
+    """逐个配件累加时的初始值（之后 SUM 方式为未截断的和，LEGACY 方式为当前属性）"""
+    return tuple(base)
+
+
+def step(values, mods, mode=None):
+    """在 start/step 的结果上再安装一个配件"""
+    if resolve_mode(mode) == SUM:
+        return tuple(v + m for v, m in zip(values, mods))
+    return tuple(clamp(v + m) for v, m in zip(values, mods))
+
+
+def finish(values, mode=None):
+    """由 start/step 的结果得到最终属性"""
+    if resolve_mode(mode) == SUM:
+        return tuple(clamp(v) for v in values)
+    return tuple(values)
+
+
+def apply_mods(base, mods, mode=None):
+    """单个配装的最终属性，mods 为按安装顺序排列的各配件加成"""
+    mode = resolve_mode(mode)
+    values = start(base)
+    for attachment_mods in mods:
+        values = step(values, attachment_mods, mode)
+    return finish(values, mode)
+
+
+def stat_bounds(value, gain, loss, mode=None):
+    """start/step 的结果为 value、之后的配件最多再增加 gain、减少 loss 时，最终属性的 (下界, 上界)"""
+    low, high = clamp(value - loss), clamp(value + gain)
+    if resolve_mode(mode) == LEGACY:
+        # 尚未安装配件时基础属性没有被截断，全部留空时结果就是它本身
+        low, high = min(low, value), max(high, value)
+    return low, high
+
+
+def mods_table(slot_mods, width=4):
+    """各槽位候选配件的加成 [[(加成, ...), ...], ...] -> (槽位数, 最多候选数 + 1, width) 数组
+
+    每个槽位的第 0 项为全零，表示该槽位留空；第 k 项为第 k 个候选配件（从 1 开始）。
+    """
+    table = np.zeros((len(slot_mods), 1 + max((len(mods) for mods in slot_mods), default=0), width))
+    for s, mods in enumerate(slot_mods):
+        if mods:
+            table[s, 1:len(mods) + 1] = mods
+    return table
+
+
+def build_stats(base, table, builds, mode=None):
+    """一批配装的最终属性
+
+    base 为基础属性，形状 (width,) 或每个配装一行 (n, width)；table 为 mods_table 的结果；
+    builds 为 (n, 槽位数) 的整数矩阵，每行是一个配装在各槽位的候选序号（0 表示留空）。
+    LEGACY 方式按列的顺序安装配件。返回 (n, width) 数组。
+    """
+    builds = np.asarray(builds, dtype=np.intp)
+    base = np.asarray(base, dtype=float)
+    values = np.broadcast_to(base, (builds.shape[0], table.shape[2])).copy()
+    if resolve_mode(mode) == SUM:
+        # 逐槽位按序号取出加成累加，不生成 (n, 槽位数, width) 的中间数组
+        for s in range(table.shape[0]):
+            values += table[s, builds[:, s]]
+        return np.clip(values, STAT_MIN, STAT_MAX, out=values)
+    for s in range(table.shape[0]):
+        installed = (builds[:, s] > 0)[:, None]
+        values = np.where(installed, np.clip(values + table[s, builds[:, s]], STAT_MIN, STAT_MAX), values)
+    return values
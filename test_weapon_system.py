@@ -0,0 +1,43 @@
+import copy
+import unittest
+
+from weapon_system import Attachment, LazyWeapon, Weapon
+
+
+class LazyWeaponTest(unittest.TestCase):
+    def test_stub_fields_survive_hydration(self):
+        weapon = LazyWeapon({'name': 'B', 'weapon_type': '步枪', 'soldier_classes': ['突击'],
+                             'base_damage': 30})
+        weapon.name = 'renamed'
+        weapon.weapon_type = '冲锋枪'
+        weapon.soldier_classes = ['支援']
+        weapon.base_damage = 33
+        self.assertTrue(weapon.loaded)
+        self.assertEqual(weapon.name, 'renamed')
+        self.assertEqual(weapon.weapon_type, '冲锋枪')
+        self.assertEqual(weapon.soldier_classes, ['支援'])
+        self.assertEqual(weapon.base_damage, 33)
+
+
+class AttachmentModsTest(unittest.TestCase):
+    def test_removing_all_attachments_leaves_zero_mods(self):
+        weapon = Weapon('A', '步枪')
+        weapon.add_attachment(Attachment('枪口A', '枪口', recoil_mod=0.1))
+        weapon.add_attachment(Attachment('枪管A', '枪管', recoil_mod=0.2))
+        weapon.remove_attachment('枪口A')
+        weapon.remove_attachment('枪管A')
+        self.assertTrue(all(value == 0 for value in weapon.get_attachment_mods().values()))
+
+
+class WeaponCopyTest(unittest.TestCase):
+    def test_copy_owns_its_row(self):
+        weapon = Weapon('A', '步枪', base_damage=30)
+        clone = copy.copy(weapon)
+        self.assertNotEqual(clone._row, weapon._row)
+        del clone
+        Weapon('B', '步枪', base_damage=99)
+        self.assertEqual(weapon.base_damage, 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import math
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from btk_engine import BODY_PARTS, DAMAGE_FIELDS, falloff_multipliers
+
+MISS = '未命中'
+
+# 默认命中分布：各部位及未命中的概率（不要求总和为1，会自动归一化）
+DEFAULT_HIT_DISTRIBUTION = {
+    '胸部': 0.30,
+    '腹部': 0.25,
+    '手部': 0.20,
+    '脚部': 0.10,
+    MISS: 0.15
+}
+
+PERCENTILES = {'p50': 50, 'p90': 90, 'p99': 99}
+
+# 每轮抽样的数组最多包含的元素数（样本数 × 发数），限制低伤害/高生命值时的内存占用
+MAX_ROUND_ELEMENTS = 2_000_000
+
+
+def _normalize_distribution(distribution):
+    """把命中分布字典转换成与 BODY_PARTS + [未命中] 对齐的概率数组"""
+    keys = BODY_PARTS + [MISS]
+    unknown = set(distribution) - set(keys)
+    if unknown:
+        raise ValueError(f"未知的命中部位: {', '.join(unknown)}。可用部位: {', '.join(keys)}")
+    p = np.array([float(distribution.get(key, 0)) for key in keys])
+    if (p < 0).any() or p.sum() <= 0:
+        raise ValueError("命中概率必须为非负数且总和大于0")
+    return p / p.sum()
+
+
+def _weapon_damage(weapon, distance=None):
+    """武器各部位伤害（最后一项为未命中，伤害为0），可按距离计算衰减"""
+    damage = np.array([getattr(weapon, field) for field in DAMAGE_FIELDS] + [0.0])
+    if distance is not None:
+        damage[:len(DAMAGE_FIELDS)] *= falloff_multipliers([weapon], [distance])[0, 0]
+    return damage
+
+
+def _simulate_shots(damage, p, health, trials, rng, max_shots):
+    """模拟 trials 次交战，返回每次击杀所需的开火数（未能击杀为 inf）"""
+    shots = np.full(trials, np.inf)
+    dealt = np.zeros(trials)
+    active = np.arange(trials)
+
+    # 每轮为所有未击杀的样本一次性抽取若干发，数量取期望击杀发数的1.5倍，
+    # 但每轮的数组不超过 MAX_ROUND_ELEMENTS 个元素（至少每个样本一发）
+    expected = float(damage @ p)
+    if expected <= 0:
+        return shots
+    per_round = max(1, math.ceil(1.5 * health / expected))
+
+    fired = 0
+    while active.size and fired < max_shots:
+        count = min(per_round, max_shots - fired, max(1, MAX_ROUND_ELEMENTS // active.size))
+        hits = rng.choice(len(p), size=(active.size, count), p=p)
+        total = dealt[active, None] + np.cumsum(damage[hits], axis=1)
+        killed = total >= health
+        done = killed.any(axis=1)
+        shots[active[done]] = fired + killed[done].argmax(axis=1) + 1
+        dealt[active] = total[:, -1]
+        active = active[~done]
+        fired += count
+    return shots
+
+
+def _summarize(shots, fire_rate):
+    """把开火数换算成击杀时间（毫秒）并统计分布
+
+    mean 只统计完成击杀的样本（没有完成击杀的样本时为 nan）；分位数统计全部样本，
+    未能击杀的样本按 inf 计。
+    """
+    interval = 60000 / fire_rate if fire_rate > 0 else np.inf
+    with np.errstate(invalid='ignore'):
+        ttk = np.where(shots == 1, 0.0, (shots - 1) * interval)
+    finite = np.isfinite(ttk)
+    result = {
+        'trials': int(ttk.size),
+        'kill_rate': float(finite.mean()) if ttk.size else 0.0,
+        'mean': float(ttk[finite].mean()) if finite.any() else float('nan')
+    }
+    for key, q in PERCENTILES.items():
+        # 不插值，避免 inf 参与插值得到 nan
+        result[key] = float(np.percentile(ttk, q, method='inverted_cdf')) if ttk.size else float('nan')
+    return result
+
+
+def _run(damage, fire_rate, health, trials, p, seed_seq, batch_size, max_shots):
+    """按批次运行模拟，每个批次使用独立的子种子"""
+    batches = max(1, math.ceil(trials / batch_size))
+    shots = []
+    for i, child in enumerate(seed_seq.spawn(batches)):
+        size = min(batch_size, trials - i * batch_size)
+        shots.append(_simulate_shots(damage, p, health, size, np.random.default_rng(child), max_shots))
+    return _summarize(np.concatenate(shots), fire_rate)
+
+
+def _run_task(task):
+    return _run(*task)
+
+
+def simulate_ttk(weapon, health=100, trials=1_000_000, distribution=None, seed=None,
+                 distance=None, batch_size=200_000, max_shots=1000):
+    """蒙特卡洛模拟单把武器的击杀时间分布
+
+    按 distribution 给出的概率抽样每一发的命中部位（含未命中），统计击杀时间
+    （毫秒）的 mean/p50/p90/p99，以及在 max_shots 发内完成击杀的比例 kill_rate。
+    mean 为完成击杀的样本的平均值（kill_rate 为 0 时为 nan），分位数中未能击杀的样本按 inf 计。
+    相同 seed 得到相同结果；给出 distance 时按武器的伤害衰减计算。
+    """
+    p = _normalize_distribution(distribution or DEFAULT_HIT_DISTRIBUTION)
+    return _run(_weapon_damage(weapon, distance), weapon.fire_rate, float(health), trials, p,
+                np.random.SeedSequence(seed), batch_size, max_shots)
+
+
+def simulate_catalog(weapons, health=100, trials=1_000_000, distribution=None, seed=None,
+                     distance=None, batch_size=200_000, max_shots=1000, workers=None):
+    """在进程池中对整个武器库运行蒙特卡洛模拟
+
+    返回与 weapons 顺序一致的统计结果列表。每把武器使用由 seed 派生的独立子种子，
+    因此结果只取决于 seed 和武器顺序，与进程数无关。workers=1 时在当前进程运行。
+    """
+    p = _normalize_distribution(distribution or DEFAULT_HIT_DISTRIBUTION)
+    children = np.random.SeedSequence(seed).spawn(len(weapons))
+    tasks = [
+        (_weapon_damage(weapon, distance), weapon.fire_rate, float(health), trials, p,
+         child, batch_size, max_shots)
+        for weapon, child in zip(weapons, children)
+    ]
+    if workers == 1:
+        return [_run_task(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run_task, tasks))
@@ -0,0 +1,124 @@
+from collections.abc import Sequence
+from weapon_system import WEAPON_TYPES
+
+
+class WeaponRegistry(Sequence):
+    """武器注册表：保持武器的显示顺序，并按名称、兵种、枪械类型建立索引
+
+    可以像列表一样按下标访问和遍历（列表框的行号即下标）。武器的名称、类型或兵种
+    被修改后需要调用 reindex 更新索引。
+    """
+
+    def __init__(self, weapons=()):
+        self._weapons = []
+        self._positions = {}  # {id(武器): 下标}
+        self._by_name = {}  # {名称: {id(武器): 武器}}（同名武器少见，但允许存在）
+        self._by_class = {}  # {兵种: {id(武器): 武器}}
+        self._by_type = {}  # {枪械类型: {id(武器): 武器}}
+        self._by_class_type = {}  # {(兵种, 枪械类型): {id(武器): 武器}}
+        self._keys = {}  # {id(武器): 建立索引时的 (名称, 类型, 兵种)}
+        for weapon in weapons:
+            self.add(weapon)
+
+    def __len__(self):
+        return len(self._weapons)
+
+    def __getitem__(self, index):
+        return self._weapons[index]
+
+    def __iter__(self):
+        return iter(self._weapons)
+
+    def __contains__(self, weapon):
+        return id(weapon) in self._keys
+
+    def _index(self, weapon):
+        key = id(weapon)
+        classes = tuple(dict.fromkeys(weapon.soldier_classes))
+        self._keys[key] = (weapon.name, weapon.weapon_type, classes)
+        self._by_name.setdefault(weapon.name, {})[key] = weapon
+        self._by_type.setdefault(weapon.weapon_type, {})[key] = weapon
+        for soldier_class in classes:
+            self._by_class.setdefault(soldier_class, {})[key] = weapon
+            self._by_class_type.setdefault((soldier_class, weapon.weapon_type), {})[key] = weapon
+
+    def _unindex(self, weapon):
+        key = id(weapon)
+        name, weapon_type, classes = self._keys.pop(key)
+        self._discard(self._by_name, name, key)
+        self._discard(self._by_type, weapon_type, key)
+        for soldier_class in classes:
+            self._discard(self._by_class, soldier_class, key)
+            self._discard(self._by_class_type, (soldier_class, weapon_type), key)
+
+    @staticmethod
+    def _discard(index, index_key, key):
+        bucket = index.get(index_key)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del index[index_key]
+
+    def add(self, weapon):
+        """添加武器"""
+        self._positions[id(weapon)] = len(self._weapons)
+        self._weapons.append(weapon)
+        self._index(weapon)
+
+    def pop(self, index=-1):
+        """按下标删除武器并返回（之后的武器下标减一）"""
+        if index < 0:
+            index += len(self._weapons)
+        weapon = self._weapons.pop(index)
+        del self._positions[id(weapon)]
+        for i in range(index, len(self._weapons)):
+            self._positions[id(self._weapons[i])] = i
+        self._unindex(weapon)
+        return weapon
+
+    def replace(self, index, weapon):
+        """用另一把武器替换指定下标的武器（位置不变），返回被替换的武器"""
+        old = self._weapons[index]
+        self._unindex(old)
+        del self._positions[id(old)]
+        self._weapons[index] = weapon
+        self._positions[id(weapon)] = index if index >= 0 else index + len(self._weapons)
+        self._index(weapon)
+        return old
+
+    def remove(self, weapon):
+        """删除指定武器"""
+        self.pop(self.index(weapon))
+
+    def index(self, weapon):
+        """武器在注册表中的下标（按对象身份比较），O(1)"""
+        position = self._positions.get(id(weapon))
+        if position is None:
+            raise ValueError(f"{weapon.name} 不在注册表中")
+        return position
+
+    def reindex(self, weapon):
+        """武器的名称、类型或兵种被修改后更新索引"""
+        self._unindex(weapon)
+        self._index(weapon)
+
+    def get(self, name):
+        """按名称查找武器，不存在时返回 None（同名时返回在注册表中最靠前的一把）"""
+        return min(self._by_name.get(name, {}).values(), key=lambda weapon: self._positions[id(weapon)],
+                   default=None)
+
+    def by_class(self, soldier_class):
+        """某兵种可用的全部武器"""
+        return list(self._by_class.get(soldier_class, {}).values())
+
+    def by_type(self, weapon_type):
+        """某枪械类型的全部武器"""
+        return list(self._by_type.get(weapon_type, {}).values())
+
+    def types_for_class(self, soldier_class):
+        """某兵种可用的枪械类型，按 WEAPON_TYPES 的预定义顺序排列"""
+        return [wtype for wtype in WEAPON_TYPES if (soldier_class, wtype) in self._by_class_type]
+
+    def filter(self, soldier_class, weapon_type):
+        """同时符合兵种和枪械类型的武器"""
+        return list(self._by_class_type.get((soldier_class, weapon_type), {}).values())
@@ -1,9 +1,26 @@
+import copy
 import json
 import os
+import sys
 import math
+import weakref
+
+if __name__ == "__main__":
+    # 作为脚本运行时，让其他模块 import weapon_system 得到同一个模块对象，
+    # 避免出现两份配件目录和武器类
+    sys.modules.setdefault('weapon_system', sys.modules[__name__])
+
 from attachments_config import ATTACHMENTS_PRESETS
 from attachments_data import ATTACHMENTS_DATA, ATTACHMENT_DEPENDENCIES
+from btk_engine import BODY_PARTS, compute_btk_matrix
+from attachment_catalog import AttachmentCatalog
+from attachment_rules import CompatibilityRules
+from stat_kernel import LEGACY, STAT_MODE, apply_mods, finish, step
+from weapon_table import DEFAULT_TABLE, NUMERIC_FIELDS
+from manifest_cache import ManifestCache, content_hash, manifest_path
+from instrumentation import timed
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # 在类定义之前添加常量定义
 WEAPON_TYPES = [
@@ -22,6 +39,14 @@ SOLDIER_CLASSES = [
     '侦查'
 ]
 
+# 四项性能参数（get_modified_stats 返回的键）、对应的武器字段和配件修改字段
+STAT_KEYS = ['后坐力控制', '操控速度', '据枪稳定性', '腰际射击精度']
+STAT_FIELDS = ['recoil_control', 'handling_speed', 'ads_stability', 'hip_fire_accuracy']
+MOD_FIELDS = ['recoil_mod', 'handling_mod', 'stability_mod', 'hip_fire_mod']
+
+# 配件目录：按配件ID、(类型, 名称)、所属武器以及 (武器名称, 配件类型) 索引配件数据
+ATTACHMENT_CATALOG = AttachmentCatalog(ATTACHMENTS_DATA)
+
 class Attachment:
     # 定义配件类型
     TYPES = {
@@ -39,6 +64,12 @@ class Attachment:
         'GRIP_MOUNT': '握把座'
     }
 
+    __slots__ = ('name', 'attachment_type', 'recoil_mod', 'handling_mod', 'stability_mod',
+                 'hip_fire_mod', 'can_mount_grip', '__weakref__')
+
+    # from_dict 创建的配件按内容共享同一个对象，多把武器安装同一配件时不再各存一份
+    _interned = weakref.WeakValueDictionary()
+
     def __init__(self, name, attachment_type, recoil_mod=0, handling_mod=0, 
                  stability_mod=0, hip_fire_mod=0, can_mount_grip=False):
         self.name = name
@@ -64,17 +95,73 @@ class Attachment:
 
     @classmethod
     def from_dict(cls, data):
-        return cls(**data)
+        """从字典创建配件；内容相同的配件返回同一个对象（配件创建后不应再修改）"""
+        key = (data.get('name'), data.get('attachment_type'), data.get('recoil_mod', 0),
+               data.get('handling_mod', 0), data.get('stability_mod', 0),
+               data.get('hip_fire_mod', 0), data.get('can_mount_grip', False))
+        attachment = cls._interned.get(key)
+        if attachment is None:
+            attachment = cls(**data)
+            cls._interned[key] = attachment
+        return attachment
+
+# 配件兼容规则：由 ATTACHMENT_DEPENDENCIES 编译，安装校验、可用槽位、连带移除和自动配装共用
+ATTACHMENT_RULES = CompatibilityRules(ATTACHMENT_DEPENDENCIES, Attachment.TYPES.values())
+
+class _Column:
+    """数值字段：值保存在武器所属 WeaponTable 的对应列中"""
+
+    def __init__(self, invalidates_stats=False):
+        self.invalidates_stats = invalidates_stats
+
+    def __set_name__(self, owner, name):
+        self.field = name
+
+    def __get__(self, weapon, owner=None):
+        if weapon is None:
+            return self
+        return weapon._table.columns[self.field][weapon._row]
+
+    def __set__(self, weapon, value):
+        weapon._table.columns[self.field][weapon._row] = value
+        if self.invalidates_stats:
+            # 基础性能参数变化时使属性缓存失效
+            weapon._invalidate_stats()
 
 class Weapon:
     # 将常量作为类属性
     WEAPON_TYPES = WEAPON_TYPES
     SOLDIER_CLASSES = SOLDIER_CLASSES
 
+    __slots__ = ('_table', '_row', 'name', 'weapon_type', 'soldier_classes', 'damage_falloff',
+                 'version', '_attachments', '_mod_totals', '_stats', '_rule_state', '__weakref__')
+
+    # 数值字段存放在 WeaponTable 中，Weapon 对象只是表中一行的视图
+    base_damage = _Column()
+    stomach_damage = _Column()
+    limb_damage = _Column()
+    foot_damage = _Column()
+    range_meters = _Column()
+    fire_rate = _Column()
+    recoil_control = _Column(invalidates_stats=True)
+    handling_speed = _Column(invalidates_stats=True)
+    ads_stability = _Column(invalidates_stats=True)
+    hip_fire_accuracy = _Column(invalidates_stats=True)
+
     def __init__(self, name='', weapon_type='', soldier_classes=None, base_damage=0, 
                  stomach_damage=0, limb_damage=0, foot_damage=0, range_meters=0, 
                  fire_rate=0, recoil_control=0, handling_speed=0, ads_stability=0, 
-                 hip_fire_accuracy=0):
+                 hip_fire_accuracy=0, damage_falloff=None, table=None):
+        # 在表中分配一行（未指定时使用所有武器共用的默认表）
+        self._table = table if table is not None else DEFAULT_TABLE
+        self._row = self._table.allocate()
+        # 配件加成总和与最终属性随配件增删增量维护，version 在每次变化时递增，
+        # 供下游缓存判断是否需要重新计算
+        self.version = 0
+        self._attachments = []
+        self._mod_totals = [0, 0, 0, 0]
+        self._stats = None
+        self._rule_state = 0  # 已安装配件的兼容规则状态（见 CompatibilityRules）
         self.name = name
         self.weapon_type = weapon_type
         self.soldier_classes = soldier_classes if soldier_classes is not None else []
@@ -88,7 +175,57 @@ class Weapon:
         self.handling_speed = float(handling_speed)
         self.ads_stability = float(ads_stability)
         self.hip_fire_accuracy = float(hip_fire_accuracy)
-        self.attachments = []
+        # 射程外的伤害衰减断点: [{'distance': 距离, 'multiplier': 伤害倍率}, ...]
+        self.damage_falloff = sorted(
+            ({'distance': float(bp['distance']), 'multiplier': float(bp['multiplier'])}
+             for bp in (damage_falloff or [])),
+            key=lambda bp: bp['distance']
+        )
+
+    @property
+    def attachments(self):
+        """已安装的配件（只读元组，通过 add_attachment/remove_attachment 修改）"""
+        return tuple(self._attachments)
+
+    @attachments.setter
+    def attachments(self, attachments):
+        self._attachments = list(attachments)
+        self._update_mod_totals()
+        self._rule_state = ATTACHMENT_RULES.state_of(self._attachments)
+        self._invalidate_stats()
+
+    def _update_mod_totals(self):
+        # 每次按已安装的配件精确求和，增删配件后的总和与安装顺序和历史无关，不累积浮点误差
+        self._mod_totals = [
+            math.fsum(getattr(att, field) for att in self._attachments) for field in MOD_FIELDS
+        ]
+
+    def _invalidate_stats(self):
+        self._stats = None
+        self.version += 1
+
+    def __del__(self):
+        # 释放表中的行供之后的武器复用（解释器退出时表可能已不存在）
+        try:
+            self._table.release(self._row)
+        except Exception:
+            pass
+
+    # 表中的行随武器对象释放，复制出的武器必须分配自己的行，不能与原武器共用
+    def _copy(self, data):
+        weapon = Weapon(**self._fields_from_dict(data), table=self._table)
+        weapon.attachments = self._attachments  # 配件对象创建后不再修改，可以共用
+        return weapon
+
+    def __copy__(self):
+        return self._copy(self.to_dict())
+
+    def __deepcopy__(self, memo):
+        return self._copy(copy.deepcopy(self.to_dict(), memo))
+
+    def __reduce__(self):
+        # 序列化为字典，反序列化时在接收方的默认表中分配新行
+        return Weapon.from_dict, (self.to_dict(),)
 
     def to_dict(self):
         return {
@@ -105,13 +242,14 @@ class Weapon:
             'handling_speed': self.handling_speed,
             'ads_stability': self.ads_stability,
             'hip_fire_accuracy': self.hip_fire_accuracy,
+            'damage_falloff': self.damage_falloff,
             'attachments': [att.to_dict() for att in self.attachments]
         }
 
-    @classmethod
-    def from_dict(cls, data):
-        # 确保所有必要的字段都存在，如果不存在则使用默认值
-        weapon_data = {
+    @staticmethod
+    def _fields_from_dict(data):
+        """从字典中取出构造武器所需的字段，缺少的字段使用默认值"""
+        return {
             'name': data.get('name', ''),
             'weapon_type': data.get('weapon_type', ''),
             'soldier_classes': data.get('soldier_classes', []),
@@ -124,10 +262,13 @@ class Weapon:
             'recoil_control': data.get('recoil_control', 0),
             'handling_speed': data.get('handling_speed', 0),
             'ads_stability': data.get('ads_stability', 0),
-            'hip_fire_accuracy': data.get('hip_fire_accuracy', 0)
+            'hip_fire_accuracy': data.get('hip_fire_accuracy', 0),
+            'damage_falloff': data.get('damage_falloff', [])
         }
-        
-        weapon = cls(**weapon_data)
+
+    @classmethod
+    def from_dict(cls, data):
+        weapon = cls(**cls._fields_from_dict(data))
         
         # 加载配件数据
         attachments_data = data.get('attachments', [])
@@ -135,68 +276,76 @@ class Weapon:
         
         return weapon
 
+    @timed('Weapon.get_modified_stats')
     def get_modified_stats(self):
-        """计算包含配件加成后的属性值"""
-        total_recoil = self.recoil_control
-        total_handling = self.handling_speed
-        total_stability = self.ads_stability
-        total_hip_fire = self.hip_fire_accuracy
-
-        for attachment in self.attachments:
-            total_recoil = max(0, min(100, total_recoil + attachment.recoil_mod))
-            total_handling = max(0, min(100, total_handling + attachment.handling_mod))
-            total_stability = max(0, min(100, total_stability + attachment.stability_mod))
-            total_hip_fire = max(0, min(100, total_hip_fire + attachment.hip_fire_mod))
+        """计算包含配件加成后的属性值（结果会被缓存，配件或基础属性变化时才重新计算）
 
-        return {
-            '后坐力控制': total_recoil,
-            '操控速度': total_handling,
-            '据枪稳定性': total_stability,
-            '腰际射击精度': total_hip_fire
-        }
+        计算方式见 stat_kernel：默认把配件加成求和后截断一次，与安装顺序无关；
+        LEGACY 方式按安装顺序每装一个配件截断一次。
+        """
+        if self._stats is None:
+            base = [getattr(self, field) for field in STAT_FIELDS]
+            if STAT_MODE == LEGACY:
+                values = apply_mods(base, ([getattr(att, field) for field in MOD_FIELDS]
+                                           for att in self._attachments), LEGACY)
+            else:
+                # 与安装顺序无关，直接使用维护好的加成总和
+                values = finish(step(base, self._mod_totals))
+            self._stats = dict(zip(STAT_KEYS, values))
+        return dict(self._stats)
+
+    def get_attachment_mods(self):
+        """已安装配件的属性加成总和（未截断）"""
+        return dict(zip(STAT_KEYS, self._mod_totals))
 
     def add_attachment(self, attachment):
-        # 检查是否已经安装了同类型的配件
-        for att in self.attachments:
-            if att.attachment_type == attachment.attachment_type:
-                raise ValueError(f"已安装了{attachment.attachment_type}类型的配件")
-        
-        # 检查弹匣座的特殊限制
-        if attachment.attachment_type == '弹匣座':
-            for att in self.attachments:
-                if att.attachment_type == '弹匣' and '弹鼓' in att.name:
-                    raise ValueError("使用弹鼓类型弹匣时不能安装弹匣座")
+        # 按兼容规则检查槽位占用、前置配件和互斥配件
+        error = ATTACHMENT_RULES.check(self._rule_state, attachment.attachment_type, attachment)
+        if error is not None:
+            raise ValueError(error)
         
-        # 检查弹鼓的特殊限制
-        if attachment.attachment_type == '弹匣' and '弹鼓' in attachment.name:
-            for att in self.attachments:
-                if att.attachment_type == '弹匣座':
-                    raise ValueError("安装弹鼓类型弹匣时需要先移除弹匣座")
-        
-        # 检查握把座的特殊限制
-        if attachment.attachment_type == '握把座':
-            # 检查是否安装了可安装握把座的后握把
-            has_compatible_grip = False
-            for att in self.attachments:
-                if att.attachment_type == '后握把' and att.can_mount_grip:
-                    has_compatible_grip = True
-                    break
-            if not has_compatible_grip:
-                raise ValueError("需要先安装可支持握把座的后握把")
-        
-        self.attachments.append(attachment)
+        self._attachments.append(attachment)
+        self._rule_state |= ATTACHMENT_RULES.bits(attachment.attachment_type, attachment)
+        self._update_mod_totals()
+        stats = self._stats
+        self._invalidate_stats()
+        if stats is not None and STAT_MODE == LEGACY:
+            # 新配件排在最后，在缓存的结果上再截断一次即与完整重算一致
+            # （默认方式下由加成总和直接计算，不需要增量更新）
+            values = step([stats[key] for key in STAT_KEYS],
+                          [getattr(attachment, field) for field in MOD_FIELDS], LEGACY)
+            self._stats = dict(zip(STAT_KEYS, values))
 
     def remove_attachment(self, attachment_name):
-        self.attachments = [att for att in self.attachments if att.name != attachment_name]
+        """移除配件，依赖它的配件（例如后握把被移除时的握把座）一并移除
+
+        返回被连带移除的配件列表。
+        """
+        removed = [att for att in self._attachments if att.name == attachment_name]
+        if not removed:
+            return []
+        kept, dropped = ATTACHMENT_RULES.cascade(
+            [att for att in self._attachments if att.name != attachment_name])
+        self._attachments = kept
+        self._update_mod_totals()
+        self._rule_state = ATTACHMENT_RULES.state_of(kept)
+        self._invalidate_stats()
+        return dropped
+
+    def available_slots(self):
+        """还可以安装配件的槽位（槽位为空且满足兼容规则）"""
+        return ATTACHMENT_RULES.available_slots(self._rule_state)
 
     def calculate_btk(self, health=100):
-        btks = {
-            '胸部': math.ceil(health / self.base_damage),
-            '腹部': math.ceil(health / self.stomach_damage),
-            '手部': math.ceil(health / self.limb_damage),
-            '脚部': math.ceil(health / self.foot_damage)
-        }
-        return btks
+        btk, _ = compute_btk_matrix([self], [health])
+        if any(math.isinf(value) for value in btk[0, 0]):
+            raise ZeroDivisionError("部位伤害必须大于0")
+        return {part: int(value) for part, value in zip(BODY_PARTS, btk[0, 0])}
+
+    def calculate_kill_time(self, health=100):
+        """计算最快理论击杀时间（毫秒）"""
+        _, ttk = compute_btk_matrix([self], [health])
+        return float(ttk[0, 0])
 
     def display_info(self):
         print(f"\n枪��信息:")
@@ -209,6 +358,8 @@ class Weapon:
         print(f"脚部伤害: {self.foot_damage}")
         print(f"射程: {self.range_meters}米")
         print(f"射速: {self.fire_rate}发/分钟")
+        for bp in self.damage_falloff:
+            print(f"  {bp['distance']}米外伤害倍率: {bp['multiplier']}")
         print(f"\n性能参数:")
         print(f"后坐力控制: {self.recoil_control}")
         print(f"操控速度: {self.handling_speed}")
@@ -237,10 +388,87 @@ class Weapon:
         for part, btk in btks.items():
             print(f"{part}: {btk}发")
         
-        fastest_btk = min(btks.values())
-        kill_time_ms = (fastest_btk - 1) * (60000 / self.fire_rate)
+        kill_time_ms = self.calculate_kill_time()
         print(f"\n最快理论击杀时间: {kill_time_ms:.1f}毫秒")
 
+class LazyWeapon(Weapon):
+    """延迟加载的武器
+
+    创建时只设置名称、类型和兵种，保留解析好的JSON数据；首次访问数值、配件等
+    其他属性时才分配表中的行并构建完整的武器。
+    """
+    __slots__ = ('_source',)
+
+    # 未加载时即可使用的属性
+    _STUB_ATTRS = frozenset(('_source', '_table', 'name', 'weapon_type', 'soldier_classes'))
+
+    def __init__(self, data, table=None):
+        self._source = data
+        self._table = table if table is not None else DEFAULT_TABLE
+        self.name = data.get('name', '')
+        self.weapon_type = data.get('weapon_type', '')
+        self.soldier_classes = data.get('soldier_classes', [])
+
+    @property
+    def loaded(self):
+        """是否已经构建完整的武器"""
+        return self._source is None
+
+    def _hydrate(self):
+        data, self._source = self._source, None
+        # 名称、类型和兵种在加载前可能已被修改，使用当前值而不是文件中的
+        fields = self._fields_from_dict(data)
+        fields.update(name=self.name, weapon_type=self.weapon_type, soldier_classes=self.soldier_classes)
+        Weapon.__init__(self, **fields, table=self._table)
+        self.attachments = [Attachment.from_dict(att) for att in data.get('attachments', [])]
+
+    def __getattr__(self, name):
+        # 只有尚未设置的属性才会走到这里
+        if name in self._STUB_ATTRS or name.startswith('__') or self._source is None:
+            raise AttributeError(name)
+        self._hydrate()
+        return getattr(self, name)
+
+    def __setattr__(self, name, value):
+        # 修改完整属性前先加载，避免之后被文件中的数据覆盖
+        if name not in self._STUB_ATTRS and self._source is not None:
+            self._hydrate()
+        object.__setattr__(self, name, value)
+
+    def __del__(self):
+        # 未加载的武器没有分配表中的行
+        if getattr(self, '_source', None) is None:
+            Weapon.__del__(self)
+
+
+class LoadReport:
+    """load_weapons_report 的结果：加载的武器以及每个文件的耗时和错误信息"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.weapons = []
+        self.sources = {}  # 每把武器读取自的文件名: {武器: 文件名}
+        # 每个文件一项: {'file': 文件名, 'seconds': 读取和解析耗时, 'error': 错误信息或 None,
+        #               'cached': 是否直接使用了清单缓存}
+        self.files = []
+        self.cached = 0  # 未重新读取、直接使用清单缓存的文件数
+        self.elapsed = 0.0
+
+    @property
+    def errors(self):
+        """加载失败的文件"""
+        return [entry for entry in self.files if entry['error'] is not None]
+
+    def slowest(self, count=5):
+        """耗时最长的若干个文件"""
+        return sorted(self.files, key=lambda entry: entry['seconds'], reverse=True)[:count]
+
+    def summary(self):
+        return (f"已从 {self.directory} 加载 {len(self.weapons)} 把武器，"
+                f"{self.cached} 个使用缓存，{len(self.errors)} 个文件出错，"
+                f"耗时 {self.elapsed * 1000:.1f}毫秒")
+
+
 def input_weapon_data():
     print("\n请输入枪械数:")
     name = input("枪械名称: ")
@@ -263,8 +491,8 @@ def input_weapon_data():
                  limb_damage, foot_damage, range_meters, fire_rate, recoil_control,
                  handling_speed, ads_stability, hip_fire_accuracy)
 
-def input_attachment_data():
-    """输入配件数据"""
+def input_attachment_data(store=None):
+    """输入配件数据，保存到 store（未指定时保存到默认的配件数据文件）"""
     print("\n请输入配件数据:")
     
     # 1. 选择配件类型
@@ -316,7 +544,7 @@ def input_attachment_data():
     # 创建配件数据
     attachment_data = {
         'name': name,
-        'type': attachment_type,
+        'attachment_type': attachment_type,
         'recoil_mod': recoil_mod,
         'handling_mod': handling_mod,
         'stability_mod': stability_mod,
@@ -325,142 +553,223 @@ def input_attachment_data():
     }
     
     # 保存配件数据
-    if is_specific:
-        if weapon_name not in ATTACHMENTS_DATA['specific']:
-            ATTACHMENTS_DATA['specific'][weapon_name] = {}
-        if attachment_type not in ATTACHMENTS_DATA['specific'][weapon_name]:
-            ATTACHMENTS_DATA['specific'][weapon_name][attachment_type] = []
-        ATTACHMENTS_DATA['specific'][weapon_name][attachment_type].append(attachment_data)
-    else:
-        if attachment_type not in ATTACHMENTS_DATA['common']:
-            ATTACHMENTS_DATA['common'][attachment_type] = []
-        ATTACHMENTS_DATA['common'][attachment_type].append(attachment_data)
+    register_attachment(attachment_data, weapon_name if is_specific else None)
     
     # 保存到文件
-    save_attachments_data()
+    if store is not None:
+        store.commit_attachments()
+    else:
+        save_attachments_data()
     
-    return Attachment(**attachment_data)
+    return Attachment(name, attachment_type, recoil_mod, handling_mod, stability_mod,
+                      hip_fire_mod, special_attributes.get('can_mount_grip', False))
 
-def save_attachments_data(filename='attachments_data.json'):
-    """保存配件数据到文件"""
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(ATTACHMENTS_DATA, f, ensure_ascii=False, indent=4)
+def register_attachment(attachment_data, weapon_name=None):
+    """把配件加入配件数据并更新配件目录，weapon_name 为空时作为通用配件，返回配件ID"""
+    return ATTACHMENT_CATALOG.add(attachment_data, weapon_name)
+
+def unregister_attachment(attachment_type, name, weapon_name=None):
+    """从配件数据中删除配件并更新配件目录，返回被删除的配件数据（不存在时返回 None）"""
+    attachment_id = ATTACHMENT_CATALOG.find(attachment_type, name, weapon_name)
+    if attachment_id is None:
+        return None
+    return ATTACHMENT_CATALOG.remove(attachment_id)
+
+@timed()
+def save_attachments_data(filename='attachments_data.json', data=None):
+    """保存配件数据到文件（data 为空时保存 ATTACHMENTS_DATA）"""
+    _atomic_write_json(filename, ATTACHMENTS_DATA if data is None else data)
 
-def load_attachments_data(filename='attachments_data.json'):
-    """从文件加载配件数据"""
-    global ATTACHMENTS_DATA
+def load_attachments_data(filename='attachments_data.json', use_manifest=True):
+    """从文件加载配件数据（文件未变化时使用清单缓存中的解析结果）"""
     try:
         if os.path.exists(filename):
-            with open(filename, 'r', encoding='utf-8') as f:
-                ATTACHMENTS_DATA = json.load(f)
+            if not use_manifest:
+                with open(filename, 'r', encoding='utf-8') as f:
+                    replace_attachments_data(json.load(f))
+                return
+            manifest = ManifestCache(manifest_path(filename))
+            key = os.path.basename(filename)
+            stat = os.stat(filename)
+            data = manifest.get(key, stat)
+            if data is None:
+                with open(filename, 'rb') as f:
+                    raw = f.read()
+                digest = content_hash(raw)
+                data = manifest.get_by_hash(key, digest)
+                if data is None:
+                    data = json.loads(raw.decode('utf-8'))
+                manifest.put(key, stat, digest, data)
+                manifest.save()
+            replace_attachments_data(data)
     except Exception as e:
         print(f"\n警告：加载配件数据时出错: {e}")
 
+def replace_attachments_data(data):
+    """用新数据整体替换配件数据并重建配件目录"""
+    # 原地更新，保证通过 import 引用 ATTACHMENTS_DATA 的模块看到同一份数据
+    ATTACHMENTS_DATA.clear()
+    ATTACHMENTS_DATA.update(data)
+    ATTACHMENTS_DATA.setdefault('common', {})
+    ATTACHMENTS_DATA.setdefault('specific', {})
+    ATTACHMENT_CATALOG.rebuild()
+
 def get_available_attachments(weapon_name, attachment_type):
-    """获取可用的配件列表"""
-    available = []
-    
-    # 添加通用配件
-    if attachment_type in ATTACHMENTS_DATA['common']:
-        available.extend(ATTACHMENTS_DATA['common'][attachment_type])
-    
-    # 添加特定武器配件
-    if weapon_name in ATTACHMENTS_DATA['specific']:
-        if attachment_type in ATTACHMENTS_DATA['specific'][weapon_name]:
-            available.extend(ATTACHMENTS_DATA['specific'][weapon_name][attachment_type])
-    
-    return available
+    """获取可用的配件列表（通用配件在前，特定武器配件在后的只读视图）"""
+    return ATTACHMENT_CATALOG.available(weapon_name, attachment_type)
+
+def _atomic_write_json(filepath, data):
+    """先写入同目录下的临时文件再替换目标文件，写入中途崩溃不会留下损坏的JSON"""
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, filepath)
 
+def weapon_filename(weapon_name):
+    """武器数据文件的文件名（使用枪械名称，移除特殊字符），名称为空时返回 None"""
+    filename = ''.join(c for c in weapon_name if c.isalnum() or c in (' ', '-', '_'))
+    return f"{filename}.json" if filename else None
+
+@timed()
 def save_weapon(weapon, directory='weapons'):
     """保存单个武器数据到独立文件"""
+    return save_weapon_data(weapon.to_dict(), directory)
+
+@timed()
+def save_weapon_data(weapon_data, directory='weapons'):
+    """把 Weapon.to_dict() 格式的武器数据保存到独立文件"""
     try:
         # 确保目录存在
         if not os.path.exists(directory):
             os.makedirs(directory)
         
         # 生成文件名（使用枪械名称，移除特殊字符）
-        filename = ''.join(c for c in weapon.name if c.isalnum() or c in (' ', '-', '_'))
-        if not filename:  # 如果名称��空，使用时间戳
-            filename = f"weapon_{int(time.time())}"
-        filepath = os.path.join(directory, f"{filename}.json")
-        
-        # 准备要保存的数据
-        weapon_data = {
-            'name': weapon.name,
-            'weapon_type': weapon.weapon_type,
-            'soldier_classes': weapon.soldier_classes,
-            'base_damage': weapon.base_damage,
-            'stomach_damage': weapon.stomach_damage,
-            'limb_damage': weapon.limb_damage,
-            'foot_damage': weapon.foot_damage,
-            'range_meters': weapon.range_meters,
-            'fire_rate': weapon.fire_rate,
-            'recoil_control': weapon.recoil_control,
-            'handling_speed': weapon.handling_speed,
-            'ads_stability': weapon.ads_stability,
-            'hip_fire_accuracy': weapon.hip_fire_accuracy,
-            'attachments': [att.to_dict() for att in weapon.attachments]
-        }
+        filename = weapon_filename(weapon_data['name'])
+        if not filename:  # 如果名称为空，使用时间戳
+            filename = f"weapon_{int(time.time())}.json"
+        filepath = os.path.join(directory, filename)
         
         # 保存数据
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(weapon_data, f, ensure_ascii=False, indent=4)
+        _atomic_write_json(filepath, weapon_data)
         return True
     except Exception as e:
         print(f"保存武器数据时出错: {e}")
         return False
 
-def load_weapons(directory='weapons'):
-    """从目录加载所有武器数据"""
-    weapons = []
-    
+def _read_weapon_file(filepath, manifest=None):
+    """读取并解析一个武器文件，返回 (数据, 错误信息, 耗时, 内容哈希)
+
+    清单中有内容哈希相同的解析结果时不再解析。解析后检查数值字段
+    能否转换为数字，使延迟加载的武器在首次访问时不会因数据错误失败。
+    """
+    start = time.perf_counter()
+    data, error, digest = None, None, None
+    try:
+        with open(filepath, 'rb') as f:
+            raw = f.read()
+        digest = content_hash(raw)
+        if manifest is not None:
+            data = manifest.get_by_hash(os.path.basename(filepath), digest)
+        if data is None:
+            data = json.loads(raw.decode('utf-8'))
+            if not isinstance(data, dict):
+                data, error = None, "文件内容不是武器数据对象"
+            else:
+                for field in NUMERIC_FIELDS:
+                    float(data.get(field, 0))
+    except json.JSONDecodeError as e:
+        error = f"文件已损坏: {e}"
+    except (OSError, UnicodeDecodeError) as e:
+        error = f"读取文件时出错: {e}"
+    except (TypeError, ValueError) as e:
+        data, error = None, f"武器数据无效: {e}"
+    return data, error, time.perf_counter() - start, digest
+
+@timed()
+def load_weapons_report(directory='weapons', workers=None, lazy=True, use_manifest=True):
+    """在线程池中并行读取目录中的武器文件，返回 LoadReport
+
+    lazy=True 时返回 LazyWeapon，数值和配件在首次访问时才构建；lazy=False 时
+    立即构建完整的武器，构建失败的文件也记录在报告中。武器顺序与目录列表一致。
+    use_manifest=True 时使用与目录并列的清单缓存，只重新解析新增或修改过的文件。
+    """
+    start = time.perf_counter()
+    report = LoadReport(directory)
+
     # 如果目录不存在，创建它
     if not os.path.exists(directory):
         os.makedirs(directory)
-        return weapons
-    
-    # 遍历目录中的所有json文件
-    for filename in os.listdir(directory):
-        if filename.endswith('.json'):
-            filepath = os.path.join(directory, filename)
+        return report
+
+    manifest = ManifestCache(manifest_path(directory)) if use_manifest else None
+    entries = [entry for entry in os.scandir(directory) if entry.name.endswith('.json')]
+    results = [None] * len(entries)
+    stats = [None] * len(entries)
+    pending = []
+    for i, entry in enumerate(entries):
+        try:
+            stats[i] = entry.stat()
+        except OSError as e:
+            results[i] = (None, f"读取文件时出错: {e}", 0.0, None)
+            continue
+        record = manifest.get(entry.name, stats[i]) if manifest is not None else None
+        if record is not None:
+            results[i] = (record, None, 0.0, None)
+            report.cached += 1
+        else:
+            pending.append(i)
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            read = pool.map(lambda i: _read_weapon_file(entries[i].path, manifest), pending)
+            for i, result in zip(pending, read):
+                results[i] = result
+
+    loaded = []
+    for i, (entry, (data, error, seconds, digest)) in enumerate(zip(entries, results)):
+        if data is not None:
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # 确保数据中包含所有必要的字段
-                    weapon_data = {
-                        'name': data.get('name', ''),
-                        'weapon_type': data.get('weapon_type', ''),
-                        'soldier_classes': data.get('soldier_classes', []),
-                        'base_damage': data.get('base_damage', 0),
-                        'stomach_damage': data.get('stomach_damage', 0),
-                        'limb_damage': data.get('limb_damage', 0),
-                        'foot_damage': data.get('foot_damage', 0),
-                        'range_meters': data.get('range_meters', 0),
-                        'fire_rate': data.get('fire_rate', 0),
-                        'recoil_control': data.get('recoil_control', 0),
-                        'handling_speed': data.get('handling_speed', 0),
-                        'ads_stability': data.get('ads_stability', 0),
-                        'hip_fire_accuracy': data.get('hip_fire_accuracy', 0)
-                    }
-                    
-                    weapon = Weapon(**weapon_data)
-                    
-                    # 加载配件数据
-                    attachments_data = data.get('attachments', [])
-                    weapon.attachments = [Attachment.from_dict(att) for att in attachments_data]
-                    
-                    weapons.append(weapon)
-            except json.JSONDecodeError:
-                print(f"\n警告：文件 {filename} 已损坏，已跳过")
-            except Exception as e:
-                print(f"\n警告：加载文件 {filename} 时出错: {e}")
-    
-    return weapons
+                weapon = LazyWeapon(data) if lazy else Weapon.from_dict(data)
+                report.weapons.append(weapon)
+                report.sources[weapon] = entry.name
+                loaded.append(entry.name)
+                if manifest is not None and digest is not None:
+                    manifest.put(entry.name, stats[i], digest, data)
+            except (TypeError, ValueError, KeyError) as e:
+                error = f"武器数据无效: {e}"
+        report.files.append({'file': entry.name, 'seconds': seconds, 'error': error,
+                             'cached': digest is None and error is None})
+
+    if manifest is not None:
+        manifest.retain(loaded)
+        manifest.save()
+    report.elapsed = time.perf_counter() - start
+    return report
+
+def load_weapon_file(filepath, lazy=True):
+    """读取单个武器文件，返回 (武器, 错误信息)，出错时武器为 None"""
+    data, error, _, _ = _read_weapon_file(filepath)
+    if data is None:
+        return None, error
+    try:
+        return (LazyWeapon(data) if lazy else Weapon.from_dict(data)), None
+    except (TypeError, ValueError, KeyError) as e:
+        return None, f"武器数据无效: {e}"
+
+@timed()
+def load_weapons(directory='weapons'):
+    """从目录加载所有武器数据"""
+    report = load_weapons_report(directory)
+    for entry in report.errors:
+        print(f"\n警告：加载文件 {entry['file']} 时出错: {entry['error']}")
+    return report.weapons
 
 def delete_weapon(weapon_name, directory='weapons'):
     """删除定武器的数据文件"""
-    filename = ''.join(c for c in weapon_name if c.isalnum() or c in (' ', '-', '_'))
-    filepath = os.path.join(directory, f"{filename}.json")
+    filename = weapon_filename(weapon_name)
+    filepath = os.path.join(directory, filename or '.json')
     
     if os.path.exists(filepath):
         os.remove(filepath)
@@ -470,24 +779,9 @@ def delete_weapon(weapon_name, directory='weapons'):
 
 def display_available_slots(weapon):
     """显示武器可用的配件槽位"""
-    used_slots = {att.attachment_type for att in weapon.attachments}
     print("\n可用配件槽位:")
-    for type_name in Attachment.TYPES.values():
-        if type_name not in used_slots:
-            # 检查特殊限制
-            if type_name == '弹匣座':
-                has_drum = any('弹鼓' in att.name for att in weapon.attachments 
-                             if att.attachment_type == '弹匣')
-                if not has_drum:
-                    print(f"- {type_name}")
-            elif type_name == '握把座':
-                # 检查是否有可安装握把座的后握把
-                has_compatible_grip = any(att.can_mount_grip for att in weapon.attachments 
-                                       if att.attachment_type == '后握把')
-                if has_compatible_grip:
-                    print(f"- {type_name}")
-            else:
-                print(f"- {type_name}")
+    for type_name in weapon.available_slots():
+        print(f"- {type_name}")
 
 def save_attachments_presets(filename='attachments_presets.json'):
     """保存配件预设到文件"""
@@ -506,8 +800,19 @@ def load_attachments_presets(filename='attachments_presets.json'):
 
 # 主程序
 if __name__ == "__main__":
-    load_attachments_data()
-    weapons = load_weapons()
+    if len(sys.argv) > 1:
+        # 带参数运行时使用非交互的批处理命令（见 batch_cli.py）
+        from batch_cli import main
+        sys.exit(main(sys.argv[1:]))
+
+    from catalog_store import default_store
+    store = default_store()
+    store.load_attachments()
+    report = store.load_weapons_report()
+    weapons = report.weapons
+    for entry in report.errors:
+        print(f"\n警告：加载 {entry['file']} 时出错: {entry['error']}")
+    print(f"\n{report.summary()}")
     while True:
         print("\n1. 添加新枪械")
         print("2. 显示所有枪械")
@@ -522,7 +827,7 @@ if __name__ == "__main__":
         if choice == "1":
             weapon = input_weapon_data()
             weapons.append(weapon)
-            save_weapon(weapon)  # 保存单个武器数据
+            store.save_weapon(weapon)  # 保存单个武器数据
             print("\n枪械添加成功！")
         
         elif choice == "2":
@@ -540,13 +845,12 @@ if __name__ == "__main__":
             try:
                 health = float(input("\n请输入目标生命值: "))
                 print("\n计算结果:")
-                for weapon in weapons:
+                btk, ttk = compute_btk_matrix(weapons, [health])
+                for i, weapon in enumerate(weapons):
                     print(f"\n{weapon.name}的BTK:")
-                    btks = weapon.calculate_btk(health)
-                    for part, btk in btks.items():
-                        print(f"{part}: {btk}发")
-                    kill_time_ms = (min(btks.values()) - 1) * (60000 / weapon.fire_rate)
-                    print(f"最快理论击杀时间: {kill_time_ms:.1f}毫秒")
+                    for part, value in zip(BODY_PARTS, btk[i, 0]):
+                        print(f"{part}: {value:.0f}发")
+                    print(f"最快理论击杀时间: {ttk[i, 0]:.1f}毫秒")
             except ValueError:
                 print("\n请输入有效的生值！")
         
@@ -603,13 +907,13 @@ if __name__ == "__main__":
                                 if 1 <= choice <= len(available_attachments):
                                     attachment = Attachment(**available_attachments[choice - 1])
                                 else:
-                                    attachment = input_attachment_data()
+                                    attachment = input_attachment_data(store)
                             else:
                                 print("\n当前没有可用的预设配件，请添加新配件")
-                                attachment = input_attachment_data()
+                                attachment = input_attachment_data(store)
                             
                             weapon.add_attachment(attachment)
-                            save_weapon(weapon)
+                            store.save_weapon(weapon)
                             print("\n配件添加成功！")
                         except ValueError as e:
                             print(f"\n错误: {e}")
@@ -625,9 +929,11 @@ if __name__ == "__main__":
                         
                         att_idx = int(input("\n选择要移除的配件 (输入序号): ")) - 1
                         att_name = weapon.attachments[att_idx].name
-                        weapon.remove_attachment(att_name)
-                        save_weapon(weapon)  # 保存更新后的武器数据
+                        dropped = weapon.remove_attachment(att_name)
+                        store.save_weapon(weapon)  # 保存更新后的武器数据
                         print("\n配件移除成功！")
+                        for att in dropped:
+                            print(f"依赖该配件的{att.attachment_type} {att.name} 已一并移除")
                     
                     elif sub_choice == "3":
                         weapon.display_info()
@@ -656,7 +962,7 @@ if __name__ == "__main__":
                 confirm = input(f"\n确定要删除 {weapon.name}？(y/n): ").lower()
                 
                 if confirm == 'y':
-                    if delete_weapon(weapon.name):
+                    if store.delete_weapon(weapon.name):
                         weapons.pop(weapon_idx)
                         print(f"\n已删除 {weapon.name}")
                     else:
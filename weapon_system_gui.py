@@ -1,13 +1,49 @@
+import os
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox
 from weapon_system import *
+from loadout_optimizer import STAT_KEYS, optimize_loadout, snapshot_loadout
+from pareto_front import ParetoFront, skyline_2d
+from weapon_registry import WeaponRegistry
+from catalog_store import default_store
+from save_queue import SaveQueue
+from weapon_watcher import RESCAN, watch_directory
+from attachment_tree import AttachmentTreeModel
+from btk_engine import btk_ttk_from_arrays, damage_matrix, fire_rate_vector
+from btk_table import COLUMN_IDS, BtkTableModel
+from config_selection import ConfigSelection
+from job_runner import JobRunner
+import instrumentation
+from instrumentation import timed
+
+
+def _btk_chunk(arrays):
+    """后台计算一批武器的BTK：arrays 为 (伤害数组, 射速数组, 生命值列表)"""
+    return btk_ttk_from_arrays(*arrays)
+
 
 class WeaponSystemGUI:
+    # 检查武器目录变化的间隔（毫秒）
+    WATCH_INTERVAL_MS = 250
+    # BTK计算每批处理的武器数量，每完成一批显示一批结果
+    BTK_CHUNK_SIZE = 200
+
     def __init__(self, root):
         self.root = root
         self.root.title("枪械管理系统")
-        self.weapons = load_weapons()
-        load_attachments_data()
+        self.store = default_store()
+        self.load_report = self.store.load_weapons_report()
+        self.weapons = WeaponRegistry(self.load_report.weapons)
+        # 每把武器对应的文件名，目录变化时按文件名找到对应的行（文件名不一定与枪械名称一致）
+        self.weapon_files = dict(self.load_report.sources)
+        self.store.load_attachments()
+        # 保存在后台线程中进行，短时间内的重复保存会被合并
+        self.saver = SaveQueue(self.store)
+        # 耗时计算在后台运行，结果通过 root.after 轮询交回界面
+        self.jobs = JobRunner(self.root)
+        self.btk_job = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # 初始化字典 - 确保在使用前已创建
         self.weapon_entries = {}
@@ -29,7 +65,72 @@ class WeaponSystemGUI:
         self.create_attachment_management_tab()
         self.create_weapon_config_tab()
         self.create_btk_calculator_tab()
-        
+
+        # 监视武器目录，其他程序新增、修改或删除的武器文件会同步到列表中
+        directory = getattr(self.store, 'directory', None)
+        self.weapon_watcher = watch_directory(directory) if directory else None
+        if self.weapon_watcher is not None:
+            self.root.after(self.WATCH_INTERVAL_MS, self.poll_weapon_changes)
+
+        # 启用性能统计（SJZPQ_PROFILE=1）时按 F12 开始/结束 cProfile 和 tracemalloc 采集
+        if instrumentation.ENABLED:
+            self.root.bind_all('<F12>', lambda event: instrumentation.toggle_capture())
+
+        self.warn_load_errors(self.load_report.errors)
+
+    def warn_load_errors(self, errors):
+        """提示加载失败的武器文件，errors 为 LoadReport.files 格式的记录"""
+        if errors:
+            messagebox.showwarning("警告", "以下武器文件加载失败，已跳过:\n" + "\n".join(
+                f"{entry['file']}: {entry['error']}" for entry in errors
+            ))
+        
+    def on_close(self):
+        """关闭窗口前写完所有待保存的数据"""
+        if self.weapon_watcher is not None:
+            self.weapon_watcher.stop()
+        self.jobs.shutdown()
+        self.saver.close()
+        self.store.close()
+        self.root.destroy()
+
+    def create_job_controls(self, parent):
+        """创建后台任务的进度条和取消按钮（未放置），返回 (进度条, 取消按钮)"""
+        progress = ttk.Progressbar(parent, length=150, mode='determinate', maximum=1.0)
+        cancel_button = ttk.Button(parent, text="取消", state='disabled')
+        return progress, cancel_button
+
+    def run_job(self, controls, submit, *args, on_done=None, on_error=None, on_cancel=None, **callbacks):
+        """用 submit（self.jobs.start 或 self.jobs.map）启动任务，进度条和取消按钮跟随任务状态"""
+        progress, cancel_button = controls
+
+        def on_progress(value):
+            if value is None:
+                if str(progress['mode']) != 'indeterminate':
+                    progress.config(mode='indeterminate')
+                    progress.start(10)
+            else:
+                progress.config(mode='determinate', value=value)
+
+        def finish(callback):
+            def handler(*result):
+                # 窗口可能已经关闭；被新任务取代的旧任务不再改动控件
+                if progress.winfo_exists() and getattr(progress, 'job', None) is job:
+                    progress.stop()
+                    progress.config(mode='determinate', value=0)
+                    cancel_button.config(state='disabled')
+                if callback is not None:
+                    callback(*result)
+            return handler
+
+        job = submit(*args, on_progress=on_progress, on_done=finish(on_done),
+                     on_error=finish(on_error), on_cancel=finish(on_cancel), **callbacks)
+        progress.job = job
+        progress.stop()
+        progress.config(mode='determinate', value=0)
+        cancel_button.config(state='normal', command=job.cancel)
+        return job
+
     def create_scrollable_frame(self, parent):
         """创建一个可滚动���框架，只在需要时显示滚动条"""
         # 创建主容器框架
@@ -273,18 +374,23 @@ class WeaponSystemGUI:
         self.attachment_tree.heading('名称', text='配件名称')
         self.attachment_tree.heading('属性修改', text='属性修改')
         self.attachment_tree.grid(row=0, column=0, sticky='nsew')
+        tree_scroll = ttk.Scrollbar(list_frame, orient='vertical', command=self.attachment_tree.yview)
+        tree_scroll.grid(row=0, column=1, sticky='ns')
+        self.attachment_tree.configure(yscrollcommand=tree_scroll.set)
         list_frame.grid_rowconfigure(0, weight=1)
         list_frame.grid_columnconfigure(0, weight=1)
+        # 条目与配件目录之间的模型，只对变化的配件更新条目
+        self.attachment_tree_model = AttachmentTreeModel(self.attachment_tree, ATTACHMENT_CATALOG)
         
         # 绑定事件
         self.soldier_class_combo.bind('<<ComboboxSelected>>', self.on_soldier_class_select)
         self.weapon_type_combo.bind('<<ComboboxSelected>>', self.on_weapon_type_select)
         self.weapon_name_combo.bind('<<ComboboxSelected>>', self.on_attachment_weapon_select)
     
-    def add_new_attachment(self):
-        """添加新配件"""
+    def add_new_attachment(self, attachment_id=None):
+        """添加新配件；给出 attachment_id 时修改该配件"""
         dialog = tk.Toplevel(self.root)
-        dialog.title("添加新配件")
+        dialog.title("修改配件" if attachment_id is not None else "添加新配件")
         dialog.geometry("400x500")
         
         # 基本信息
@@ -370,8 +476,18 @@ class WeaponSystemGUI:
         weapon_entry.insert(0, "适用武器名称")
         weapon_entry.config(state='disabled')
         
-        # 如果当前已选择了枪械，默认勾选"特定武器专用"并填入枪械名称
-        weapon_name = self.weapon_name_combo.get()
+        if attachment_id is not None:
+            # 修改配件时预填充现有数据
+            record, weapon_name = ATTACHMENT_CATALOG.get(attachment_id)
+            type_combo.set(record.get('attachment_type', record.get('type', '')))
+            name_entry.insert(0, record['name'])
+            for field, entry in mod_entries.items():
+                entry.insert(0, str(record.get(field, 0)))
+            can_mount_grip_var.set(record.get('can_mount_grip', False))
+            on_type_select(None)
+        else:
+            # 如果当前已选择了枪械，默认勾选"特定武器专用"并填入枪械名称
+            weapon_name = self.weapon_name_combo.get()
         if weapon_name:
             is_specific_var.set(True)
             weapon_entry.config(state='normal')
@@ -392,26 +508,22 @@ class WeaponSystemGUI:
                 }
                 
                 # 保存配件数据
+                weapon_name = None
                 if is_specific_var.get():
                     weapon_name = weapon_entry.get().strip()
                     if not weapon_name:
                         messagebox.showwarning("警告", "请输入适用的武器名称")
                         return
-                    
-                    if weapon_name not in ATTACHMENTS_DATA['specific']:
-                        ATTACHMENTS_DATA['specific'][weapon_name] = {}
-                    if attachment_data['attachment_type'] not in ATTACHMENTS_DATA['specific'][weapon_name]:
-                        ATTACHMENTS_DATA['specific'][weapon_name][attachment_data['attachment_type']] = []
-                    ATTACHMENTS_DATA['specific'][weapon_name][attachment_data['attachment_type']].append(attachment_data)
+                
+                if attachment_id is not None:
+                    saved_id = ATTACHMENT_CATALOG.update(attachment_id, attachment_data, weapon_name)
                 else:
-                    if attachment_data['attachment_type'] not in ATTACHMENTS_DATA['common']:
-                        ATTACHMENTS_DATA['common'][attachment_data['attachment_type']] = []
-                    ATTACHMENTS_DATA['common'][attachment_data['attachment_type']].append(attachment_data)
+                    saved_id = register_attachment(attachment_data, weapon_name)
                 
-                save_attachments_data()
-                messagebox.showinfo("成功", "配件添加成功！")
+                self.saver.save_attachments()
+                self.attachment_tree_model.upsert(saved_id)  # 只更新这一条
+                messagebox.showinfo("成功", "配件修改成功！" if attachment_id is not None else "配件添加成功！")
                 dialog.destroy()
-                self.update_attachment_tree()  # 更新配件列表显示
                 
             except ValueError as e:
                 messagebox.showerror("错误", f"输入错误: {str(e)}")
@@ -429,47 +541,13 @@ class WeaponSystemGUI:
             messagebox.showwarning("警告", "请先选择要修改的配件")
             return
         
-        # 获取选中的配件数据
-        item = self.attachment_tree.item(selection[0])
-        attachment_type = item['values'][0]
-        attachment_name = item['values'][1]
-        
-        # 查找配件数据
-        attachment_data = None
-        is_specific = False
-        weapon_name = None
-        
-        # 在通用配件中查找
-        if attachment_type in ATTACHMENTS_DATA['common']:
-            for att in ATTACHMENTS_DATA['common'][attachment_type]:
-                if att['name'] == attachment_name:
-                    attachment_data = att
-                    break
-        
-        # 在特定武器配件中查找
-        if not attachment_data:
-            for wpn, types in ATTACHMENTS_DATA['specific'].items():
-                if attachment_type in types:
-                    for att in types[attachment_type]:
-                        if att['name'] == attachment_name:
-                            attachment_data = att
-                            is_specific = True
-                            weapon_name = wpn
-                            break
-                    if attachment_data:
-                        break
-        
-        if not attachment_data:
+        # 树形视图的条目ID即配件ID
+        attachment_id = int(selection[0])
+        if attachment_id not in ATTACHMENT_CATALOG:
             messagebox.showerror("错误", "找不到配件数据")
             return
         
-        # 创建编辑对话框
-        dialog = tk.Toplevel(self.root)
-        dialog.title("修改配件")
-        dialog.geometry("400x500")
-        
-        # ... ��建与add_new_attachment相似的界面，但预填充现有数据 ...
-        # (这部分代码与add_new_attachment类似，只是需要预填充数据)
+        self.add_new_attachment(attachment_id)
     
     def delete_attachment(self):
         """删除配件"""
@@ -481,71 +559,19 @@ class WeaponSystemGUI:
         if not messagebox.askyesno("确认", "确定要删除选中的配件吗？"):
             return
         
-        item = self.attachment_tree.item(selection[0])
-        attachment_type = item['values'][0]
-        attachment_name = item['values'][1]
-        
-        # 从数据中删除配件
-        deleted = False
-        
-        # 从通用配件中删除
-        if attachment_type in ATTACHMENTS_DATA['common']:
-            ATTACHMENTS_DATA['common'][attachment_type] = [
-                att for att in ATTACHMENTS_DATA['common'][attachment_type]
-                if att['name'] != attachment_name
-            ]
-            deleted = True
-        
-        # 从特定武器配件中删除
-        for weapon_types in ATTACHMENTS_DATA['specific'].values():
-            if attachment_type in weapon_types:
-                weapon_types[attachment_type] = [
-                    att for att in weapon_types[attachment_type]
-                    if att['name'] != attachment_name
-                ]
-                deleted = True
-        
-        if deleted:
-            save_attachments_data()
-            self.update_attachment_tree()
+        attachment_id = int(selection[0])
+        if attachment_id in ATTACHMENT_CATALOG:
+            ATTACHMENT_CATALOG.remove(attachment_id)
+            self.saver.save_attachments()
+            self.attachment_tree_model.remove(attachment_id)
             messagebox.showinfo("成功", "配件已删除")
         else:
             messagebox.showerror("错误", "删除失败")
     
+    @timed()
     def update_attachment_tree(self):
-        """更新配件列表显示"""
-        self.attachment_tree.delete(*self.attachment_tree.get_children())
-        
-        # 添加通用配件
-        for att_type, attachments in ATTACHMENTS_DATA['common'].items():
-            for att in attachments:
-                mods = []
-                if att['recoil_mod']: mods.append(f"后坐力{att['recoil_mod']:+}")
-                if att['handling_mod']: mods.append(f"操控{att['handling_mod']:+}")
-                if att['stability_mod']: mods.append(f"稳定性{att['stability_mod']:+}")
-                if att['hip_fire_mod']: mods.append(f"精度{att['hip_fire_mod']:+}")
-                
-                self.attachment_tree.insert('', 'end', values=(
-                    att_type,
-                    att['name'],
-                    ', '.join(mods)
-                ))
-        
-        # 添加特定武器配件
-        for weapon, types in ATTACHMENTS_DATA['specific'].items():
-            for att_type, attachments in types.items():
-                for att in attachments:
-                    mods = []
-                    if att['recoil_mod']: mods.append(f"后坐力{att['recoil_mod']:+}")
-                    if att['handling_mod']: mods.append(f"操控{att['handling_mod']:+}")
-                    if att['stability_mod']: mods.append(f"稳定性{att['stability_mod']:+}")
-                    if att['hip_fire_mod']: mods.append(f"精度{att['hip_fire_mod']:+}")
-                    
-                    self.attachment_tree.insert('', 'end', values=(
-                        att_type,
-                        f"{att['name']} ({weapon}专用)",
-                        ', '.join(mods)
-                    ))
+        """更新配件列表显示（只插入、修改、删除与配件目录不一致的条目）"""
+        self.attachment_tree_model.sync()
     
     def create_weapon_config_tab(self):
         """创建枪械配置标签页"""
@@ -562,9 +588,11 @@ class WeaponSystemGUI:
         
         # 为列表框添加滚动条
         list_scroll = ttk.Scrollbar(left_frame)
+        # exportselection=False：点击其他列表框时不会清除本列表框的选中状态
         self.config_weapon_listbox = tk.Listbox(left_frame, width=30, height=10,
-                                              yscrollcommand=list_scroll.set)
+                                              yscrollcommand=list_scroll.set, exportselection=False)
         list_scroll.config(command=self.config_weapon_listbox.yview)
+        self.config_weapon_listbox.bind('<<ListboxSelect>>', self.on_config_weapon_select)
         
         ttk.Label(left_frame, text="选择枪械:").pack()
         self.config_weapon_listbox.pack(side='left', fill='y', expand=True)
@@ -584,6 +612,10 @@ class WeaponSystemGUI:
         attachment_frame = ttk.LabelFrame(right_frame, text="配件管理")
         attachment_frame.pack(fill='x', pady=5)
         
+        # 选择状态模型：控件修改它，render_config_selection 根据变化刷新显示
+        self.config_selection = ConfigSelection()
+        self.config_selection.observe(self.render_config_selection)
+
         # 使用Checkbutton代替Listbox
         self.config_type_vars = {}  # 存储Checkbutton变量
         for type_name in Attachment.TYPES.values():
@@ -604,8 +636,9 @@ class WeaponSystemGUI:
         # 可用配件选择
         available_frame = ttk.LabelFrame(right_frame, text="可用配件")
         available_frame.pack(fill='both', expand=True)
-        self.config_available_listbox = tk.Listbox(available_frame, width=30, height=8)
+        self.config_available_listbox = tk.Listbox(available_frame, width=30, height=8, exportselection=False)
         self.config_available_listbox.pack(fill='both', expand=True)
+        self.config_candidates = []  # 可用配件列表每一行对应的配件名称，提示行为 None
         
         # 添加选择事件绑定
         self.config_available_listbox.bind('<<ListboxSelect>>', self.on_available_attachment_select)
@@ -628,7 +661,19 @@ class WeaponSystemGUI:
             state='disabled'
         )
         self.remove_attachment_button.pack(side='left', padx=5)
-        
+
+        ttk.Button(
+            button_frame,
+            text="自动配装",
+            command=self.open_loadout_optimizer
+        ).pack(side='left', padx=5)
+
+        ttk.Button(
+            button_frame,
+            text="配装前沿",
+            command=self.open_pareto_explorer
+        ).pack(side='left', padx=5)
+
         # 基础属性显示
         base_stats_frame = ttk.LabelFrame(right_frame, text="基础属性")
         base_stats_frame.pack(fill='x', padx=5, pady=5)
@@ -677,41 +722,74 @@ class WeaponSystemGUI:
         self.config_weapon_listbox.delete(0, tk.END)
         for weapon in self.weapons:
             self.config_weapon_listbox.insert(tk.END, weapon.name)
-    
+        weapon = self.config_selection.weapon
+        if weapon is not None and weapon not in self.weapons:
+            self.config_selection.select_weapon(self.weapons.get(weapon.name))
+        else:
+            self.show_config_weapon_selection()
+
+    def show_config_weapon_selection(self):
+        """让枪械列表的选中行与当前枪械一致"""
+        weapon = self.config_selection.weapon
+        index = self.weapons.index(weapon) if weapon is not None else None
+        if self.config_weapon_listbox.curselection() != ((index,) if index is not None else ()):
+            self.config_weapon_listbox.selection_clear(0, tk.END)
+            if index is not None:
+                self.config_weapon_listbox.selection_set(index)
+                self.config_weapon_listbox.see(index)
+
+    @timed()
     def on_config_weapon_select(self, event):
         """当在配置页面选择枪械时"""
         selection = self.config_weapon_listbox.curselection()
-        if not selection:
-            # 清除当前选择
-            self.current_weapon_label.config(text="未选择枪械")
-            # 禁用所有配件类型选择
+        if selection:
+            self.config_selection.select_weapon(self.weapons[selection[0]])
+
+    def on_config_type_check(self, type_name):
+        """当配件类型复选状态改变时（再次点击已选中的类型取消选择）"""
+        checked = self.config_type_vars[type_name]['var'].get()
+        self.config_selection.select_slot(type_name if checked else None)
+
+    def on_available_attachment_select(self, event):
+        """当选择可用配件时"""
+        selection = self.config_available_listbox.curselection()
+        if selection:
+            self.config_selection.select_candidate(self.config_candidates[selection[0]])
+
+    @timed()
+    def render_config_selection(self, changed):
+        """根据选择状态的变化刷新配置页面，只刷新受影响的部分"""
+        selection = self.config_selection
+        weapon = selection.weapon
+        if 'weapon' in changed:
+            self.show_config_weapon_selection()
+            self.show_config_weapon_stats(weapon)
+            state = 'normal' if weapon is not None else 'disabled'
             for type_data in self.config_type_vars.values():
-                type_data['check'].config(state='disabled')
-                type_data['var'].set(False)
-            # 禁用按钮
-            self.add_attachment_button.config(state='disabled')
-            self.remove_attachment_button.config(state='disabled')
+                type_data['check'].config(state=state)
+            self.add_attachment_button.config(state=state)
+            self.remove_attachment_button.config(state=state)
+
+        if changed & {'weapon', 'slot'}:
+            # 已安装的配件取决于当前枪械，可用配件取决于槽位
+            for type_name, type_data in self.config_type_vars.items():
+                type_data['var'].set(type_name == selection.slot)
+            self.show_config_candidates()
+        elif 'candidate' in changed:
+            self.show_config_candidate_selection()
+
+    def show_config_weapon_stats(self, weapon):
+        """显示枪械的基础属性、配件加成和最终属性"""
+        if weapon is None:
+            self.current_weapon_label.config(text="未选择枪械")
+            for labels in (self.base_stats_labels, self.mods_labels, self.final_stats_labels):
+                for label in labels.values():
+                    label.config(text="0")
             return
-        
-        weapon = self.weapons[selection[0]]
+
         # 更新当前选中枪械显示
         self.current_weapon_label.config(text=weapon.name)
-        
-        # 启用所有配件类型选择
-        for type_data in self.config_type_vars.values():
-            type_data['check'].config(state='normal')
-        
-        # 启用按钮
-        self.add_attachment_button.config(state='normal')
-        self.remove_attachment_button.config(state='normal')
-        
-        # 清除所有选中状态
-        for type_data in self.config_type_vars.values():
-            type_data['var'].set(False)
-        
-        # 清空可用配件列表
-        self.config_available_listbox.delete(0, tk.END)
-        
+
         # 更新基础属性显示
         base_stats = {
             'recoil_control': weapon.recoil_control,
@@ -723,124 +801,80 @@ class WeaponSystemGUI:
         for field, label in self.base_stats_labels.items():
             label.config(text=str(base_stats[field]))
         
-        # 计算并显示配件加成
-        total_mods = {
-            'recoil_control': 0,
-            'handling_speed': 0,
-            'ads_stability': 0,
-            'hip_fire_accuracy': 0
-        }
-        
-        for attachment in weapon.attachments:
-            total_mods['recoil_control'] += attachment.recoil_mod
-            total_mods['handling_speed'] += attachment.handling_mod
-            total_mods['ads_stability'] += attachment.stability_mod
-            total_mods['hip_fire_accuracy'] += attachment.hip_fire_mod
+        # 显示配件加成（武器上增量维护的总和）
+        field_to_key = dict(zip(STAT_FIELDS, STAT_KEYS))
+        total_mods = weapon.get_attachment_mods()
         
         for field, label in self.mods_labels.items():
-            mod_value = total_mods[field]
+            mod_value = total_mods[field_to_key[field]]
             label.config(text=f"{mod_value:+}" if mod_value != 0 else "0")
         
         # 更新最终属性显示
         modified_stats = weapon.get_modified_stats()
-        field_to_key = {
-            'recoil_control': '后坐力控制',
-            'handling_speed': '操控速度',
-            'ads_stability': '据枪稳定性',
-            'hip_fire_accuracy': '腰际射击精度'
-        }
         
         for field, label in self.final_stats_labels.items():
             label.config(text=str(modified_stats[field_to_key[field]]))
-    
-    def on_config_type_check(self, type_name):
-        """当配件类型复选状态改变时"""
-        weapon_selection = self.config_weapon_listbox.curselection()
-        if not weapon_selection:
-            self.config_type_vars[type_name].set(False)  # 如果没有选择武器，取消勾选
-            messagebox.showwarning("警", "请先选择一个枪械")
-            return
-        
-        weapon = self.weapons[weapon_selection[0]]
-        
-        # 如果取消勾选，清空可用配件列表
-        if not self.config_type_vars[type_name].get():
-            self.config_available_listbox.delete(0, tk.END)
-            return
-        
-        # 取消其他类型的选中状态
-        for t, var in self.config_type_vars.items():
-            if t != type_name:
-                var.set(False)
-        
-        # 更新可用配件列表
+
+    def show_config_candidates(self):
+        """显示当前槽位已安装的配件和可用配件"""
+        selection = self.config_selection
         self.config_available_listbox.delete(0, tk.END)
-        
-        # 获取该类型的所有可用配件
-        available_attachments = get_available_attachments(weapon.name, type_name)
-        
+        self.config_candidates = []
+        if selection.weapon is None or selection.slot is None:
+            return
+
         # 显示当前安装的配件（如果有）
-        installed = next((att for att in weapon.attachments if att.attachment_type == type_name), None)
+        installed = next((att for att in selection.weapon.attachments
+                          if att.attachment_type == selection.slot), None)
         if installed:
             self.config_available_listbox.insert(tk.END, f"当前安装: {installed.name}")
             self.config_available_listbox.insert(tk.END, "-" * 30)
+            self.config_candidates += [None, None]
         
         # 显示可用配件
-        for att in available_attachments:
+        for att in get_available_attachments(selection.weapon.name, selection.slot):
             self.config_available_listbox.insert(tk.END, att['name'])
-    
+            self.config_candidates.append(att['name'])
+        self.show_config_candidate_selection()
+
+    def show_config_candidate_selection(self):
+        """让可用配件列表的选中行与高亮的候选配件一致"""
+        candidate = self.config_selection.candidate
+        index = self.config_candidates.index(candidate) if candidate in self.config_candidates else None
+        if self.config_available_listbox.curselection() != ((index,) if index is not None else ()):
+            self.config_available_listbox.selection_clear(0, tk.END)
+            if index is not None:
+                self.config_available_listbox.selection_set(index)
+
     def add_config_attachment(self):
         """在配置页面添加配件"""
-        weapon_selection = self.config_weapon_listbox.curselection()
-        if not weapon_selection:
-            messagebox.showwarning("警告", "请选择一个械")
+        selection = self.config_selection
+        weapon = selection.weapon
+        if weapon is None:
+            messagebox.showwarning("警告", "请选择一个枪械")
             return
         
-        # 获取选中的配件类型
-        selected_type = None
-        for type_name, var in self.config_type_vars.items():
-            if var.get():
-                selected_type = type_name
-                break
-        
-        if not selected_type:
+        if not selection.slot:
             messagebox.showwarning("警告", "请选择配件类型")
             return
         
-        available_selection = self.config_available_listbox.curselection()
-        if not available_selection:
+        if not selection.candidate:
             messagebox.showwarning("警告", "请选择具体配件")
             return
         
-        # 保存当前选择的索引
-        weapon_idx = weapon_selection[0]
-        available_idx = available_selection[0]
-        
-        weapon = self.weapons[weapon_idx]
-        
-        # 获取选中的配件文本
-        available_text = self.config_available_listbox.get(available_idx)
-        
-        # 跳过分线和"当前安装"项
-        if available_text.startswith("当前安装:") or available_text.startswith("-"):
-            return
-        
-        # 获取可用配件列表
-        available_attachments = get_available_attachments(weapon.name, selected_type)
-        
         try:
             # 查找选中的配件数据
-            selected_attachment = None
-            for att in available_attachments:
-                if att['name'] == available_text:
-                    selected_attachment = att
-                    break
+            selected_attachment = next(
+                (att for att in get_available_attachments(weapon.name, selection.slot)
+                 if att['name'] == selection.candidate),
+                None
+            )
             
             if selected_attachment:
                 # 创建并添加配件
                 attachment = Attachment(
                     name=selected_attachment['name'],
-                    attachment_type=selected_type,
+                    attachment_type=selection.slot,
                     recoil_mod=selected_attachment['recoil_mod'],
                     handling_mod=selected_attachment['handling_mod'],
                     stability_mod=selected_attachment['stability_mod'],
@@ -849,16 +883,10 @@ class WeaponSystemGUI:
                 )
                 
                 weapon.add_attachment(attachment)
-                save_weapon(weapon)
+                self.saver.save_weapon(weapon)
                 
-                # 更新显示
-                self.on_config_weapon_select(None)
-                
-                # 恢复选择状态
-                self.config_weapon_listbox.selection_clear(0, tk.END)
-                self.config_weapon_listbox.selection_set(weapon_idx)
-                self.config_type_vars[selected_type].set(True)
-                self.on_config_type_check(selected_type)
+                # 更新显示（枪械、槽位和候选配件保持不变）
+                selection.weapon_modified()
                 
                 messagebox.showinfo("成功", "配件添加成功！")
             else:
@@ -869,36 +897,305 @@ class WeaponSystemGUI:
     
     def remove_config_attachment(self):
         """在配置页面移除配件"""
-        weapon_selection = self.config_weapon_listbox.curselection()
-        if not weapon_selection:
+        selection = self.config_selection
+        weapon = selection.weapon
+        if weapon is None:
             messagebox.showwarning("警告", "请选择一个枪械")
             return
         
-        # 获取选中的配件类型
-        selected_type = None
-        for type_name, var in self.config_type_vars.items():
-            if var.get():
-                selected_type = type_name
-                break
-        
-        if not selected_type:
+        if not selection.slot:
             messagebox.showwarning("警告", "请选择配件类型")
             return
         
-        weapon = self.weapons[weapon_selection[0]]
-        
         # 查找并移除配件
-        attachment = next((att for att in weapon.attachments if att.attachment_type == selected_type), None)
+        attachment = next((att for att in weapon.attachments if att.attachment_type == selection.slot), None)
         if attachment:
-            weapon.remove_attachment(attachment.name)
-            save_weapon(weapon)
+            dropped = weapon.remove_attachment(attachment.name)
+            self.saver.save_weapon(weapon)
             
             # 更新显示
-            self.on_config_weapon_select(None)
-            messagebox.showinfo("成功", "配件移除成功！")
+            selection.weapon_modified()
+            if dropped:
+                names = '、'.join(att.name for att in dropped)
+                messagebox.showinfo("成功", f"配件移除成功！依赖它的配件也已移除：{names}")
+            else:
+                messagebox.showinfo("成功", "配件移除成功！")
         else:
             messagebox.showinfo("提示", "该类型没有已安装的配件")
-    
+
+    def apply_build(self, weapon, attachments, parent):
+        """把配装方案整体安装到武器并保存；任一配件安装失败时武器的配件保持原样，返回是否成功"""
+        previous = weapon.attachments
+        try:
+            weapon.attachments = []
+            for attachment in attachments:
+                weapon.add_attachment(attachment)
+        except ValueError as e:
+            weapon.attachments = previous
+            messagebox.showerror("错误", str(e), parent=parent)
+            return False
+        self.saver.save_weapon(weapon)
+
+        # 窗口打开期间可能已切换到其他枪械
+        if self.config_selection.weapon is weapon:
+            self.config_selection.weapon_modified()
+        messagebox.showinfo("成功", "配装方案已应用", parent=parent)
+        return True
+
+    def open_loadout_optimizer(self):
+        """打开自动配装窗口"""
+        weapon = self.config_selection.weapon
+        if weapon is None:
+            messagebox.showwarning("警告", "请选择一个枪械")
+            return
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title(f"自动配装 - {weapon.name}")
+        dialog.geometry("500x450")
+
+        # 属性权重
+        weights_frame = ttk.LabelFrame(dialog, text="属性权重")
+        weights_frame.pack(fill='x', padx=5, pady=5)
+
+        weight_entries = {}
+        for i, key in enumerate(STAT_KEYS):
+            ttk.Label(weights_frame, text=key).grid(row=i//2, column=i%2*2, padx=5, pady=2)
+            entry = ttk.Entry(weights_frame, width=10)
+            entry.grid(row=i//2, column=i%2*2+1, padx=5, pady=2)
+            entry.insert(0, "1")
+            weight_entries[key] = entry
+
+        top_k_frame = ttk.Frame(dialog)
+        top_k_frame.pack(fill='x', padx=5, pady=5)
+        ttk.Label(top_k_frame, text="方案数量:").pack(side='left')
+        top_k_entry = ttk.Entry(top_k_frame, width=10)
+        top_k_entry.pack(side='left', padx=5)
+        top_k_entry.insert(0, "5")
+
+        # 结果列表
+        result_frame = ttk.LabelFrame(dialog, text="配装方案")
+        result_frame.pack(fill='both', expand=True, padx=5, pady=5)
+        result_listbox = tk.Listbox(result_frame, height=10)
+        result_listbox.pack(fill='both', expand=True)
+
+        results = []
+        job = None
+
+        def show_results(found):
+            results[:] = found
+            result_listbox.delete(0, tk.END)
+            for i, result in enumerate(results, 1):
+                names = '、'.join(att.name for att in result['attachments']) or '无配件'
+                stats = ' '.join(f"{key}{value:g}" for key, value in result['stats'].items())
+                result_listbox.insert(tk.END, f"{i}. 得分{result['score']:.1f} | {stats} | {names}")
+
+        def run_optimizer():
+            nonlocal job
+            if job is not None and job.running:
+                return
+            try:
+                weights = {key: float(entry.get() or 0) for key, entry in weight_entries.items()}
+                top_k = int(top_k_entry.get())
+            except ValueError:
+                messagebox.showerror("错误", "请输入有效的权重和方案数量", parent=dialog)
+                return
+
+            # 搜索在后台线程中进行，取消时在下一个搜索节点中止；武器和配件目录在这里复制一份，
+            # 搜索期间界面上的修改不影响后台线程
+            snapshot = snapshot_loadout(weapon)
+            job = self.run_job(
+                job_controls, self.jobs.start,
+                lambda job, *args: optimize_loadout(*args, check=job.check, snapshot=snapshot),
+                weapon, weights, top_k,
+                on_done=show_results,
+                on_error=lambda e: messagebox.showerror("错误", f"配装计算失败: {e}", parent=dialog)
+            )
+            job.on_progress(None)
+
+        def close_dialog():
+            if job is not None:
+                job.cancel()
+            dialog.destroy()
+
+        def apply_result():
+            selection = result_listbox.curselection()
+            if not selection:
+                messagebox.showwarning("警告", "请选择一个配装方案", parent=dialog)
+                return
+
+            self.apply_build(weapon, results[selection[0]]['attachments'], dialog)
+
+        progress_frame = ttk.Frame(dialog)
+        progress_frame.pack(fill='x', padx=5)
+        job_controls = self.create_job_controls(progress_frame)
+        job_controls[0].pack(side='left', fill='x', expand=True, padx=5)
+        job_controls[1].pack(side='left', padx=5)
+
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="计算", command=run_optimizer).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="应用方案", command=apply_result).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="关闭", command=close_dialog).pack(side='left', padx=5)
+        dialog.protocol("WM_DELETE_WINDOW", close_dialog)
+
+    def open_pareto_explorer(self):
+        """打开配装前沿窗口：四项属性上的非支配配装，按选择的两项属性画散点图"""
+        weapon = self.config_selection.weapon
+        if weapon is None:
+            messagebox.showwarning("警告", "请选择一个枪械")
+            return
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title(f"配装前沿 - {weapon.name}")
+        dialog.geometry("700x600")
+
+        axes_frame = ttk.Frame(dialog)
+        axes_frame.pack(fill='x', padx=5, pady=5)
+        ttk.Label(axes_frame, text="横轴:").pack(side='left')
+        x_var = tk.StringVar(value=STAT_KEYS[0])
+        ttk.Combobox(axes_frame, textvariable=x_var, values=STAT_KEYS, state='readonly',
+                     width=12).pack(side='left', padx=5)
+        ttk.Label(axes_frame, text="纵轴:").pack(side='left')
+        y_var = tk.StringVar(value=STAT_KEYS[1])
+        ttk.Combobox(axes_frame, textvariable=y_var, values=STAT_KEYS, state='readonly',
+                     width=12).pack(side='left', padx=5)
+        count_label = ttk.Label(axes_frame, text="")
+        count_label.pack(side='left', padx=10)
+
+        canvas = tk.Canvas(dialog, background='white', highlightthickness=0)
+        canvas.pack(fill='both', expand=True, padx=5, pady=5)
+
+        detail_label = ttk.Label(dialog, text="点击散点查看配装", wraplength=680, justify='left')
+        detail_label.pack(fill='x', padx=5)
+
+        front = None
+        points = []
+        selected = None
+        job = None
+        margin = 40
+        radius = 4
+
+        def redraw(event=None):
+            canvas.delete('all')
+            if not points:
+                return
+            x_key, y_key = x_var.get(), y_var.get()
+            xy = [(p['stats'][x_key], p['stats'][y_key]) for p in points]
+            width, height = canvas.winfo_width(), canvas.winfo_height()
+            x_min, x_max = min(x for x, _ in xy), max(x for x, _ in xy)
+            y_min, y_max = min(y for _, y in xy), max(y for _, y in xy)
+            x_span, y_span = (x_max - x_min) or 1, (y_max - y_min) or 1
+
+            def to_canvas(x, y):
+                return (margin + (x - x_min) / x_span * (width - 2 * margin),
+                        height - margin - (y - y_min) / y_span * (height - 2 * margin))
+
+            # 坐标轴
+            canvas.create_line(margin, height - margin, width - margin, height - margin)
+            canvas.create_line(margin, margin, margin, height - margin)
+            canvas.create_text(width / 2, height - 12, text=x_key)
+            canvas.create_text(12, height / 2, text=y_key, angle=90)
+            for value, anchor, position in ((x_min, 'nw', to_canvas(x_min, y_min)),
+                                            (x_max, 'ne', to_canvas(x_max, y_min))):
+                canvas.create_text(position[0], position[1] + 4, text=f"{value:g}", anchor=anchor)
+            for value, position in ((y_min, to_canvas(x_min, y_min)), (y_max, to_canvas(x_min, y_max))):
+                canvas.create_text(position[0] - 4, position[1], text=f"{value:g}", anchor='e')
+
+            # 两项属性上的非支配点用折线连接并高亮，其余点是在另外两项属性上占优的配装
+            frontier = skyline_2d(xy)
+            if len(frontier) > 1:
+                canvas.create_line(*[c for i in frontier for c in to_canvas(*xy[i])], fill='#d62728')
+            highlighted = set(frontier)
+            for i, (x, y) in enumerate(xy):
+                cx, cy = to_canvas(x, y)
+                color = '#d62728' if i in highlighted else '#7f7f7f'
+                canvas.create_oval(cx - radius, cy - radius, cx + radius, cy + radius, fill=color,
+                                   outline='black' if i == selected else color, width=2 if i == selected else 1,
+                                   tags=('point', f'point{i}'))
+
+        def on_click(event):
+            nonlocal selected
+            item = canvas.find_overlapping(event.x - radius, event.y - radius, event.x + radius, event.y + radius)
+            indices = [int(tag[5:]) for i in item for tag in canvas.gettags(i)
+                       if tag.startswith('point') and tag != 'point']
+            if not indices:
+                return
+            selected = indices[-1]
+            point = points[selected]
+            names = '、'.join(att.name for att in point['attachments']) or '无配件'
+            stats = ' '.join(f"{key}{value:g}" for key, value in point['stats'].items())
+            detail_label.config(text=f"{stats}\n{names}")
+            redraw()
+
+        def show_front(changed=True):
+            nonlocal points, selected
+            if changed:
+                points = front.points()
+                selected = None
+                detail_label.config(text="点击散点查看配装")
+            count_label.config(text=f"非支配配装 {len(points)} 套")
+            redraw()
+
+        def discard_front(*args):
+            # 中途停止的增量更新可能只完成了一部分，下次重新计算
+            nonlocal front
+            front = None
+
+        def compute():
+            """首次计算整个前沿；之后只按配件目录的变化增量更新"""
+            nonlocal job
+
+            def run(job):
+                nonlocal front
+                if front is None:
+                    front = ParetoFront(weapon, check=job.check, snapshot=snapshot)
+                    return True
+                front.check = job.check
+                return front.sync(snapshot)
+
+            if job is not None and job.running:
+                return
+            # 武器和配件目录在界面线程中复制一份，计算期间界面上的修改不影响后台线程
+            snapshot = snapshot_loadout(weapon)
+            job = self.run_job(
+                job_controls, self.jobs.start, run,
+                on_done=show_front,
+                on_error=lambda e: (discard_front(),
+                                    messagebox.showerror("错误", f"配装前沿计算失败: {e}", parent=dialog)),
+                on_cancel=discard_front
+            )
+            job.on_progress(None)
+
+        def apply_selected():
+            if selected is None:
+                messagebox.showwarning("警告", "请先点击选择一个配装", parent=dialog)
+                return
+            self.apply_build(weapon, points[selected]['attachments'], dialog)
+
+        def close_dialog():
+            if job is not None:
+                job.cancel()
+            dialog.destroy()
+
+        canvas.bind('<Configure>', redraw)
+        canvas.tag_bind('point', '<Button-1>', on_click)
+        x_var.trace_add('write', lambda *args: redraw())
+        y_var.trace_add('write', lambda *args: redraw())
+
+        progress_frame = ttk.Frame(dialog)
+        progress_frame.pack(fill='x', padx=5)
+        job_controls = self.create_job_controls(progress_frame)
+        job_controls[0].pack(side='left', fill='x', expand=True, padx=5)
+        job_controls[1].pack(side='left', padx=5)
+
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="计算/更新", command=compute).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="应用方案", command=apply_selected).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="关闭", command=close_dialog).pack(side='left', padx=5)
+        dialog.protocol("WM_DELETE_WINDOW", close_dialog)
+        compute()
+
     def create_btk_calculator_tab(self):
         """创建BTK计算器标签页"""
         btk_frame = ttk.Frame(self.main_frame)
@@ -912,14 +1209,15 @@ class WeaponSystemGUI:
         input_frame = ttk.Frame(btk_frame)
         input_frame.pack(fill='x', padx=5, pady=5)
         
-        # 为文本框添加滚动条
-        text_scroll = ttk.Scrollbar(btk_frame)
-        self.btk_result_text = tk.Text(btk_frame, height=20, width=50,
-                                      yscrollcommand=text_scroll.set)
-        text_scroll.config(command=self.btk_result_text.yview)
+        # 结果表格，点击列标题排序
+        table_scroll = ttk.Scrollbar(btk_frame)
+        self.btk_result_tree = ttk.Treeview(btk_frame, columns=COLUMN_IDS, show='headings',
+                                            height=20, yscrollcommand=table_scroll.set)
+        table_scroll.config(command=self.btk_result_tree.yview)
+        self.btk_table_model = BtkTableModel(self.btk_result_tree, chunk_size=self.BTK_CHUNK_SIZE)
         
-        self.btk_result_text.pack(side='left', fill='both', expand=True, padx=5, pady=5)
-        text_scroll.pack(side='right', fill='y')
+        self.btk_result_tree.pack(side='left', fill='both', expand=True, padx=5, pady=5)
+        table_scroll.pack(side='right', fill='y')
         
         ttk.Label(input_frame, text="目标生命值:").pack(side='left')
         self.health_entry = ttk.Entry(input_frame, width=10)
@@ -927,6 +1225,9 @@ class WeaponSystemGUI:
         self.health_entry.insert(0, "100")
         
         ttk.Button(input_frame, text="计算", command=self.calculate_btk).pack(side='left', padx=5)
+        self.btk_job_controls = self.create_job_controls(input_frame)
+        self.btk_job_controls[0].pack(side='left', padx=5)
+        self.btk_job_controls[1].pack(side='left', padx=5)
     
     def update_weapon_list(self):
         """更新武器列表"""
@@ -940,6 +1241,7 @@ class WeaponSystemGUI:
         for weapon in self.weapons:
             self.attachment_weapon_listbox.insert(tk.END, weapon.name)
     
+    @timed()
     def on_weapon_select(self, event):
         """当选择武器时更新显示信息"""
         selection = self.weapon_listbox.curselection()
@@ -982,15 +1284,7 @@ class WeaponSystemGUI:
         # 更新兵种选择
         for sclass, var in self.soldier_class_vars.items():
             var.set(sclass in weapon.soldier_classes)
-        
-        # 打印调试信息
-        print("\n选中枪械详细信息:")
-        print(f"名称: {weapon.name}")
-        print(f"枪械类型: {weapon.weapon_type}")
-        print(f"适用兵种: {weapon.soldier_classes}")
-        print("基本属性:")
-        for field, value in basic_fields.items():
-            print(f"  {field}: {value}")
+
     
     def on_soldier_class_select(self, event):
         """当选择兵种时"""
@@ -998,14 +1292,8 @@ class WeaponSystemGUI:
         if not soldier_class:
             return
         
-        # 更新枪械类型下拉框
-        available_types = set()
-        for weapon in self.weapons:
-            if soldier_class in weapon.soldier_classes:
-                available_types.add(weapon.weapon_type)
-        
-        # 按照预定义的顺序排序械类型
-        sorted_types = [wtype for wtype in Weapon.WEAPON_TYPES if wtype in available_types]
+        # 更新枪械类型下拉框（按照预定义的顺序排序枪械类型）
+        sorted_types = self.weapons.types_for_class(soldier_class)
         
         # 更新枪械类型下拉框
         self.weapon_type_combo['values'] = sorted_types
@@ -1024,11 +1312,7 @@ class WeaponSystemGUI:
             return
         
         # 取符合条件的枪械
-        matching_weapons = []
-        for weapon in self.weapons:
-            if (soldier_class in weapon.soldier_classes and 
-                weapon.weapon_type == weapon_type):
-                matching_weapons.append(weapon)
+        matching_weapons = self.weapons.filter(soldier_class, weapon_type)
         
         # 按名称排序
         matching_weapons.sort(key=lambda w: w.name)
@@ -1037,9 +1321,6 @@ class WeaponSystemGUI:
         # 更新枪械名称下拉框
         self.weapon_name_combo['values'] = weapon_names
         self.weapon_name_combo.set('')  # 清除当前选择
-        
-        print(f"\n选择枪械类型: {weapon_type}")
-        print(f"可用枪械: {weapon_names}")
     
     def on_attachment_weapon_select(self, event):
         """当选择枪械时"""
@@ -1048,20 +1329,12 @@ class WeaponSystemGUI:
             return
         
         # 查找选中的武器
-        weapon = next((w for w in self.weapons if w.name == weapon_name), None)
+        weapon = self.weapons.get(weapon_name)
         if not weapon:
             return
         
         # 更新配件树形视图
         self.update_attachment_tree()  # 确保这个方法存在
-        
-        print(f"\n选择枪械: {weapon_name}")
-        if weapon.attachments:
-            print("已安装配件:")
-            for att in weapon.attachments:
-                print(f"- {att.name} ({att.attachment_type})")
-        else:
-            print("当前没有已安装的配件")
     
     def add_weapon(self):
         """添加新枪械"""
@@ -1090,8 +1363,9 @@ class WeaponSystemGUI:
             weapon_data['soldier_classes'] = selected_classes
             
             weapon = Weapon(**weapon_data)
-            self.weapons.append(weapon)
-            save_weapon(weapon)
+            self.weapons.add(weapon)
+            self.weapon_files[weapon] = weapon_filename(weapon.name)
+            self.saver.save_weapon(weapon)
             self.update_weapon_list()
             self.update_attachment_weapon_list()
             messagebox.showinfo("成功", "枪械添加成功！")
@@ -1121,15 +1395,13 @@ class WeaponSystemGUI:
                 sclass for sclass, var in self.soldier_class_vars.items() 
                 if var.get()
             ]
+            self.weapons.reindex(weapon)
+            # 修改名称后保存到新名称对应的文件
+            self.weapon_files[weapon] = weapon_filename(weapon.name)
             
-            save_weapon(weapon)
+            self.saver.save_weapon(weapon)
             messagebox.showinfo("成功", "修改已保存")
             
-            # 打印试信息
-            print(f"保存枪械: {weapon.name}")
-            print(f"枪械类型: {weapon.weapon_type}")
-            print(f"适用兵种: {weapon.soldier_classes}")
-            
         except Exception as e:
             messagebox.showerror("错误", f"保存失败: {str(e)}")
     
@@ -1142,14 +1414,88 @@ class WeaponSystemGUI:
         
         weapon = self.weapons[selection[0]]
         if messagebox.askyesno("确认", f"确定要删除 {weapon.name} 吗？"):
-            if delete_weapon(weapon.name):
+            if self.saver.delete_weapon(weapon.name):
                 self.weapons.pop(selection[0])
+                self.weapon_files.pop(weapon, None)
                 # 更新所有相关的列表和显示
                 self.update_all_weapon_lists()
                 messagebox.showinfo("成功", "枪械已删除")
             else:
                 messagebox.showerror("错误", "删除失败")
     
+    def poll_weapon_changes(self):
+        """定时取出武器目录的变化并同步到列表"""
+        batch = self.weapon_watcher.take_batch()
+        if batch:
+            self.apply_weapon_file_changes(batch)
+        self.root.after(self.WATCH_INTERVAL_MS, self.poll_weapon_changes)
+
+    def apply_weapon_file_changes(self, filenames):
+        """把武器目录中变化的文件同步到武器列表，只更新受影响的行
+
+        文件按武器读取自的文件名（self.weapon_files）对应到行，没有记录时按枪械名称推算。
+        文件内容与内存中的武器相同（例如本程序自己保存的文件）或该武器还有尚未写入的
+        保存时跳过。配件列表只取决于配件数据，不受武器文件变化影响。
+        """
+        directory = self.store.directory
+        rows = {}
+        for index, weapon in enumerate(self.weapons):
+            rows.setdefault(self.weapon_files.get(weapon) or weapon_filename(weapon.name), index)
+        rows.pop(None, None)
+        if RESCAN in filenames:
+            filenames = {name for name in os.listdir(directory) if name.endswith('.json')}
+            filenames.update(rows)
+
+        listboxes = [self.weapon_listbox, self.config_weapon_listbox]
+        selected = {listbox: listbox.curselection() for listbox in listboxes}
+
+        removed, replaced, errors = [], set(), []
+        for filename in sorted(filenames):
+            index = rows.get(filename)
+            filepath = os.path.join(directory, filename)
+            if not os.path.exists(filepath):
+                if index is not None:
+                    removed.append(index)
+                continue
+
+            weapon, error = load_weapon_file(filepath)
+            if weapon is None:
+                errors.append({'file': filename, 'error': error})
+                continue
+            if index is None:
+                self.weapons.add(weapon)
+                self.weapon_files[weapon] = filename
+                for listbox in listboxes:
+                    listbox.insert(tk.END, weapon.name)
+                continue
+
+            old = self.weapons[index]
+            if self.saver.has_pending(('weapon', old.name)) or weapon.to_dict() == old.to_dict():
+                continue
+            self.weapons.replace(index, weapon)
+            self.weapon_files.pop(old, None)
+            self.weapon_files[weapon] = filename
+            replaced.add(index)
+            for listbox in listboxes:
+                listbox.delete(index)
+                listbox.insert(index, weapon.name)
+                if index in selected[listbox]:
+                    listbox.selection_set(index)
+
+        for index in sorted(removed, reverse=True):
+            self.weapon_files.pop(self.weapons.pop(index), None)
+            for listbox in listboxes:
+                listbox.delete(index)
+
+        # 选中的武器被替换或删除时刷新详细信息
+        touched = set(removed) | replaced
+        if touched & set(selected[self.weapon_listbox]):
+            self.on_weapon_select(None)
+        config_weapon = self.config_selection.weapon
+        if config_weapon is not None and config_weapon not in self.weapons:
+            self.config_selection.select_weapon(self.weapons.get(config_weapon.name))
+        self.warn_load_errors(errors)
+
     def update_all_weapon_lists(self):
         """更新所有涉及到枪械列表的显示"""
         # 更新枪械管理标签页的列表
@@ -1197,21 +1543,15 @@ class WeaponSystemGUI:
                     return
                 
                 # 保存配件数据
-                if weapon_name not in ATTACHMENTS_DATA['specific']:
-                    ATTACHMENTS_DATA['specific'][weapon_name] = {}
-                if attachment_type not in ATTACHMENTS_DATA['specific'][weapon_name]:
-                    ATTACHMENTS_DATA['specific'][weapon_name][attachment_type] = []
-                ATTACHMENTS_DATA['specific'][weapon_name][attachment_type].append(attachment_data)
+                register_attachment(attachment_data, weapon_name)
                 
-                save_attachments_data()
+                self.saver.save_attachments()
                 messagebox.showinfo("成功", "特定武器配件添加成功！")
             else:
                 # 通用配件的处理逻辑保持不变
-                if attachment_type not in ATTACHMENTS_DATA['common']:
-                    ATTACHMENTS_DATA['common'][attachment_type] = []
-                ATTACHMENTS_DATA['common'][attachment_type].append(attachment_data)
+                register_attachment(attachment_data)
                 
-                save_attachments_data()
+                self.saver.save_attachments()
                 messagebox.showinfo("成功", "通用配件添加成功！")
                 
                 # 清空输入框
@@ -1280,8 +1620,9 @@ class WeaponSystemGUI:
                     weapon_data[field] = float(value) if field != 'name' else value
                 
                 weapon = Weapon(**weapon_data)
-                self.weapons.append(weapon)
-                save_weapon(weapon)
+                self.weapons.add(weapon)
+                self.weapon_files[weapon] = weapon_filename(weapon.name)
+                self.saver.save_weapon(weapon)
                 self.update_weapon_list()
                 self.update_attachment_weapon_list()
                 messagebox.showinfo("成功", "枪械添加成功！")
@@ -1327,48 +1668,54 @@ class WeaponSystemGUI:
             if hasattr(att, 'can_mount_grip'):
                 text.insert(tk.END, f"  可安装握把座: {'是' if att.can_mount_grip else '否'}\n")
     
+    @timed()
     def calculate_btk(self):
         """计算BTK"""
         try:
             health = float(self.health_entry.get())
-            self.btk_result_text.delete(1.0, tk.END)
-            
-            for weapon in self.weapons:
-                self.btk_result_text.insert(tk.END, f"\n{weapon.name}的BTK:\n")
-                btks = weapon.calculate_btk(health)
-                for part, btk in btks.items():
-                    self.btk_result_text.insert(tk.END, f"{part}: {btk}发\n")
-                kill_time_ms = (min(btks.values()) - 1) * (60000 / weapon.fire_rate)
-                self.btk_result_text.insert(tk.END, f"最快理论击杀时间: {kill_time_ms:.1f}毫秒\n")
         except ValueError:
             messagebox.showerror("错误", "请输入有效的生命值")
-    
-    def on_available_attachment_select(self, event):
-        """当选择可用配件时"""
-        # 防止事件处理过程中的选择状态丢失
-        self.root.after(100, self.maintain_selection_state)
-
-    def maintain_selection_state(self):
-        """维持选择状态"""
-        # 保存当前选择状态
-        weapon_selection = self.config_weapon_listbox.curselection()
-        if not weapon_selection:
             return
-        
-        # 获取选中的配件类型
-        selected_type = None
-        for type_name, var in self.config_type_vars.items():
-            if var.get():
-                selected_type = type_name
-                break
-        
-        if not selected_type:
+
+        if self.btk_job is not None and self.btk_job.running:
+            self.btk_job.cancel()
+        self.btk_table_model.clear()
+        weapons = list(self.weapons)
+        if not weapons:
             return
-        
-        # 确保选择状态保持不变
-        self.config_weapon_listbox.selection_clear(0, tk.END)
-        self.config_weapon_listbox.selection_set(weapon_selection[0])
-        self.config_type_vars[selected_type].set(True)
+
+        # 在主线程中取出伤害和射速数组（可能需要加载延迟加载的武器），后台只处理数组
+        names = [(weapon.name, weapon.weapon_type) for weapon in weapons]
+        damage = damage_matrix(weapons)
+        fire_rates = fire_rate_vector(weapons)
+        size = self.BTK_CHUNK_SIZE
+        chunks = [(damage[i:i + size], fire_rates[i:i + size], [health])
+                  for i in range(0, len(weapons), size)]
+
+        finished = {}
+        next_chunk = 0
+
+        def show_chunk(partial):
+            # 各批可能乱序完成，按武器顺序加入表格
+            nonlocal next_chunk
+            index, result = partial
+            finished[index] = result
+            while next_chunk in finished:
+                btk, ttk = finished.pop(next_chunk)
+                self.btk_table_model.add_rows(
+                    (name, weapon_type, *btk[i, 0].tolist(), float(ttk[i, 0]))
+                    for i, (name, weapon_type) in enumerate(names[next_chunk * size:(next_chunk + 1) * size])
+                )
+                next_chunk += 1
+
+        started = time.perf_counter()
+        self.btk_job = self.run_job(
+            self.btk_job_controls, self.jobs.map, _btk_chunk, chunks,
+            on_partial=show_chunk,
+            on_done=lambda _: instrumentation.record('WeaponSystemGUI.calculate_btk.job',
+                                                     time.perf_counter() - started),
+            on_error=lambda e: messagebox.showerror("错误", f"BTK计算失败: {e}")
+        )
 
 if __name__ == "__main__":
     root = tk.Tk()
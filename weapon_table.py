@@ -0,0 +1,66 @@
+import threading
+from array import array
+
+# 按列存储的数值字段
+NUMERIC_FIELDS = [
+    'base_damage',
+    'stomach_damage',
+    'limb_damage',
+    'foot_damage',
+    'range_meters',
+    'fire_rate',
+    'recoil_control',
+    'handling_speed',
+    'ads_stability',
+    'hip_fire_accuracy'
+]
+
+
+class WeaponTable:
+    """按列存储武器数值字段的表
+
+    每个字段一列，使用连续的 array('d') 存储；Weapon 对象只保存所在的表和行号，
+    读写数值字段时直接访问对应的列。被释放的行会被后续新建的武器复用。
+
+    武器可能在多个线程中创建和释放（加载线程池、目录监视、后台任务），分配和释放行
+    以及以缓冲区方式读取列（例如 np.frombuffer，读取期间列不能扩容）都要持有 lock。
+    """
+    __slots__ = ('columns', 'lock', '_free')
+
+    def __init__(self):
+        self.columns = {field: array('d') for field in NUMERIC_FIELDS}
+        self.lock = threading.Lock()
+        self._free = []
+
+    def __len__(self):
+        """已分配的行数（包括等待复用的空闲行）"""
+        return len(self.columns[NUMERIC_FIELDS[0]])
+
+    @property
+    def live_rows(self):
+        """正在使用的行数"""
+        return len(self) - len(self._free)
+
+    def allocate(self):
+        """分配一行并返回行号，新行的数值均为0"""
+        with self.lock:
+            if self._free:
+                return self._free.pop()
+            for column in self.columns.values():
+                column.append(0.0)
+            return len(self) - 1
+
+    def release(self, row):
+        """释放一行，供之后新建的武器复用"""
+        with self.lock:
+            for column in self.columns.values():
+                column[row] = 0.0
+            self._free.append(row)
+
+    def row(self, row):
+        """读取一行的全部数值字段"""
+        return {field: column[row] for field, column in self.columns.items()}
+
+
+# 未指定表时，所有武器共用的默认表
+DEFAULT_TABLE = WeaponTable()
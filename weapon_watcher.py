@@ -0,0 +1,143 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+
+# inotify 事件掩码（见 <sys/inotify.h>）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+# take_batch 返回的批次中包含 RESCAN 时表示事件丢失，需要重新检查全部文件
+RESCAN = None
+
+
+class _Watcher(ABC):
+    """目录监视器的公共部分：后台线程记录变化的文件名，take_batch 取出去抖后的批次"""
+
+    def __init__(self, directory, debounce=0.3, suffix='.json'):
+        self.directory = directory
+        self.debounce = debounce
+        self.suffix = suffix
+        self._changed = set()
+        self._last_event = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _record(self, filename):
+        if filename is RESCAN or filename.endswith(self.suffix):
+            with self._lock:
+                self._changed.add(filename)
+                self._last_event = time.monotonic()
+
+    def take_batch(self):
+        """最近 debounce 秒内没有新变化时返回变化的文件名集合并清空，否则返回空集合
+
+        在 Tk 线程中定时调用（例如通过 root.after），不会阻塞。
+        """
+        with self._lock:
+            if not self._changed or time.monotonic() - self._last_event < self.debounce:
+                return set()
+            batch, self._changed = self._changed, set()
+            return batch
+
+    @abstractmethod
+    def _run(self):
+        """在后台线程中运行，对每个变化的文件调用 _record，直到 stop() 被调用"""
+
+
+class InotifyWatcher(_Watcher):
+    """基于 Linux inotify（通过 ctypes 调用 libc）的目录监视器"""
+
+    def __init__(self, directory, debounce=0.3, suffix='.json'):
+        super().__init__(directory, debounce, suffix)
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"无法监视目录 {directory}")
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                readable, _, _ = select.select([self._fd], [], [], 0.5)
+                if not readable:
+                    continue
+                try:
+                    data = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                offset = 0
+                while offset < len(data):
+                    _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                    offset += _EVENT_HEADER.size
+                    name = data[offset:offset + length].rstrip(b'\0')
+                    offset += length
+                    if mask & IN_Q_OVERFLOW:
+                        self._record(RESCAN)
+                    elif name:
+                        self._record(os.fsdecode(name))
+        finally:
+            os.close(self._fd)
+
+
+class PollingWatcher(_Watcher):
+    """定时比较目录中文件的 mtime 和大小的监视器（没有 inotify 时使用）"""
+
+    def __init__(self, directory, debounce=0.3, suffix='.json', interval=1.0):
+        super().__init__(directory, debounce, suffix)
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(self.suffix):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    snapshot[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            pass
+        return snapshot
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            snapshot = self._scan()
+            for name in snapshot.keys() | self._snapshot.keys():
+                if snapshot.get(name) != self._snapshot.get(name):
+                    self._record(name)
+            self._snapshot = snapshot
+
+
+def watch_directory(directory, debounce=0.3, suffix='.json'):
+    """开始监视目录中以 suffix 结尾的文件，优先使用 inotify，不可用时退回到轮询"""
+    try:
+        watcher = InotifyWatcher(directory, debounce, suffix)
+    except (OSError, AttributeError, TypeError):
+        # 非 Linux 平台的 libc 没有 inotify 函数（AttributeError），或找不到 libc
+        watcher = PollingWatcher(directory, debounce, suffix)
+    return watcher.start()